@@ -0,0 +1,112 @@
+"""
+Compare the blocking `LineServer` backends against the asyncio `AsyncLineServer`.
+
+N client threads each stream the same payload over loopback; the clock stops once
+every line has reached the server's handler.
+
+How to run:
+
+    uv run benchmarks/bench_asyncio.py --clients 50 --lines 20000
+"""
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+from tcp_to_http.aiolistener import AsyncLineServer, set_event_loop_policy
+from tcp_to_http.server import LineServer
+
+
+class Counter:
+    """Line handler that counts lines and signals once ``expected`` have arrived."""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.count = 0
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, line: str) -> None:
+        """Count one line."""
+        # Handlers of the threaded backends run concurrently
+        with self._lock:
+            self.count += 1
+            if self.count >= self.expected:
+                self.done.set()
+
+
+def make_payload(lines: int) -> bytes:
+    with open("messages.txt", "rb") as f:
+        sample = f.read().splitlines()
+    return b"".join(sample[i % len(sample)] + b"\r\n" for i in range(lines))
+
+
+def run_clients(address, clients: int, payload: bytes) -> None:
+    def _send():
+        with socket.create_connection(address) as s:
+            s.sendall(payload)
+
+    threads = [threading.Thread(target=_send) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_blocking(backend: str, clients: int, payload: bytes, expected: int) -> float:
+    counter = Counter(expected)
+    server = LineServer(port=0, backend=backend, handler=counter, max_connections=clients, poll_interval=0.05)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        start = time.perf_counter()
+        run_clients(server.address, clients, payload)
+        counter.done.wait(timeout=120)
+        return time.perf_counter() - start
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def bench_asyncio(clients: int, payload: bytes, expected: int) -> float:
+    counter = Counter(expected)
+    loop = asyncio.new_event_loop()
+    server = AsyncLineServer(port=0, handler=counter)
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve_forever(),))
+    thread.start()
+    try:
+        start = time.perf_counter()
+        run_clients(server.address, clients, payload)
+        counter.done.wait(timeout=120)
+        return time.perf_counter() - start
+    finally:
+        loop.call_soon_threadsafe(server.shutdown)
+        thread.join()
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=20000, help="lines sent per client")
+    parser.add_argument("--policy", default="auto", choices=("auto", "asyncio", "uvloop"))
+    args = parser.parse_args()
+
+    payload = make_payload(args.lines)
+    expected = args.clients * args.lines
+    policy = set_event_loop_policy(args.policy)
+
+    print(f"{args.clients} clients x {args.lines} lines ({len(payload) * args.clients / 1e6:.1f} MB total)")
+    print(f"{'backend':<16} {'seconds':>8} {'lines/s':>12}")
+    results = [(name, bench_blocking(name, args.clients, payload, expected)) for name in ("thread", "pool", "selectors")]
+    results.append((f"asyncio/{policy}", bench_asyncio(args.clients, payload, expected)))
+    for name, seconds in results:
+        print(f"{name:<16} {seconds:>8.3f} {expected / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
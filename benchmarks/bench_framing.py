@@ -0,0 +1,145 @@
+"""
+Throughput and read-call count of the `get_lines_from_reader()` framing engine.
+
+Builds a `messages.txt`-style corpus of ``--size`` MB in a temp dir and frames it with:
+
+- ``legacy/8``:      the original engine (8-byte reads, find from 0, `del` per line)
+- ``legacy/64KiB``:  the original engine with 64 KiB reads (shows the per-line `del` cost)
+- ``readinto/N``:    the current engine at each ``--chunk-sizes`` value
+- ``bytes``/``view``: the current engine at 64 KiB in ``mode="bytes"`` / ``mode="view"``
+- ``batches``:       `get_line_batches()` at 64 KiB, one `LineBatch` per read
+
+The legacy engine is only run on the first ``--legacy-size`` MB, it is far too slow otherwise.
+
+How to run:
+
+    uv run benchmarks/bench_framing.py --size 1024 --legacy-size 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from tcp_to_http.tcplistener import get_line_batches, get_lines_from_reader
+
+
+class CountingReader:
+    """Wrap a raw file and count the read calls (each one is a read(2) syscall with buffering=0)."""
+
+    def __init__(self, f, legacy: bool = False):
+        self.f = f
+        self.calls = 0
+        if legacy:
+            self.read = self._read
+        else:
+            self.readinto = self._readinto
+
+    def _read(self, n):
+        self.calls += 1
+        return self.f.read(n)
+
+    def _readinto(self, b):
+        self.calls += 1
+        return self.f.readinto(b)
+
+
+def legacy_get_lines_from_reader(stream, chunk_size: int = 8):
+    """The framing loop as it was before the readinto() engine, kept for comparison."""
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        while True:
+            new_line = buffer.find(b"\n")
+            if new_line == -1:
+                break
+            line_bytes = buffer[:new_line]
+            if line_bytes.endswith(b"\r"):
+                line_bytes = line_bytes[:-1]
+            yield line_bytes.decode()
+            del buffer[: new_line + 1]
+    if buffer:
+        if buffer.endswith(b"\r"):
+            buffer = buffer[:-1]
+        yield buffer.decode()
+
+
+def make_corpus(path: str, size_mb: float) -> None:
+    with open("messages.txt", "rb") as f:
+        sample = f.read()
+    if not sample.endswith(b"\n"):
+        sample += b"\n"
+    block = sample * max(1, (1 << 20) // len(sample))
+    target = int(size_mb * (1 << 20))
+    with open(path, "wb") as f:
+        written = 0
+        while written < target:
+            written += f.write(block)
+
+
+def run(path: str, frame, legacy: bool, limit_bytes: int = 0, batched: bool = False):
+    with open(path, "rb", buffering=0) as f:
+        if limit_bytes:
+            # Frame only a prefix of the corpus
+            f = _Prefix(f, limit_bytes)
+        reader = CountingReader(f, legacy=legacy)
+        start = time.perf_counter()
+        lines = 0
+        for item in frame(reader):
+            # get_line_batches() yields LineBatch tuples, everything else single lines
+            lines += len(item.lines) if batched else 1
+        elapsed = time.perf_counter() - start
+    size = limit_bytes or os.path.getsize(path)
+    return size, lines, reader.calls, elapsed
+
+
+class _Prefix:
+    def __init__(self, f, limit: int):
+        self.f = f
+        self.left = limit
+
+    def read(self, n):
+        data = self.f.read(min(n, self.left))
+        self.left -= len(data)
+        return data
+
+    def readinto(self, b):
+        n = self.f.readinto(memoryview(b)[: self.left])
+        self.left -= n
+        return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=256, help="corpus size in MB")
+    parser.add_argument("--legacy-size", type=float, default=8, help="MB framed by the legacy engine")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[4096, 65536, 1 << 20])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        make_corpus(path, args.size)
+        legacy_bytes = min(int(args.legacy_size * (1 << 20)), os.path.getsize(path))
+
+        cases = [
+            ("legacy/8", lambda r: legacy_get_lines_from_reader(r, 8), True, legacy_bytes),
+            ("legacy/64KiB", lambda r: legacy_get_lines_from_reader(r, 65536), True, legacy_bytes),
+        ]
+        for cs in args.chunk_sizes:
+            cases.append((f"readinto/{cs}", lambda r, cs=cs: get_lines_from_reader(r, chunk_size=cs), False, 0))
+        for mode in ("bytes", "view"):
+            cases.append((mode, lambda r, mode=mode: get_lines_from_reader(r, mode=mode), False, 0))
+        cases.append(("batches", get_line_batches, False, 0))
+
+        print(f"{'engine':<18} {'MB':>8} {'read calls':>12} {'bytes/call':>11} {'MB/s':>9} {'lines/s':>12}")
+        for name, frame, legacy, limit in cases:
+            size, lines, calls, elapsed = run(path, frame, legacy, limit, batched=name == "batches")
+            mb = size / (1 << 20)
+            print(f"{name:<18} {mb:>8.1f} {calls:>12,} {size / calls:>11,.0f} {mb / elapsed:>9.1f} {lines / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
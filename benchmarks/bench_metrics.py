@@ -0,0 +1,130 @@
+"""
+Cost of `LineServer(metrics=Registry())` on the hot path.
+
+For each backend, N client threads stream the same payload over loopback to a server,
+once without metrics and once with a `Registry`. The clock stops when the server has
+closed every connection. The target is < 2% overhead.
+
+A no-op handler makes the result swing with whatever else the machine does, so the
+handler's cost is pinned instead: it spins for ``--handler-us`` microseconds per line,
+like a handler that does a fixed amount of work (``0`` goes back to a no-op). Runs come
+in pairs, off/on and on/off in turn so neither always goes first, and the overhead of
+each pair is computed on its own. The median over ``--repeat`` pairs is reported with
+the spread (interquartile range) of the pairs.
+
+It also times the bare `Counter.inc()` and `Histogram.observe()` calls.
+
+How to run:
+
+    uv run benchmarks/bench_metrics.py --clients 8 --lines 20000 --repeat 21 --handler-us 2
+"""
+
+import argparse
+import socket
+import statistics
+import threading
+import time
+import timeit
+
+from tcp_to_http.metrics import Registry
+from tcp_to_http.server import LineServer
+
+
+def make_payload(lines: int) -> bytes:
+    with open("messages.txt", "rb") as f:
+        sample = f.read().splitlines()
+    return b"".join(sample[i % len(sample)] + b"\r\n" for i in range(lines))
+
+
+def run_clients(address, clients: int, payload: bytes) -> None:
+    def _send():
+        with socket.create_connection(address) as s:
+            s.sendall(payload)
+
+    threads = [threading.Thread(target=_send) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def noop(line: str) -> None:
+    pass
+
+
+def make_handler(handler_us: float):
+    """A handler that takes ``handler_us`` microseconds per line (busy, like real work)."""
+    if handler_us <= 0:
+        return noop
+    cost = handler_us / 1e6
+    clock = time.perf_counter
+
+    def _handler(line: str) -> None:
+        deadline = clock() + cost
+        while clock() < deadline:
+            pass
+
+    return _handler
+
+
+def bench(backend: str, clients: int, payload: bytes, handler, metrics) -> float:
+    server = LineServer(port=0, backend=backend, handler=handler, max_connections=clients, metrics=metrics)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        start = time.perf_counter()
+        run_clients(server.address, clients, payload)
+        while server.active_connections:
+            time.sleep(0.0005)
+        return time.perf_counter() - start
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--lines", type=int, default=20000, help="lines sent per client")
+    parser.add_argument("--repeat", type=int, default=21, help="off/on pairs per backend")
+    parser.add_argument("--handler-us", type=float, default=2.0, help="handler cost per line")
+    parser.add_argument("--backends", nargs="+", default=["thread", "pool", "selectors"])
+    args = parser.parse_args()
+
+    payload = make_payload(args.lines)
+    handler = make_handler(args.handler_us)
+    total = args.clients * args.lines
+    print(
+        f"{args.clients} clients x {args.lines} lines ({len(payload) * args.clients / 1e6:.1f} MB total), "
+        f"handler {args.handler_us:g} us/line, median of {args.repeat} off/on pairs"
+    )
+    print(f"{'backend':<10} {'off lines/s':>12} {'on lines/s':>12} {'overhead':>9} {'IQR':>16}")
+    for backend in args.backends:
+        off, on, overhead = [], [], []
+        for i in range(args.repeat):
+            if i % 2:
+                seconds_on = bench(backend, args.clients, payload, handler, Registry())
+                seconds_off = bench(backend, args.clients, payload, handler, None)
+            else:
+                seconds_off = bench(backend, args.clients, payload, handler, None)
+                seconds_on = bench(backend, args.clients, payload, handler, Registry())
+            off.append(seconds_off)
+            on.append(seconds_on)
+            overhead.append((seconds_on - seconds_off) / seconds_off * 100)
+        quartiles = statistics.quantiles(overhead, n=4) if len(overhead) > 1 else [overhead[0]] * 3
+        print(
+            f"{backend:<10} {total / statistics.median(off):>12,.0f} {total / statistics.median(on):>12,.0f} "
+            f"{quartiles[1]:>8.1f}% {f'{quartiles[0]:.1f}% .. {quartiles[2]:.1f}%':>16}"
+        )
+
+    registry = Registry()
+    counter = registry.counter("c", "")
+    histogram = registry.histogram("h", "")
+    n = 1_000_000
+    print(f"Counter.inc()       {timeit.timeit(counter.inc, number=n) / n * 1e9:>6.0f} ns")
+    print(f"Histogram.observe() {timeit.timeit(lambda: histogram.observe(3e-6), number=n) / n * 1e9:>6.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
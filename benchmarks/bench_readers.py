@@ -0,0 +1,307 @@
+"""
+Throughput of every line-reading strategy over files, pipes and loopback TCP.
+
+Generates a synthetic corpus (reproducible from ``--seed``) and reads it with:
+
+- ``read_bytes/8``:      `scripts/read_bytes.py`'s loop, `os.read(fd, 8)` and no framing
+                         (only the first ``--legacy-size`` MB, it is far too slow otherwise)
+- ``get_lines/N``:       `get_lines_from_reader()` at each ``--chunk-sizes`` value
+- ``readers/<backend>``: `tcp_to_http.readers.read_lines()` with each backend, i.e. the
+                         `scripts/read_lines.py` strategies (``mmap`` on files only)
+
+Targets:
+
+- ``file``: the corpus on disk (mind the page cache: the first run warms it)
+- ``pipe``: `cat corpus | <reader>`
+- ``tcp``:  a child process `sendfile()`s the corpus over a loopback connection
+
+Every (target, case) pair runs in its own interpreter, so the peak RSS is that case's
+own. Read syscalls come from ``/proc/self/io`` (``syscr``, Linux only) and include
+any reads the interpreter makes itself; page faults show what mmap costs instead.
+
+How to run:
+
+    uv run benchmarks/bench_readers.py --size 256 --line-length lognormal:60:0.8 --crlf-ratio 0.1 --json results.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+
+from tcp_to_http.readers import read_lines
+from tcp_to_http.tcplistener import get_lines_from_reader
+
+TARGETS = ("file", "pipe", "tcp")
+BACKENDS = ("buffered", "readinto", "os.read", "mmap", "auto")
+
+_FEED_TCP = """
+import socket, sys
+with socket.create_connection(("127.0.0.1", int(sys.argv[2]))) as s, open(sys.argv[1], "rb") as f:
+    try:
+        s.sendfile(f)
+    except OSError:
+        pass  # the reader stopped early
+"""
+
+
+# --------------------------------------------------------------------------- #
+# Corpus
+# --------------------------------------------------------------------------- #
+
+
+def line_lengths(spec: str, rng: random.Random):
+    """
+    Endless line lengths (without the newline) for a ``--line-length`` spec:
+
+    - ``fixed:N``
+    - ``uniform:A-B``
+    - ``lognormal:MEDIAN:SIGMA`` (long tail, like real logs)
+    """
+    kind, _, args = spec.partition(":")
+    if kind == "fixed":
+        n = int(args)
+        while True:
+            yield n
+    elif kind == "uniform":
+        low, high = (int(x) for x in args.split("-"))
+        while True:
+            yield rng.randint(low, high)
+    elif kind == "lognormal":
+        median, sigma = args.split(":")
+        mu = math.log(float(median))
+        while True:
+            yield min(int(rng.lognormvariate(mu, float(sigma))), 1 << 20)
+    else:
+        raise ValueError(f"unknown line length distribution {spec!r}")
+
+
+def make_corpus(path: str, size_mb: float, spec: str, crlf_ratio: float, seed: int) -> int:
+    """Write the corpus and return its number of lines."""
+    rng = random.Random(seed)
+    alphabet = (string.ascii_letters + string.digits + " " * 10).encode()
+    pool = bytes(rng.choice(alphabet) for _ in range(1 << 16)) * 17  # > 1 MiB to slice lines from
+    target = int(size_mb * (1 << 20))
+    written = lines = 0
+    out = []
+    with open(path, "wb") as f:
+        for length in line_lengths(spec, rng):
+            offset = rng.randrange(0, len(pool) - (1 << 20))
+            out.append(pool[offset : offset + length])
+            out.append(b"\r\n" if rng.random() < crlf_ratio else b"\n")
+            written += length + len(out[-1])
+            lines += 1
+            if len(out) >= 8192 or written >= target:
+                f.write(b"".join(out))
+                out = []
+            if written >= target:
+                break
+    return lines
+
+
+# --------------------------------------------------------------------------- #
+# One case, in a fresh interpreter
+# --------------------------------------------------------------------------- #
+
+
+class Source:
+    """Open the corpus as a file, a pipe or an accepted loopback connection; yields a raw fd."""
+
+    def __init__(self, target: str, path: str):
+        self.target = target
+        self.path = path
+
+    def __enter__(self) -> int:
+        """Open the source; the fd to read from."""
+        if self.target == "file":
+            self._fd = os.open(self.path, os.O_RDONLY)
+            return self._fd
+        if self.target == "pipe":
+            self._proc = subprocess.Popen(["cat", self.path], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            return self._proc.stdout.fileno()
+
+        with socket.socket() as listener:
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(1)
+            port = listener.getsockname()[1]
+            self._proc = subprocess.Popen(
+                [sys.executable, "-c", _FEED_TCP, self.path, str(port)], stderr=subprocess.DEVNULL
+            )
+            self._conn, _ = listener.accept()
+        return self._conn.fileno()
+
+    def __exit__(self, *exc) -> None:
+        """Close the fd and reap the feeding process, if any."""
+        if self.target == "file":
+            os.close(self._fd)
+            return
+        if self.target == "pipe":
+            self._proc.stdout.close()
+        else:
+            self._conn.close()
+        self._proc.wait()
+
+
+def frame(case: str, fd: int, legacy_bytes: int):
+    """Return (lines, bytes) read from ``fd`` by ``case``."""
+    if case == "read_bytes/8":
+        lines = total = 0
+        while total < legacy_bytes:
+            data = os.read(fd, 8)
+            if not data:
+                break
+            total += len(data)
+            lines += data.count(b"\n")
+        return lines, total
+
+    lines = 0
+    if case.startswith("get_lines/"):
+        with open(fd, "rb", buffering=0, closefd=False) as stream:
+            for _ in get_lines_from_reader(stream, chunk_size=int(case.split("/")[1])):
+                lines += 1
+    else:
+        for _ in read_lines(fd, backend=case.split("/")[1]):
+            lines += 1
+    return lines, None
+
+
+def read_syscalls() -> int:
+    try:
+        with open("/proc/self/io") as f:
+            for row in f:
+                if row.startswith("syscr:"):
+                    return int(row.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def run_case(case: str, target: str, path: str, repeat: int, legacy_bytes: int) -> dict:
+    size = os.path.getsize(path)
+    best = None
+    for _ in range(repeat):
+        with Source(target, path) as fd:
+            syscalls = read_syscalls()
+            faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+            start = time.perf_counter()
+            lines, nbytes = frame(case, fd, legacy_bytes)
+            elapsed = time.perf_counter() - start
+            faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+            syscalls = read_syscalls() - syscalls if syscalls >= 0 else None
+        nbytes = nbytes if nbytes is not None else size
+        result = {
+            "target": target,
+            "case": case,
+            "bytes": nbytes,
+            "lines": lines,
+            "seconds": elapsed,
+            "mb_per_s": nbytes / (1 << 20) / elapsed,
+            "lines_per_s": lines / elapsed,
+            "read_syscalls": syscalls,
+            "minor_faults": faults,
+        }
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    best["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1 << 20)
+    return best
+
+
+# --------------------------------------------------------------------------- #
+# Driver
+# --------------------------------------------------------------------------- #
+
+
+def cases_for(target: str, chunk_sizes) -> list:
+    cases = ["read_bytes/8"]
+    cases += [f"get_lines/{cs}" for cs in chunk_sizes]
+    cases += [f"readers/{b}" for b in BACKENDS if b != "mmap" or target == "file"]
+    return cases
+
+
+def print_table(results: list, expected_lines: int) -> None:
+    header = (
+        f"{'target':<6} {'case':<18} {'MB':>8} {'MB/s':>9} {'lines/s':>12} "
+        f"{'read calls':>11} {'bytes/call':>11} {'faults':>8} {'RSS MB':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        calls = r["read_syscalls"]
+        calls_text = f"{calls:>11,}" if calls is not None else f"{'n/a':>11}"
+        per_call = f"{r['bytes'] / calls:>11,.0f}" if calls else f"{'n/a':>11}"
+        mark = "" if r["case"] == "read_bytes/8" or r["lines"] == expected_lines else "  <- line count differs!"
+        print(
+            f"{r['target']:<6} {r['case']:<18} {r['bytes'] / (1 << 20):>8.1f} {r['mb_per_s']:>9.1f} "
+            f"{r['lines_per_s']:>12,.0f} {calls_text} {per_call} {r['minor_faults']:>8,} "
+            f"{r['peak_rss_mb']:>7.1f}{mark}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=64, help="corpus size in MB")
+    parser.add_argument(
+        "--line-length", default="lognormal:60:0.8", help="fixed:N, uniform:A-B or lognormal:MEDIAN:SIGMA"
+    )
+    parser.add_argument("--crlf-ratio", type=float, default=0.0, help="share of lines ending in CRLF")
+    parser.add_argument("--seed", type=int, default=42069)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[4096, 65536, 1 << 20])
+    parser.add_argument("--legacy-size", type=float, default=4, help="MB read by read_bytes/8")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest is reported")
+    parser.add_argument("--json", help="also write the results as JSON to this file ('-' for stdout)")
+    parser.add_argument("--run-case", nargs=3, metavar=("CASE", "TARGET", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    legacy_bytes = int(args.legacy_size * (1 << 20))
+
+    if args.run_case:
+        case, target, path = args.run_case
+        print(json.dumps(run_case(case, target, path, args.repeat, legacy_bytes)))
+        return
+
+    config = {
+        "size_mb": args.size,
+        "line_length": args.line_length,
+        "crlf_ratio": args.crlf_ratio,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        expected_lines = make_corpus(path, args.size, args.line_length, args.crlf_ratio, args.seed)
+        config["lines"] = expected_lines
+        for target in args.targets:
+            for case in cases_for(target, args.chunk_sizes):
+                cmd = [sys.executable, __file__, "--run-case", case, target, path]
+                cmd += ["--repeat", str(args.repeat), "--legacy-size", str(args.legacy_size)]
+                out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE)
+                results.append(json.loads(out.stdout))
+
+    print(f"corpus: {args.size} MB, {expected_lines:,} lines, {args.line_length}, CRLF ratio {args.crlf_ratio}")
+    print_table(results, expected_lines)
+    if args.json:
+        report = json.dumps({"config": config, "results": results}, indent=2)
+        if args.json == "-":
+            print(report)
+        else:
+            with open(args.json, "w") as f:
+                f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
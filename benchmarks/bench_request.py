@@ -0,0 +1,67 @@
+"""
+Requests/sec parsed per core by `RequestParser`.
+
+Each case parses the same request head over and over on one core:
+
+- ``whole``:     the head arrives in a single `feed()`
+- ``split/N``:   the head arrives in N roughly equal pieces
+- ``bytewise``:  one byte per `feed()`, the worst case for an incremental parser
+
+How to run:
+
+    uv run benchmarks/bench_request.py --seconds 2
+"""
+
+import argparse
+import time
+
+from tcp_to_http.request import RequestParser
+
+REQUEST = (
+    b"GET /coffee?size=large HTTP/1.1\r\n"
+    b"Host: localhost:42069\r\n"
+    b"User-Agent: curl/7.81.0\r\n"
+    b"Accept: */*\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Connection: keep-alive\r\n"
+    b"\r\n"
+)
+
+
+def split(data: bytes, pieces: int):
+    step = max(1, -(-len(data) // pieces))
+    return [data[i : i + step] for i in range(0, len(data), step)]
+
+
+def bench(pieces, seconds: float) -> float:
+    parser = RequestParser()
+    feed, reset = parser.feed, parser.reset
+    count = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for _ in range(1000):
+            reset()
+            for piece in pieces:
+                feed(piece)
+        count += 1000
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent per case")
+    args = parser.parse_args()
+
+    cases = [("whole", [REQUEST])]
+    cases += [(f"split/{n}", split(REQUEST, n)) for n in (2, 8, 32)]
+    cases.append(("bytewise", split(REQUEST, len(REQUEST))))
+
+    print(f"{len(REQUEST)} byte request head, {REQUEST.count(b':') - 1} header fields")
+    print(f"{'case':<10} {'requests/s':>12}")
+    for name, pieces in cases:
+        print(f"{name:<10} {bench(pieces, args.seconds):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
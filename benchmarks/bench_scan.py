@@ -0,0 +1,85 @@
+"""
+Single-core mmap scanning vs. `parallel_scan()` with a growing number of workers.
+
+Builds a `messages.txt`-style corpus of ``--size`` MB and measures:
+
+- ``mm.readline``:         `scripts/read_lines.py`'s `read_lines_mmap()` loop, one core
+- ``read_lines/mmap``:     `tcp_to_http.readers.read_lines(backend="mmap")`, one core
+- ``count/N``:             `parallel_scan()` counting lines with N workers (no decoding)
+- ``reduce/N``:            `parallel_scan()` with a reducer that decodes every line and
+                           counts words, with N workers
+
+Scaling needs at least as many idle cores as the largest ``--workers`` value.
+
+How to run:
+
+    uv run benchmarks/bench_scan.py --size 2048 --workers 1 2 4 8
+"""
+
+import argparse
+import mmap
+import os
+import tempfile
+import time
+
+from tcp_to_http.readers import read_lines
+from tcp_to_http.scan import parallel_scan
+
+
+def count_words(lines) -> int:
+    """Reducer: runs in the workers, so it has to live at module level."""
+    return sum(len(line.split()) for line in lines)
+
+
+def make_corpus(path: str, size_mb: float) -> None:
+    with open("messages.txt", "rb") as f:
+        sample = f.read()
+    if not sample.endswith(b"\n"):
+        sample += b"\n"
+    block = sample * max(1, (1 << 20) // len(sample))
+    target = int(size_mb * (1 << 20))
+    with open(path, "wb") as f:
+        written = 0
+        while written < target:
+            written += f.write(block)
+
+
+def readline_scan(path: str) -> int:
+    lines = 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter(mm.readline, b""):
+            line.rstrip(b"\r\n").decode()
+            lines += 1
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=256, help="corpus size in MB")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        make_corpus(path, args.size)
+        mb = os.path.getsize(path) / (1 << 20)
+
+        cases = [
+            ("mm.readline", lambda: readline_scan(path)),
+            ("read_lines/mmap", lambda: sum(1 for _ in read_lines(path, backend="mmap", mmap_threshold=0))),
+        ]
+        for n in args.workers:
+            cases.append((f"count/{n}", lambda n=n: parallel_scan(path, workers=n)))
+        for n in args.workers:
+            cases.append((f"reduce/{n}", lambda n=n: parallel_scan(path, count_words, merge=sum, workers=n)))
+
+        print(f"{'scan':<18} {'MB':>8} {'seconds':>9} {'MB/s':>9}  result")
+        for name, scan in cases:
+            start = time.perf_counter()
+            result = scan()
+            elapsed = time.perf_counter() - start
+            print(f"{name:<18} {mb:>8.1f} {elapsed:>9.3f} {mb / elapsed:>9.1f}  {result:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-line `print()` against the batched sinks of `tcp_to_http.sinks`.
+
+Every strategy handles the same ``--lines`` lines, from one thread or ``--threads``
+concurrent ones (like the threaded `LineServer` backends). Two numbers per strategy:
+
+- ``handler``: lines/s as seen by the receive loop, i.e. the time spent in the handler
+- ``total``:   lines/s until everything is on disk / in the pipe (`flush()` included)
+
+Standard output is redirected to ``--target`` (a file by default) for the
+``print_line`` and ``StdoutSink`` runs, so the numbers don't depend on the terminal.
+
+How to run:
+
+    uv run benchmarks/bench_sinks.py --lines 1000000 --threads 1 4
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from tcp_to_http.server import print_line
+from tcp_to_http.sinks import FileSink, NullSink, StdoutSink
+
+
+def make_lines(count: int):
+    with open("messages.txt") as f:
+        sample = f.read().splitlines()
+    return [sample[i % len(sample)] for i in range(count)]
+
+
+def run(handler, lines, threads: int):
+    """Feed ``lines`` to ``handler`` from ``threads`` threads; seconds spent feeding."""
+    per_thread = [lines[i::threads] for i in range(threads)]
+
+    def _feed(part):
+        for line in part:
+            handler(line)
+
+    workers = [threading.Thread(target=_feed, args=(part,)) for part in per_thread]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def stdout_to(path: str):
+    with open(path, "w") as f:
+        saved = sys.stdout
+        sys.stdout = f
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stdout = saved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--target", default=None, help="where stdout goes (default: a temporary file)")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    tmpdir = tempfile.mkdtemp()
+    target = args.target or os.path.join(tmpdir, "stdout.txt")
+    file_path = os.path.join(tmpdir, "sink.txt")
+
+    print(f"{args.lines:,} lines, stdout -> {target}")
+    print(f"{'strategy':<14} {'threads':>7} {'handler lines/s':>16} {'total lines/s':>14}")
+    for threads in args.threads:
+        results = []
+        with stdout_to(target):
+            start = time.perf_counter()
+            fed = run(print_line, lines, threads)
+            results.append(("print_line", fed, time.perf_counter() - start))
+
+            sink = StdoutSink()
+            start = time.perf_counter()
+            fed = run(sink, lines, threads)
+            sink.close()
+            results.append(("StdoutSink", fed, time.perf_counter() - start))
+
+        sink = FileSink(file_path, mode="w")
+        start = time.perf_counter()
+        fed = run(sink, lines, threads)
+        sink.close()
+        results.append(("FileSink", fed, time.perf_counter() - start))
+
+        sink = NullSink()
+        start = time.perf_counter()
+        fed = run(sink, lines, threads)
+        results.append(("NullSink", fed, time.perf_counter() - start))
+
+        for name, fed, total in results:
+            print(f"{name:<14} {threads:>7} {args.lines / fed:>16,.0f} {args.lines / total:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Requests/s and MB/s of `tcp_to_http.static.StaticFiles` over loopback keep-alive connections.
+
+Three ways to answer the same GETs:
+
+- ``cached``:   `StaticFiles` with its hot-file cache (small files come from memory)
+- ``sendfile``: `StaticFiles` without the cache, every file goes out with `socket.sendfile()`
+- ``read``:     a handler that `read()`s the whole file per request into a `Response`
+
+for a small file (``messages.txt``) and a large one (``--size`` MB of random bytes),
+fetched ``--requests`` times (the large one a tenth as often) by ``--clients``
+concurrent clients.
+
+How to run:
+
+    uv run benchmarks/bench_static.py --requests 5000 --size 64 --clients 1 4
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from tcp_to_http.connection import HTTPServer, Response
+from tcp_to_http.static import StaticFiles
+
+
+def read_handler(root: str):
+    def _handler(request, body):
+        body.drain()
+        with open(os.path.join(root, request.target.lstrip("/")), "rb") as f:
+            return Response(200, f.read(), {"Content-Type": "application/octet-stream"})
+
+    return _handler
+
+
+def run_clients(address, path: str, requests: int, clients: int):
+    """GET ``path`` ``requests`` times over ``clients`` keep-alive connections; (seconds, bytes)."""
+    received = [0] * clients
+
+    def _client(i: int):
+        conn = http.client.HTTPConnection(*address)
+        for _ in range(requests // clients):
+            conn.request("GET", path)
+            received[i] += len(conn.getresponse().read())
+        conn.close()
+
+    threads = [threading.Thread(target=_client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(received)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=64, help="MB in the large file")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        shutil.copy("messages.txt", os.path.join(root, "small.txt"))
+        with open(os.path.join(root, "large.bin"), "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+        handlers = {
+            "cached": lambda: StaticFiles(root),
+            "sendfile": lambda: StaticFiles(root, cache_bytes=0),
+            "read": lambda: read_handler(root),
+        }
+        print(f"{'handler':<9} {'clients':>7} {'small req/s':>12} {'large MB/s':>11}")
+        for clients in args.clients:
+            for name, make_handler in handlers.items():
+                server = HTTPServer(port=0, handler=make_handler(), nodelay=True, max_requests=10**9)
+                server.bind()
+                thread = threading.Thread(target=server.serve_forever)
+                thread.start()
+                try:
+                    seconds, _ = run_clients(server.address, "/small.txt", args.requests, clients)
+                    small = args.requests / seconds
+                    large_requests = max(clients, args.requests // 10 // args.size)
+                    seconds, nbytes = run_clients(server.address, "/large.bin", large_requests, clients)
+                    large = nbytes / seconds / 1e6
+                finally:
+                    server.shutdown()
+                    thread.join()
+                print(f"{name:<9} {clients:>7} {small:>12,.0f} {large:>11,.0f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
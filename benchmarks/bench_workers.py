@@ -0,0 +1,140 @@
+"""
+Scaling of lines/sec and requests/sec with the number of pre-forked workers.
+
+For each ``--workers`` value a `Supervisor` is started in a child process, then
+``--clients`` client processes hammer it over loopback:
+
+- lines:    each client sends ``--lines`` lines per connection, half-closes, and waits
+            for the server to close (so the clock includes the server's processing)
+- requests: each client sends keep-alive ``GET`` requests on one connection
+
+Run it on a machine with at least as many cores as the largest worker count plus the
+clients, or the clients and workers just compete for the same cores.
+
+How to run:
+
+    uv run benchmarks/bench_workers.py --workers 1 2 4 8 --clients 8
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from tcp_to_http.connection import HTTPServer
+from tcp_to_http.prefork import Supervisor
+from tcp_to_http.server import LineServer
+
+REQUEST = b"GET /bench HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+
+def _noop(line: str) -> None:
+    pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    raise TimeoutError(f"server on port {port} did not come up")
+
+
+def lines_client(port: int, connections: int, payload: bytes) -> int:
+    for _ in range(connections):
+        with socket.create_connection(("127.0.0.1", port)) as s:
+            s.sendall(payload)
+            s.shutdown(socket.SHUT_WR)
+            while s.recv(4096):
+                pass
+    return connections * payload.count(b"\n")
+
+
+def requests_client(port: int, requests: int) -> int:
+    s = socket.create_connection(("127.0.0.1", port))
+    try:
+        for _ in range(requests):
+            s.sendall(REQUEST)
+            response = b""
+            while b"\r\n\r\n" not in response:
+                response += s.recv(4096)
+            head, _, body = response.partition(b"\r\n\r\n")
+            length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            while len(body) < length:
+                body += s.recv(4096)
+            if b"Connection: close" in head:
+                # max_requests reached on this connection, open a new one
+                s.close()
+                s = socket.create_connection(("127.0.0.1", port))
+    finally:
+        s.close()
+    return requests
+
+
+def run_case(factory, workers: int, clients: int, job) -> float:
+    port = free_port()
+    supervisor = Supervisor(factory, workers=workers, port=port, reuse_port=True)
+    proc = multiprocessing.Process(target=supervisor.run)
+    proc.start()
+    try:
+        wait_for_port(port)
+        with multiprocessing.Pool(clients) as pool:
+            start = time.perf_counter()
+            done = sum(pool.map(functools.partial(job, port), range(clients)))
+            elapsed = time.perf_counter() - start
+        return done / elapsed
+    finally:
+        os.kill(proc.pid, signal.SIGTERM)
+        proc.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--lines", type=int, default=50000, help="lines per connection")
+    parser.add_argument("--connections", type=int, default=4, help="line connections per client")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per client")
+    args = parser.parse_args()
+
+    with open("messages.txt", "rb") as f:
+        sample = f.read().splitlines()
+    payload = b"".join(sample[i % len(sample)] + b"\n" for i in range(args.lines))
+
+    line_job = functools.partial(_lines_job, payload=payload, connections=args.connections)
+    request_job = functools.partial(_requests_job, requests=args.requests)
+    line_server = functools.partial(LineServer, handler=_noop, poll_interval=0.1)
+    http_server = functools.partial(HTTPServer, poll_interval=0.1)
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes")
+    print(f"{'workers':>7} {'lines/s':>12} {'scaling':>8} {'requests/s':>12} {'scaling':>8}")
+    base = None
+    for workers in args.workers:
+        lines = run_case(line_server, workers, args.clients, line_job)
+        requests = run_case(http_server, workers, args.clients, request_job)
+        base = base or (lines, requests)
+        print(f"{workers:>7} {lines:>12,.0f} {lines / base[0]:>7.2f}x {requests:>12,.0f} {requests / base[1]:>7.2f}x")
+
+
+def _lines_job(port: int, _client: int, payload: bytes, connections: int) -> int:
+    return lines_client(port, connections, payload)
+
+
+def _requests_job(port: int, _client: int, requests: int) -> int:
+    return requests_client(port, requests)
+
+
+if __name__ == "__main__":
+    main()
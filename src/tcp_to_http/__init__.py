@@ -10,3 +10,10 @@ handler.setFormatter(fmt=formatter)
 handler.setLevel(level=logging.INFO)
 logger = logging.getLogger(name=__name__)
 logger.addHandler(handler)
+
+
+def main(argv=None) -> None:
+    """Entry point of the ``tcp-to-http`` command, see `tcp_to_http.cli`."""
+    from tcp_to_http.cli import main as cli_main  # lazy: `import tcp_to_http` stays cheap
+
+    cli_main(argv)
@@ -0,0 +1,4 @@
+from tcp_to_http import main
+
+# `python -m tcp_to_http`, same as the `tcp-to-http` command
+main()
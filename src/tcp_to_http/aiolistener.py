@@ -0,0 +1,436 @@
+import asyncio
+import socket
+import time
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from tcp_to_http import logger
+from tcp_to_http.metrics import Registry, serve_metrics
+from tcp_to_http.server import _ServerMetrics, create_listener
+from tcp_to_http.sinks import Sink, StdoutSink
+from tcp_to_http.tcplistener import HOST, PORT, DecodeStats, LineDecoder, LineFramer, LineTooLongError
+from tcp_to_http.timeouts import ConnectionTimer, Reaper
+
+# asyncio Streams:
+# - https://docs.python.org/3/library/asyncio-stream.html
+# - https://docs.python.org/3/library/asyncio-policy.html
+# uvloop (optional, drop-in faster event loop): https://github.com/MagicStack/uvloop
+
+AsyncLineHandler = Callable[[str], Union[None, Awaitable[None]]]
+
+
+async def aget_lines_from_reader(
+    reader: asyncio.StreamReader,
+    chunk_size: int = 65536,
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+    max_line_bytes: Optional[int] = None,
+    on_long_line: str = "error",
+    timer: Optional[ConnectionTimer] = None,
+) -> AsyncGenerator[str, None]:
+    r"""
+    Asynchronously read text lines from an `asyncio.StreamReader`.
+
+    The `async` counterpart of `get_lines_from_reader()` with the same framing
+    rules: lines are split on LF, a trailing CR is stripped, and the final
+    unterminated line is flushed at EOF.
+
+    Unlike `StreamReader.readline()`, there is no 64 KiB line limit that raises
+    mid-stream; bytes are pulled in ``chunk_size`` pieces and framed by `LineFramer`.
+
+    :param reader: asyncio.StreamReader
+        The reading half of a connection from `asyncio.start_server()` or
+        `asyncio.open_connection()`.
+    :param chunk_size: int
+        Maximum number of bytes requested from the reader per `read()`.
+    :param encoding: str
+        Same as for `get_lines_from_reader()`.
+    :param errors: str
+        Same as for `get_lines_from_reader()`.
+    :param stats: DecodeStats
+        Same as for `get_lines_from_reader()`.
+    :param max_line_bytes: int
+        Same as for `get_lines_from_reader()`.
+    :param on_long_line: str
+        Same as for `get_lines_from_reader()`.
+    :param timer: ConnectionTimer
+        Told about every read, for the timeouts of a `Reaper`. Once that reaped the
+        connection, the unfinished line is dropped instead of flushed at EOF.
+
+    :yield: str
+        Decoded lines of text without trailing newline characters.
+    """
+    framer = LineFramer(
+        encoding=encoding, errors=errors, stats=stats, max_line_bytes=max_line_bytes, on_long_line=on_long_line
+    )
+    try:
+        async for lines, _ in _aframe_chunks(reader, chunk_size, framer, timer):
+            for line in lines:
+                yield line
+    except LineTooLongError as e:
+        for line in e.lines:
+            yield line
+        raise
+
+
+async def _aframe_chunks(
+    reader: asyncio.StreamReader, chunk_size: int, framer: LineFramer, timer: Optional[ConnectionTimer] = None
+) -> AsyncGenerator[Tuple[List[str], int], None]:
+    # The lines completed by every read and the bytes it read; the final line at EOF,
+    # unless the reaper cut the connection off in the middle of it
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:  # EOF: peer closed (or `feed_eof()` during shutdown)
+            break
+        if timer is not None:
+            timer.note_read(chunk, len(chunk))
+        yield framer.feed(chunk), len(chunk)
+    if timer is None or timer.reaped is None:
+        yield framer.close(), 0
+
+
+def set_event_loop_policy(policy: str = "auto") -> str:
+    """
+    Select the event loop implementation used by `asyncio.run()`.
+
+    :param policy: str
+        ``"asyncio"`` keeps the default loop, ``"uvloop"`` requires uvloop to be
+        installed, ``"auto"`` uses uvloop when it is importable and falls back otherwise.
+
+    :return: str
+        The name of the policy that is now active.
+    """
+    if policy not in ("auto", "asyncio", "uvloop"):
+        raise ValueError("policy must be one of 'auto', 'asyncio', 'uvloop'")
+    if policy == "asyncio":
+        return "asyncio"
+
+    try:
+        import uvloop  # lazy, optional dependency
+    except ImportError:
+        if policy == "uvloop":
+            raise
+        return "asyncio"
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+class AsyncLineServer:
+    r"""
+    `asyncio.start_server()` based line server.
+
+    One coroutine per connection instead of one thread, so a single process can keep
+    tens of thousands of idle keep-alive connections open. Mirrors the `LineServer`
+    interface: `serve_forever()`, `shutdown()`, `address` and `active_connections`.
+
+    :param host: str
+        Address to bind to.
+    :param port: int
+        Port to bind to.
+    :param handler: Callable[[str], None] or async Callable[[str], None]
+        Called once for every decoded line; coroutine functions are awaited.
+        Defaults to a `StdoutSink`, flushed when `serve_forever()` returns.
+    :param max_connections: int
+        Connections above this many are accepted but not read from until a slot frees
+        up (TCP flow control pushes back on the sender). ``None`` means unlimited.
+    :param backlog: int
+        Listen backlog.
+    :param drain_timeout: float
+        Seconds `shutdown()` waits for in-flight connections to flush their lines.
+    :param encoding: str
+        Encoding clients send in.
+    :param errors: str
+        Policy for lines that are not valid in ``encoding`` (see `get_lines_from_reader()`).
+        Malformed lines never end a connection; they add up in `decode_stats`.
+    :param max_line_bytes: int
+        Longest line a client may send, see `get_lines_from_reader()`.
+    :param on_long_line: str
+        ``"error"`` closes the connection, ``"truncate"`` and ``"skip"`` keep it open.
+    :param dual_stack: bool
+        Also accept IPv4 clients on an IPv6 ``host`` (see `create_listener()`).
+    :param rcvbuf: int
+        ``SO_RCVBUF`` for the listening socket and the connections it accepts.
+    :param sndbuf: int
+        ``SO_SNDBUF``, likewise. (asyncio sets ``TCP_NODELAY`` on its own.)
+    :param reuse_port: bool
+        Set ``SO_REUSEPORT``, e.g. to run one event loop per process with `Supervisor`.
+    :param sock: socket.socket
+        Serve an already listening socket instead of binding one.
+    :param read_timeout: float
+        Close connections that sent nothing for that many seconds.
+    :param header_timeout: float
+        Close connections that take longer than that to finish a line they started.
+    :param connection_timeout: float
+        Close connections after that many seconds, busy or not. One `Reaper` task
+        enforces the three timeouts for all connections, see `LineServer`.
+    :param metrics: Registry
+        Publish the same metrics as `LineServer` in it, updated once per read.
+        ``None`` turns them off.
+    """
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = PORT,
+        handler: Optional[AsyncLineHandler] = None,
+        max_connections: Optional[int] = None,
+        backlog: int = 1024,
+        drain_timeout: float = 5.0,
+        chunk_size: int = 65536,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        max_line_bytes: Optional[int] = None,
+        on_long_line: str = "error",
+        dual_stack: bool = False,
+        rcvbuf: Optional[int] = None,
+        sndbuf: Optional[int] = None,
+        reuse_port: bool = False,
+        sock: Optional[socket.socket] = None,
+        read_timeout: Optional[float] = None,
+        header_timeout: Optional[float] = None,
+        connection_timeout: Optional[float] = None,
+        metrics: Optional[Registry] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.handler = handler or StdoutSink()
+        self.max_connections = max_connections
+        self.backlog = backlog
+        self.drain_timeout = drain_timeout
+        self.chunk_size = chunk_size
+        LineDecoder(encoding, errors)  # unknown encodings and error handlers fail here, not per connection
+        self.encoding = encoding
+        self.errors = errors
+        LineFramer(max_line_bytes=max_line_bytes, on_long_line=on_long_line)  # same, for the limit
+        self.max_line_bytes = max_line_bytes
+        self.on_long_line = on_long_line
+        self.dual_stack = dual_stack
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self.reuse_port = reuse_port
+        self._sock = sock
+        # Malformed input over all finished connections
+        self.decode_stats = DecodeStats()
+        reaper = Reaper(read_idle=read_timeout, header=header_timeout, total=connection_timeout, on_reap=_abort)
+        self.reaper: Optional[Reaper] = reaper if reaper.enabled else None
+        self.metrics = metrics
+        self._metrics = _ServerMetrics(metrics, self) if metrics is not None else None
+
+        self._is_async_handler = asyncio.iscoroutinefunction(self.handler)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._readers: Dict[asyncio.StreamReader, asyncio.StreamWriter] = {}
+        self._live_decode_stats: Dict[asyncio.StreamReader, DecodeStats] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._active = 0  # connections being read from, i.e. not waiting for a slot
+        self._reaper_task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The bound ``(host, port)``, useful when binding to port 0."""
+        if self._server is None or not self._server.sockets:
+            return (self.host, self.port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    @property
+    def active_connections(self) -> int:
+        """Connections being served right now; those waiting for a `max_connections` slot don't count."""
+        return self._active
+
+    def decode_totals(self) -> DecodeStats:
+        """`decode_stats` plus what the connections still open have counted so far."""
+        totals = DecodeStats()
+        totals.add(self.decode_stats)
+        # Called from the metrics server's thread too; list() copies the values in one go
+        for stats in list(self._live_decode_stats.values()):
+            totals.add(stats)
+        return totals
+
+    async def start(self) -> None:
+        """Bind and start accepting (done lazily by `serve_forever()`)."""
+        if self._server is not None:
+            return
+        self._stop = asyncio.Event()
+        if self.max_connections:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        if self._sock is None:
+            self._sock = create_listener(
+                self.host,
+                self.port,
+                self.backlog,
+                reuse_port=self.reuse_port,
+                dual_stack=self.dual_stack,
+                rcvbuf=self.rcvbuf,
+                sndbuf=self.sndbuf,
+            )
+        self._server = await asyncio.start_server(self._handle_conn, sock=self._sock, backlog=self.backlog)
+        if self.reaper is not None:
+            self._reaper_task = asyncio.ensure_future(self._reap())
+
+    async def serve_forever(self) -> None:
+        """Serve until `shutdown()` is called, then drain in-flight connections."""
+        await self.start()
+        logger.info(f"Listening on {self.address} (asyncio), {self.max_connections=}")
+        try:
+            await self._stop.wait()
+        finally:
+            await self._drain()
+            if isinstance(self.handler, Sink):
+                # Off the loop: the writer may still be busy with the terminal
+                await asyncio.get_event_loop().run_in_executor(None, self.handler.flush)
+            logger.info("Server stopped")
+
+    def shutdown(self) -> None:
+        """Request a graceful shutdown. Must be called from the event loop's thread."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _reap(self) -> None:
+        reaper = self.reaper
+        while True:
+            # Aborted transports end their connection's read with EOF
+            reaper.reap_expired()
+            deadline = reaper.next_deadline()
+            await asyncio.sleep(reaper.horizon if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    async def _drain(self) -> None:
+        if self._reaper_task is not None:
+            self._reaper_task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+        # Signal EOF to every reader: lines already received are still yielded,
+        # the final unterminated line is flushed, and no new data is consumed.
+        # The transport stops reading first, and drops anything it still gets (the
+        # reader resumes it once its buffer drains): a client that is still sending
+        # would otherwise make the protocol feed data after EOF, an AssertionError
+        # that resets the connection.
+        for reader, writer in list(self._readers.items()):
+            transport = writer.transport
+            if not transport.is_closing():
+                transport.pause_reading()
+                transport.set_protocol(_DropInput(transport.get_protocol()))
+            reader.feed_eof()
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+            if pending:
+                logger.warning(f"{len(pending)} connection(s) still busy after {self.drain_timeout}s drain")
+                for task in pending:
+                    task.cancel()
+
+    async def _handle_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        timer = None
+        self._tasks.add(task)
+        self._readers[reader] = writer
+        try:
+            if self._slots is not None:
+                await self._slots.acquire()
+            self._active += 1
+            try:
+                addr = writer.get_extra_info("peername")
+                logger.info(f"Connected by {addr=}")
+                if self._metrics is not None:
+                    self._metrics.accepted.inc()
+                if self.reaper is not None:
+                    timer = self.reaper.track(writer, addr)
+                stats = DecodeStats()
+                self._live_decode_stats[reader] = stats
+                framer = LineFramer(
+                    encoding=self.encoding,
+                    errors=self.errors,
+                    stats=stats,
+                    max_line_bytes=self.max_line_bytes,
+                    on_long_line=self.on_long_line,
+                )
+                try:
+                    # One batch per read, like `aget_lines_from_reader()` but with the byte counts
+                    async for lines, nbytes in _aframe_chunks(reader, self.chunk_size, framer, timer):
+                        await self._emit(lines, nbytes)
+                except LineTooLongError as e:
+                    await self._emit(e.lines)
+                    logger.warning(f"Closing {addr=}: {e}")
+                finally:
+                    if stats.malformed or stats.too_long:
+                        logger.warning(
+                            f"{addr=} sent {stats.malformed} malformed line(s) ({stats.dropped} dropped) "
+                            f"and {stats.too_long} line(s) over {self.max_line_bytes} bytes"
+                        )
+                    self.decode_stats.add(stats)
+                    self._live_decode_stats.pop(reader, None)
+                    if timer is not None:
+                        self.reaper.untrack(timer)
+            finally:
+                self._active -= 1
+                if self._slots is not None:
+                    self._slots.release()
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            writer.close()
+            self._readers.pop(reader, None)
+            self._tasks.discard(task)
+
+    async def _emit(self, lines: List[str], nbytes: int = 0) -> None:
+        start = time.perf_counter() if self._metrics is not None else 0.0
+        if self._is_async_handler:
+            for line in lines:
+                await self.handler(line)
+        else:
+            for line in lines:
+                self.handler(line)
+        if self._metrics is not None:
+            self._metrics.record(nbytes, len(lines), time.perf_counter() - start)
+
+
+class _DropInput:
+    """Stands in for a connection's protocol once its reader got EOF: drops incoming data, forwards the rest."""
+
+    def __init__(self, protocol: asyncio.BaseProtocol):
+        self._protocol = protocol
+
+    def data_received(self, data: bytes) -> None:
+        pass
+
+    def __getattr__(self, name: str):
+        return getattr(self._protocol, name)
+
+
+def _abort(timer: ConnectionTimer) -> None:
+    timer.conn.transport.abort()
+
+
+def serve(policy: str = "auto", metrics_port: Optional[int] = None, **kwargs) -> None:
+    """
+    Run an `AsyncLineServer` in the foreground until SIGINT/SIGTERM.
+
+    How to run:
+
+    1. Run `uv run python -c "from tcp_to_http.aiolistener import serve; serve()"`
+    2. In other terminals run `cat messages.txt | nc -w 1 127.0.0.1 42069`
+    3. Ctrl+C (or `kill <pid>`) drains the open connections and exits.
+
+    ``metrics_port`` serves the server's metrics like `tcp_to_http.server.serve()` does.
+    """
+    import signal
+
+    active = set_event_loop_policy(policy)
+    metrics_server = None
+    if metrics_port is not None:
+        kwargs["metrics"] = kwargs.get("metrics") or Registry()
+        metrics_server = serve_metrics(kwargs["metrics"], host=kwargs.get("host", HOST), port=metrics_port)
+
+    async def _main() -> None:
+        server = AsyncLineServer(**kwargs)
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, server.shutdown)
+        logger.info(f"Event loop policy: {active}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(_main())
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
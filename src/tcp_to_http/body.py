@@ -0,0 +1,259 @@
+import io
+import socket
+from typing import Dict, Iterator, Union
+
+from tcp_to_http.request import HTTPParseError, Request
+from tcp_to_http.tcplistener import DEFAULT_CHUNK_SIZE, _get_read_into
+
+# Message body length:
+# - RFC 9112 6.3 (Message Body Length): https://www.rfc-editor.org/rfc/rfc9112.html#name-message-body-length
+# - RFC 9112 7.1 (Chunked Transfer Coding): https://www.rfc-editor.org/rfc/rfc9112.html#name-chunked-transfer-coding
+#
+#   chunked-body   = *chunk
+#                    last-chunk
+#                    trailer-section
+#                    CRLF
+#   chunk          = chunk-size [ chunk-ext ] CRLF
+#                    chunk-data CRLF
+#   last-chunk     = 1*("0") [ chunk-ext ] CRLF
+
+MAX_BODY_SIZE = 1 << 30  # 1 GiB, pass a larger value to proxy bigger uploads
+MAX_CHUNK_LINE_BYTES = 4096  # chunk-size line incl. extensions, and each trailer line
+_HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+
+class BodyReader:
+    r"""
+    Streaming reader for a request body, in constant memory.
+
+    Picks up right where `RequestParser` stopped: pass the bytes read past the end of
+    the head as ``initial`` and the same stream the head came from. The body is never
+    held in memory as a whole; it is handed out chunk by chunk.
+
+    Two ways to consume it
+    ----------------------
+    - ``for chunk in body:`` yields ``memoryview`` slices of the reader's own buffer.
+      Like ``mode="view"`` in `get_lines_from_reader()`, a chunk is only valid until
+      the next iteration; write it somewhere or copy it.
+    - ``body.readinto(b)`` fills a buffer you own. Once the reader's buffer is empty the
+      bytes are received straight into ``b`` without an intermediate copy.
+
+    .. code-block:: python
+
+        request, initial = request_from_reader(conn_file)
+        body = BodyReader.for_request(conn_file, request, initial)
+        with open("upload.bin", "wb") as out:
+            for chunk in body:
+                out.write(chunk)
+
+    :param stream: io.FileIO or socket.SocketIO or socket.socket
+        The connection, same kinds of streams as `get_lines_from_reader()` accepts.
+    :param content_length: int
+        Body size for ``Content-Length`` framing. Ignored when ``chunked`` is set.
+    :param chunked: bool
+        Decode ``Transfer-Encoding: chunked``.
+    :param initial: bytes
+        Bytes already received past the end of the head.
+    :param max_body_size: int
+        Most body bytes accepted (413 above it).
+    :param chunk_size: int
+        Size of the receive buffer, and the largest chunk handed out.
+    """
+
+    def __init__(
+        self,
+        stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+        content_length: int = 0,
+        chunked: bool = False,
+        initial: bytes = b"",
+        max_body_size: int = MAX_BODY_SIZE,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self._read_into = _get_read_into(stream)
+        self._buffer = bytearray(max(chunk_size, len(initial), MAX_CHUNK_LINE_BYTES + 1))
+        self._view = memoryview(self._buffer)
+        self._view[: len(initial)] = initial
+        self._pos = 0  # first unconsumed byte in the buffer
+        self._end = len(initial)  # number of valid bytes in the buffer
+
+        self.chunked = chunked
+        self.max_body_size = max_body_size
+        self.bytes_read = 0
+        self.trailers: Dict[str, str] = {}
+        # Body bytes left in the current chunk (chunked) or in the whole body (Content-Length)
+        self._remaining = 0
+        self._after_chunk_data = False
+        if chunked:
+            self.done = False
+        else:
+            if content_length > max_body_size:
+                raise HTTPParseError("Payload too large", status=413)
+            self._remaining = content_length
+            self.done = content_length == 0
+
+    @classmethod
+    def for_request(
+        cls,
+        stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+        request: Request,
+        initial: bytes = b"",
+        **kwargs,
+    ) -> "BodyReader":
+        """
+        Build the reader the request's framing headers call for (RFC 9112 6.3).
+
+        :raise HTTPParseError: on a bad ``Content-Length``, or a ``Transfer-Encoding``
+            other than ``chunked`` (501).
+        """
+        transfer_encoding = request.header("transfer-encoding")
+        if transfer_encoding is not None:
+            codings = [c.strip().lower() for c in transfer_encoding.split(",")]
+            if codings != ["chunked"]:
+                if codings[-1] != "chunked":
+                    raise HTTPParseError("Request body length can't be determined")
+                raise HTTPParseError("Unsupported transfer coding: {}".format(transfer_encoding), status=501)
+            # Transfer-Encoding overrides Content-Length
+            return cls(stream, chunked=True, initial=initial, **kwargs)
+
+        content_length = request.header("content-length")
+        if content_length is None:
+            return cls(stream, content_length=0, initial=initial, **kwargs)
+        # "Content-Length: 5, 5" (a repeated field) is allowed if all values agree
+        values = {v.strip() for v in content_length.split(",")}
+        if len(values) != 1:
+            raise HTTPParseError("Conflicting Content-Length values")
+        value = values.pop()
+        if not value.isdigit() or not value.isascii():
+            raise HTTPParseError("Invalid Content-Length: {!r}".format(content_length))
+        return cls(stream, content_length=int(value), initial=initial, **kwargs)
+
+    @property
+    def leftover(self) -> bytes:
+        """Bytes received past the end of the body, i.e. the start of a pipelined next request."""
+        return bytes(self._view[self._pos : self._end])
+
+    def __iter__(self) -> Iterator[memoryview]:
+        """Yield the body chunk by chunk, as views that are only valid until the next one."""
+        while self._advance():
+            if self._pos == self._end:
+                self._pos = self._end = 0
+                # Never read past a Content-Length body; chunked bodies have to
+                # over-read anyway to find the next chunk-size line.
+                limit = len(self._buffer) if self.chunked else min(len(self._buffer), self._remaining)
+                self._end = self._receive(self._view[:limit])
+            n = min(self._end - self._pos, self._remaining)
+            chunk = self._view[self._pos : self._pos + n]
+            self._pos += n
+            self._consumed(n)
+            yield chunk
+
+    def readinto(self, b: Union[bytearray, memoryview]) -> int:
+        """
+        Read up to ``len(b)`` body bytes into ``b``.
+
+        :return: int
+            Number of bytes written, ``0`` once the body is complete.
+        """
+        if not self._advance():
+            return 0
+        target = memoryview(b).cast("B")
+        want = min(len(target), self._remaining)
+        available = self._end - self._pos
+        if available:
+            n = min(want, available)
+            target[:n] = self._view[self._pos : self._pos + n]
+            self._pos += n
+        else:
+            n = self._receive(target[:want])
+        self._consumed(n)
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to ``size`` bytes (everything left if negative). Mind ``max_body_size``."""
+        if size < 0:
+            return b"".join(bytes(chunk) for chunk in self)
+        out = bytearray(size)
+        view = memoryview(out)
+        filled = 0
+        while filled < size:
+            n = self.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+        return bytes(view[:filled])
+
+    def drain(self) -> int:
+        """Discard the rest of the body (e.g. before the next request on a keep-alive connection)."""
+        skipped = 0
+        for chunk in self:
+            skipped += len(chunk)
+        return skipped
+
+    # ------------------------------------------------------------------ #
+
+    def _receive(self, target: memoryview) -> int:
+        n = self._read_into(target)
+        if not n:
+            raise HTTPParseError("Connection closed before the end of the request body")
+        return n
+
+    def _consumed(self, n: int) -> None:
+        self._remaining -= n
+        self.bytes_read += n
+        if not self.chunked and not self._remaining:
+            self.done = True
+
+    def _advance(self) -> bool:
+        """Make sure there are body bytes left in the current chunk; False at the end of the body."""
+        if self.done:
+            return False
+        if self._remaining:
+            return True
+
+        if self._after_chunk_data:
+            if self._read_line():
+                raise HTTPParseError("Missing CRLF after chunk data")
+            self._after_chunk_data = False
+
+        line = self._read_line()
+        size_text = line.split(b";", 1)[0].strip(b" \t")
+        if not size_text or len(size_text) > 16 or size_text.translate(None, _HEX_DIGITS):
+            raise HTTPParseError("Invalid chunk size: {!r}".format(line))
+        size = int(size_text, 16)
+        if size == 0:
+            self._read_trailers()
+            self.done = True
+            return False
+        if self.bytes_read + size > self.max_body_size:
+            raise HTTPParseError("Payload too large", status=413)
+        self._remaining = size
+        self._after_chunk_data = True
+        return True
+
+    def _read_trailers(self) -> None:
+        while True:
+            line = self._read_line()
+            if not line:
+                return
+            name, colon, value = line.partition(b":")
+            if not colon:
+                raise HTTPParseError("Malformed trailer field: {!r}".format(line))
+            self.trailers[name.strip().decode("latin-1").lower()] = value.strip(b" \t").decode("latin-1")
+
+    def _read_line(self) -> bytes:
+        # chunk-size and trailer lines; same framing as everywhere else (LF, optional CR)
+        while True:
+            new_line = self._buffer.find(b"\n", self._pos, self._end)
+            if new_line != -1:
+                line_end = new_line - 1 if new_line > self._pos and self._buffer[new_line - 1] == 13 else new_line
+                line = bytes(self._view[self._pos : line_end])
+                self._pos = new_line + 1
+                return line
+
+            pending = self._end - self._pos
+            if pending > MAX_CHUNK_LINE_BYTES:
+                raise HTTPParseError("Chunk header line too long")
+            # Compact, then read more behind the partial line
+            self._buffer[:pending] = self._buffer[self._pos : self._end]
+            self._pos, self._end = 0, pending
+            self._end += self._receive(self._view[pending:])
@@ -0,0 +1,310 @@
+import argparse
+import os
+import signal
+from functools import partial
+from typing import Callable, List, Optional
+
+# The `tcp-to-http` command (`tcp_to_http:main` in pyproject.toml, or `python -m tcp_to_http`).
+#
+# Only argparse is imported up front: the servers, sinks, metrics and logging helpers
+# are imported once the arguments are parsed, so `--help` and argument errors don't
+# pay for them.
+#
+# ref:
+# - https://docs.python.org/3/library/argparse.html
+# - https://man7.org/linux/man-pages/man7/tcp.7.html (TCP_NODELAY)
+# - https://man7.org/linux/man-pages/man7/socket.7.html (SO_RCVBUF, SO_SNDBUF)
+
+BACKENDS = ("thread", "pool", "selectors", "asyncio")
+MODES = ("lines", "http")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tcp-to-http",
+        description="Serve lines (or HTTP/1.1) over TCP.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--mode", choices=MODES, default="lines", help="print received lines, or answer HTTP")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="thread",
+        help="thread per connection, thread pool, one selectors loop, or asyncio (lines only)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="pre-forked worker processes (0 = one per CPU)")
+    parser.add_argument(
+        "--shared-socket",
+        action="store_true",
+        help="workers accept from one inherited socket instead of SO_REUSEPORT sockets of their own",
+    )
+
+    bind = parser.add_argument_group("address and socket options")
+    bind.add_argument("--host", default=None, help="address to bind (default: 127.0.0.1, ::1 with -6, :: dual-stack)")
+    bind.add_argument("--port", type=int, default=42069)
+    bind.add_argument("-6", "--ipv6", action="store_true", help="listen on IPv6")
+    bind.add_argument("--dual-stack", action="store_true", help="listen on IPv6 and accept IPv4 clients too")
+    bind.add_argument("--backlog", type=int, default=128, help="listen() backlog")
+    bind.add_argument("--rcvbuf", type=int, default=None, help="SO_RCVBUF in bytes (default: the system's)")
+    bind.add_argument("--sndbuf", type=int, default=None, help="SO_SNDBUF in bytes (default: the system's)")
+    bind.add_argument("--nodelay", action="store_true", help="set TCP_NODELAY on accepted connections")
+    bind.add_argument("--max-connections", type=int, default=128, help="connections served at once (per worker)")
+
+    lines = parser.add_argument_group("line mode")
+    lines.add_argument("--chunk-size", type=int, default=64 * 1024, help="most bytes per read")
+    lines.add_argument("--encoding", default="utf-8")
+    lines.add_argument("--errors", default="strict", help="decode error handler: strict, replace, ...")
+    lines.add_argument("--max-line-bytes", type=int, default=None, help="longest line a client may send")
+    lines.add_argument("--on-long-line", choices=("error", "truncate", "skip"), default="error")
+    lines.add_argument("--output", default=None, help="append lines to this file instead of printing them")
+    lines.add_argument("--rotate-bytes", type=int, default=None, help="rotate --output at this size")
+    lines.add_argument("--quiet", action="store_true", help="discard lines")
+    lines.add_argument("--loop", choices=("auto", "asyncio", "uvloop"), default="auto", help="asyncio event loop")
+
+    http = parser.add_argument_group("http mode")
+    http.add_argument("--idle-timeout", type=float, default=5.0, help="seconds a keep-alive connection may idle")
+    http.add_argument("--max-requests", type=int, default=100, help="requests per connection")
+    http.add_argument(
+        "--write-timeout", type=float, default=30.0, help="seconds a client may take to accept more of a response"
+    )
+    http.add_argument("--root", default=None, help="serve the files in this directory")
+    http.add_argument(
+        "--cache-bytes", type=int, default=32 * 1024 * 1024, help="memory for small hot files with --root (0: off)"
+    )
+
+    timeouts = parser.add_argument_group("timeouts (all modes; off unless given)")
+    timeouts.add_argument("--read-timeout", type=float, default=None, help="close clients silent for this many seconds")
+    timeouts.add_argument(
+        "--header-timeout",
+        type=float,
+        default=None,
+        help="seconds a client may take to finish a line or request head it started (slowloris)",
+    )
+    timeouts.add_argument("--connection-timeout", type=float, default=None, help="seconds a connection may stay open")
+
+    ops = parser.add_argument_group("observability")
+    ops.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus /metrics on this port")
+    ops.add_argument("--log-level", choices=("debug", "info", "warning", "error"), default="info")
+    ops.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    ops.add_argument("--async-logging", action="store_true", help="log through a queue and a background thread")
+    return parser
+
+
+def _check(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.mode == "http" and args.backend not in ("thread", "pool"):
+        parser.error("--mode http runs on the 'thread' and 'pool' backends")
+    if args.workers != 1 and args.metrics_port is not None:
+        parser.error("--metrics-port needs --workers 1 (every worker would bind it)")
+    if args.root is not None and args.mode != "http":
+        parser.error("--root needs --mode http")
+    if args.root is not None and not os.path.isdir(args.root):
+        parser.error("--root {!r} is not a directory".format(args.root))
+    if args.rotate_bytes is not None and args.output is None:
+        parser.error("--rotate-bytes needs --output")
+    if args.quiet and args.output is not None:
+        parser.error("--quiet and --output exclude each other")
+    for name in ("read_timeout", "header_timeout", "connection_timeout"):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            parser.error("--{} must be > 0".format(name.replace("_", "-")))
+    if args.workers < 0:
+        parser.error("--workers must be >= 0")
+    if args.host is None:
+        args.host = "::" if args.dual_stack else "::1" if args.ipv6 else "127.0.0.1"
+    elif args.ipv6 and ":" not in args.host:
+        parser.error("-6 needs an IPv6 --host")
+
+
+class _Runner:
+    """
+    The server plus what has to be released after it.
+
+    It has the blocking `serve_forever()` / `shutdown()` that `Supervisor` and the
+    signal handlers expect.
+    """
+
+    def __init__(self, server, cleanup: List[Callable[[], None]], is_async: bool = False):
+        self.server = server
+        self.cleanup = cleanup
+        self.is_async = is_async
+        self._loop = None
+
+    def serve_forever(self) -> None:
+        try:
+            if self.is_async:
+                import asyncio
+
+                self._loop = asyncio.new_event_loop()
+                try:
+                    self._loop.run_until_complete(self.server.serve_forever())
+                finally:
+                    self._loop.close()
+            else:
+                self.server.serve_forever()
+        finally:
+            for fn in reversed(self.cleanup):
+                fn()
+
+    def shutdown(self) -> None:
+        if not self.is_async:
+            self.server.shutdown()
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.server.shutdown)
+
+
+def _make_handler(args: argparse.Namespace):
+    from tcp_to_http import sinks
+
+    if args.quiet:
+        return sinks.NullSink()
+    if args.rotate_bytes is not None:
+        return sinks.RotatingFileSink(args.output, max_bytes=args.rotate_bytes)
+    if args.output is not None:
+        return sinks.FileSink(args.output)
+    return sinks.StdoutSink()
+
+
+def build_server(args: argparse.Namespace, metrics=None, **bind) -> _Runner:
+    """
+    Build the configured server; runs in each worker when there are several.
+
+    :param bind: dict
+        ``host``, ``port``, ``backlog`` and ``reuse_port`` or ``sock``, as `Supervisor` passes them.
+    """
+    cleanup: List[Callable[[], None]] = []
+    if args.async_logging:
+        # Per process: the listener thread doesn't survive fork()
+        from tcp_to_http.logs import setup_async_logging
+
+        cleanup.append(setup_async_logging(json_format=args.log_json).stop)
+
+    socket_options = {"dual_stack": args.dual_stack, "rcvbuf": args.rcvbuf, "sndbuf": args.sndbuf}
+    timeouts = {
+        "read_timeout": args.read_timeout,
+        "header_timeout": args.header_timeout,
+        "connection_timeout": args.connection_timeout,
+    }
+    if args.mode == "http":
+        from tcp_to_http.connection import HTTPServer
+
+        http_handler = None
+        if args.root is not None:
+            from tcp_to_http.static import StaticFiles
+
+            http_handler = StaticFiles(args.root, cache_bytes=args.cache_bytes, metrics=metrics)
+        server = HTTPServer(
+            handler=http_handler,
+            backend=args.backend,
+            idle_timeout=args.idle_timeout,
+            max_requests=args.max_requests,
+            write_timeout=args.write_timeout,
+            max_connections=args.max_connections,
+            nodelay=args.nodelay,
+            metrics=metrics,
+            **timeouts,
+            **socket_options,
+            **bind,
+        )
+        return _Runner(server, cleanup)
+
+    handler = _make_handler(args)
+    cleanup.append(handler.close)
+    framing = {
+        "chunk_size": args.chunk_size,
+        "encoding": args.encoding,
+        "errors": args.errors,
+        "max_line_bytes": args.max_line_bytes,
+        "on_long_line": args.on_long_line,
+    }
+    if args.backend == "asyncio":
+        from tcp_to_http.aiolistener import AsyncLineServer, set_event_loop_policy
+
+        set_event_loop_policy(args.loop)
+        server = AsyncLineServer(
+            handler=handler,
+            max_connections=args.max_connections,
+            metrics=metrics,
+            **framing,
+            **timeouts,
+            **socket_options,
+            **bind,
+        )
+        return _Runner(server, cleanup, is_async=True)
+
+    from tcp_to_http.server import LineServer
+
+    server = LineServer(
+        backend=args.backend,
+        handler=handler,
+        max_connections=args.max_connections,
+        nodelay=args.nodelay,
+        metrics=metrics,
+        **framing,
+        **timeouts,
+        **socket_options,
+        **bind,
+    )
+    return _Runner(server, cleanup)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Parse the command line and serve until SIGINT/SIGTERM.
+
+    How to run:
+
+    - Print lines:          `uv run tcp-to-http`
+    - Many cores:           `uv run tcp-to-http --backend selectors --workers 0 --quiet`
+    - HTTP, IPv4 and IPv6:  `uv run tcp-to-http --mode http --dual-stack --nodelay`
+    - Tuned socket buffers: `uv run tcp-to-http --rcvbuf 4194304 --chunk-size 262144 --metrics-port 42070`
+    - Drop slow clients:    `uv run tcp-to-http --mode http --read-timeout 30 --header-timeout 10`
+    - Static files:         `uv run tcp-to-http --mode http --root public --nodelay`
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check(parser, args)
+
+    from tcp_to_http import logger
+
+    level = args.log_level.upper()
+    logger.setLevel(level)
+    for log_handler in logger.handlers:
+        # The package's stderr handler has a level of its own (INFO), it has to follow too
+        log_handler.setLevel(level)
+    if args.log_json and not args.async_logging:
+        from tcp_to_http.logs import JSONFormatter
+
+        for log_handler in logger.handlers:
+            log_handler.setFormatter(JSONFormatter())
+
+    bind = {"host": args.host, "port": args.port, "backlog": args.backlog}
+    if args.workers != 1:
+        from tcp_to_http.prefork import Supervisor
+
+        Supervisor(
+            factory=partial(build_server, args),
+            workers=args.workers or None,
+            reuse_port=not args.shared_socket,
+            listen_options={"dual_stack": args.dual_stack, "rcvbuf": args.rcvbuf, "sndbuf": args.sndbuf},
+            **bind,
+        ).run()
+        return
+
+    metrics = metrics_server = None
+    if args.metrics_port is not None:
+        from tcp_to_http.metrics import Registry, serve_metrics
+
+        metrics = Registry()
+        metrics_server = serve_metrics(metrics, host=args.host, port=args.metrics_port)
+    runner = build_server(args, metrics=metrics, **bind)
+
+    def _on_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        runner.shutdown()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+    try:
+        runner.serve_forever()
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
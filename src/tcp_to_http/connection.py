@@ -0,0 +1,378 @@
+import socket
+import threading
+from http import HTTPStatus
+from typing import Callable, Dict, Optional, Tuple
+
+from tcp_to_http import logger
+from tcp_to_http.body import BodyReader
+from tcp_to_http.request import HTTPParseError, Request, RequestParser
+from tcp_to_http.server import LineServer
+from tcp_to_http.tcplistener import DEFAULT_CHUNK_SIZE, HOST, PORT
+from tcp_to_http.timeouts import ConnectionTimer, TimedReader
+
+# Persistent connections and pipelining:
+# - RFC 9112 9.3 (Persistence): https://www.rfc-editor.org/rfc/rfc9112.html#name-persistence
+# - RFC 9112 9.3.2 (Pipelining): https://www.rfc-editor.org/rfc/rfc9112.html#name-pipelining
+#
+# HTTP/1.1 connections stay open unless either side says "Connection: close";
+# HTTP/1.0 connections close unless the client asks for "Connection: keep-alive".
+# Pipelined requests are answered strictly in the order they arrived.
+
+
+class Response:
+    r"""
+    A response to send back.
+
+    ``Content-Length`` and ``Connection`` are filled in when it is written. Subclasses
+    with another kind of body (e.g. `tcp_to_http.static.FileResponse`) override
+    ``content_length`` and `send()`.
+
+    :ivar status: int
+        e.g. ``200``.
+    :ivar body: bytes
+        The whole body.
+    :ivar headers: Dict[str, str]
+        Extra header fields, ``Content-Type: text/plain`` by default.
+    """
+
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(self, status: int = 200, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.body = body
+        self.headers: Dict[str, str] = headers if headers is not None else {"Content-Type": "text/plain"}
+
+    def head(self, keep_alive: bool) -> bytes:
+        """Status line and header fields, including the blank line that ends them."""
+        try:
+            reason = HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = ""
+        lines = ["HTTP/1.1 {} {}".format(self.status, reason)]
+        lines.extend("{}: {}".format(name, value) for name, value in self.headers.items())
+        if self.status >= 200 and self.status not in (204, 304):  # no body, no length (RFC 9110 8.6)
+            lines.append("Content-Length: {}".format(self.content_length))
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    @property
+    def content_length(self) -> int:
+        """Value of the ``Content-Length`` field."""
+        return len(self.body)
+
+    def send(self, sock: socket.socket, keep_alive: bool, head_only: bool = False) -> None:
+        """
+        Write the response to ``sock``; ``head_only`` for ``HEAD`` requests.
+
+        A timeout on ``sock`` limits how long the client may take to accept more of the
+        response, not how long the whole response takes.
+        """
+        head = self.head(keep_alive)
+        if head_only or not self.body:
+            sock.sendall(head)
+        elif len(self.body) <= 16 * 1024:
+            # One segment for small responses
+            sock.sendall(head + self.body)
+        else:
+            sock.sendall(head)
+            send_all(sock, self.body)
+
+
+def send_all(sock: socket.socket, data: bytes) -> None:
+    """
+    `socket.sendall()`, but with the socket's timeout applied to every write.
+
+    Since Python 3.5 ``sendall()`` applies the timeout to the whole call, so a large
+    body going to a slow (but not stuck) client runs out of time halfway through.
+    """
+    view = memoryview(data)
+    while view:
+        view = view[sock.send(view) :]
+
+
+HTTPHandler = Callable[[Request, BodyReader], Response]
+
+
+def default_handler(request: Request, body: BodyReader) -> Response:
+    """Answer every request with a short plain-text greeting."""
+    body.drain()
+    return Response(200, "Hello from tcp-to-http! You asked for {}\n".format(request.target).encode())
+
+
+class ConnectionStats:
+    """
+    Thread-safe counters for connection reuse.
+
+    ``reuse_ratio`` is the share of requests that did not pay for a new TCP
+    handshake: ``1 - connections / requests``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.max_requests_on_connection = 0
+
+    def record(self, requests: int) -> None:
+        """Account for a closed connection that served ``requests`` requests."""
+        with self._lock:
+            self.connections += 1
+            self.requests += requests
+            self.max_requests_on_connection = max(self.max_requests_on_connection, requests)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of requests that came over a connection opened for an earlier one."""
+        with self._lock:
+            if not self.requests:
+                return 0.0
+            return max(0.0, 1 - self.connections / self.requests)
+
+    def __repr__(self) -> str:
+        """All counters, as logged when an `HTTPServer` stops."""
+        return "ConnectionStats(connections={}, requests={}, reuse_ratio={:.3f}, max_requests_on_connection={})".format(
+            self.connections, self.requests, self.reuse_ratio, self.max_requests_on_connection
+        )
+
+
+class HTTPConnection:
+    r"""
+    Serve sequential (and pipelined) requests on one accepted socket.
+
+    State machine
+    -------------
+    ``IDLE`` (waiting for a request head, bounded by ``idle_timeout``) ->
+    ``HEAD`` (parsing) -> ``BODY`` (handler reads it, the rest is drained) ->
+    ``RESPOND`` -> back to ``IDLE`` if the connection is kept alive, else ``CLOSED``.
+
+    Bytes received past the end of one request (a pipelined next request) are
+    carried over and parsed before anything new is read from the socket.
+
+    :param sock: socket.socket
+        The accepted connection.
+    :param handler: Callable[[Request, BodyReader], Response]
+        Produces the response for each request.
+    :param idle_timeout: float
+        Seconds to wait for the next request before closing the connection.
+    :param max_requests: int
+        Requests served before the connection is closed (``Connection: close`` is sent
+        on the last response).
+    :param write_timeout: float
+        Seconds a response may wait for the client to accept more of it (per write, not
+        for the whole response); ``None`` waits as long as it takes.
+    :param stats: ConnectionStats
+        Where to record how many requests the connection served.
+    :param should_close: Callable[[], bool]
+        Polled after each request; a true value closes the connection (server shutdown).
+    :param timer: ConnectionTimer
+        Told about every read, so a `Reaper` can enforce the server's read, header
+        (a request head in progress) and connection timeouts.
+    """
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        handler: HTTPHandler = default_handler,
+        idle_timeout: float = 5.0,
+        max_requests: int = 100,
+        stats: Optional[ConnectionStats] = None,
+        should_close: Optional[Callable[[], bool]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        timer: Optional[ConnectionTimer] = None,
+        write_timeout: Optional[float] = 30.0,
+    ):
+        self.sock = sock
+        self.handler = handler
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.write_timeout = write_timeout
+        self.stats = stats
+        self.should_close = should_close
+        self.timer = timer
+        self.requests_served = 0
+        self.state = "IDLE"
+
+        self._parser = RequestParser()
+        self._buffer = bytearray(chunk_size)
+        self._leftover = b""
+
+    def serve(self) -> None:
+        """Run the state machine until the connection is closed."""
+        try:
+            while self.requests_served < self.max_requests:
+                if not self._serve_one():
+                    break
+        finally:
+            self.state = "CLOSED"
+            if self.stats is not None:
+                self.stats.record(self.requests_served)
+
+    def _serve_one(self) -> bool:
+        """Serve one request; return whether the connection stays open."""
+        self.state = "IDLE"
+        self.sock.settimeout(self.idle_timeout)
+        try:
+            head = self._read_head()
+            if head is None:
+                return False
+            request, initial = head
+
+            self.state = "BODY"
+            stream = self.sock if self.timer is None else TimedReader(self.sock, self.timer, lines=False)
+            body = BodyReader.for_request(stream, request, initial)
+        except HTTPParseError as e:
+            self._send_error(e.status, str(e))
+            return False
+        except socket.timeout:
+            self._send_error(408, "Request timeout")
+            return False
+
+        try:
+            response = self.handler(request, body)
+            # Whatever the handler left unread must go before the next request
+            body.drain()
+        except HTTPParseError as e:
+            self._send_error(e.status, str(e))
+            return False
+        except socket.timeout:
+            self._send_error(408, "Request timeout")
+            return False
+        except Exception as e:
+            logger.exception(e)
+            self._send_error(500, "Internal server error")
+            return False
+
+        self.requests_served += 1
+        keep_alive = (
+            _wants_keep_alive(request)
+            and response.headers.get("Connection", "").lower() != "close"
+            and self.requests_served < self.max_requests
+            and not (self.should_close and self.should_close())
+        )
+        response.headers.pop("Connection", None)
+        self.state = "RESPOND"
+        self._send(response, keep_alive, head_only=request.method == "HEAD")
+        if self.timer is not None:
+            self.timer.note_progress(done=True)  # idle from here on, not since the last read
+        self._leftover = body.leftover
+        return keep_alive
+
+    def _read_head(self) -> Optional[Tuple[Request, bytes]]:
+        """Parse the next request head; ``None`` if the client went away (or idled out) cleanly."""
+        parser = self._parser
+        parser.reset()
+        timer = self.timer
+        pending, self._leftover = self._leftover, b""
+        if pending:
+            self.state = "HEAD"
+            used = parser.feed(pending)
+            if timer is not None:
+                timer.note_progress(parser.done)
+            if parser.done:
+                return parser.request, pending[used:]
+
+        view = memoryview(self._buffer)
+        while True:
+            try:
+                n = self.sock.recv_into(view)
+            except socket.timeout:
+                if self.state == "HEAD":
+                    raise
+                return None  # idle keep-alive connection, close quietly
+            if not n:
+                if self.state == "HEAD":
+                    raise HTTPParseError("Connection closed before the end of the request head")
+                return None
+            self.state = "HEAD"
+            used = parser.feed(view[:n])
+            if timer is not None:
+                timer.note_progress(parser.done)
+            if parser.done:
+                return parser.request, bytes(view[used:n])
+
+    def _send(self, response: Response, keep_alive: bool, head_only: bool = False) -> None:
+        # The idle timeout is for reading requests; it would cut long responses short
+        self.sock.settimeout(self.write_timeout)
+        response.send(self.sock, keep_alive, head_only)
+
+    def _send_error(self, status: int, message: str) -> None:
+        try:
+            self._send(Response(status, (message + "\n").encode()), keep_alive=False)
+        except OSError:
+            pass  # the client is gone already
+
+
+def _wants_keep_alive(request: Request) -> bool:
+    tokens = {token.strip().lower() for token in request.header("connection", "").split(",")}
+    if "close" in tokens:
+        return False
+    if request.version == "HTTP/1.1":
+        return True
+    return "keep-alive" in tokens
+
+
+class HTTPServer(LineServer):
+    r"""
+    Keep-alive HTTP/1.1 server on top of the threaded `LineServer` backends.
+
+    Every accepted connection is served by an `HTTPConnection`; graceful shutdown
+    lets in-flight requests finish and closes idle keep-alive connections.
+
+    How to run:
+
+    1. Run `uv run python -c "from tcp_to_http.connection import HTTPServer; HTTPServer().serve_forever()"`
+    2. In another terminal run `curl -v http://127.0.0.1:42069/a http://127.0.0.1:42069/b`
+       (curl reuses the connection: "Re-using existing connection").
+
+    :param handler: Callable[[Request, BodyReader], Response]
+        Produces the response for each request.
+    :param backend: str
+        ``"thread"`` or ``"pool"``; handlers block, so the selectors loop doesn't apply.
+    :param idle_timeout: float
+        Seconds a keep-alive connection may sit idle between requests.
+    :param max_requests: int
+        Requests served per connection before it is closed.
+    :param write_timeout: float
+        Seconds a response may wait for the client to accept more of it, see `HTTPConnection`.
+    :param kwargs:
+        Everything else `LineServer` accepts (``max_connections``, ``drain_timeout`` ...).
+    """
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = PORT,
+        handler: Optional[HTTPHandler] = None,
+        backend: str = "thread",
+        idle_timeout: float = 5.0,
+        max_requests: int = 100,
+        write_timeout: Optional[float] = 30.0,
+        **kwargs,
+    ):
+        if backend not in ("thread", "pool"):
+            raise ValueError("HTTPServer supports the 'thread' and 'pool' backends")
+        super().__init__(host=host, port=port, backend=backend, **kwargs)
+        self.http_handler: HTTPHandler = handler or default_handler
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.write_timeout = write_timeout
+        self.stats = ConnectionStats()
+
+    def serve_forever(self) -> None:
+        """`LineServer.serve_forever()`, logging the connection reuse stats at the end."""
+        try:
+            super().serve_forever()
+        finally:
+            logger.info(f"{self.stats}")
+
+    def _serve_conn(self, conn: socket.socket, addr: Tuple[str, int]) -> None:
+        HTTPConnection(
+            conn,
+            handler=self.http_handler,
+            idle_timeout=self.idle_timeout,
+            max_requests=self.max_requests,
+            stats=self.stats,
+            should_close=self._stop.is_set,
+            timer=self._timers.get(conn),
+            write_timeout=self.write_timeout,
+        ).serve()
@@ -0,0 +1,221 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+import time
+from typing import Generator, Optional, Union
+
+from tcp_to_http import logger
+from tcp_to_http.tcplistener import DEFAULT_CHUNK_SIZE, DecodeStats, Line, LineFramer
+
+# `tail -F` for the line readers: keep reading a file as it grows.
+#
+# After EOF the file stays open and we wait for more data:
+# - Linux: inotify (through ctypes, the stdlib has no binding) wakes us up as soon as
+#   the file is written to, moved or deleted.
+# - Elsewhere, or when inotify is unavailable: poll with an adaptive backoff, from
+#   ``min_interval`` right after data arrived up to ``max_interval`` while idle.
+#
+# Truncation (copytruncate style rotation) and rotation by rename/re-create are
+# detected by comparing the open file with what the path points to now.
+#
+# ref:
+# - https://man7.org/linux/man-pages/man7/inotify.7.html
+# - https://docs.python.org/3/library/ctypes.html
+# - https://www.gnu.org/software/coreutils/manual/html_node/tail-invocation.html (--follow=name)
+
+# <sys/inotify.h>
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_WATCH_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_DELETE_SELF | _IN_MOVE_SELF
+
+
+class _Inotify:
+    """Minimal inotify watch on one path at a time."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        # IN_NONBLOCK and IN_CLOEXEC have the values of O_NONBLOCK and O_CLOEXEC
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._wd = -1
+
+    def watch(self, path: str) -> None:
+        if self._wd >= 0:
+            self._libc.inotify_rm_watch(self.fd, self._wd)  # fails harmlessly if the file is gone
+        self._wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if self._wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+
+    def wait(self, timeout: float) -> None:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            # The events themselves don't matter, the caller looks at the file; just drain them
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def reset(self) -> None:
+        pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _Backoff:
+    """Polling fallback: sleep ``min_interval``, doubling up to ``max_interval`` while nothing happens."""
+
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._interval = min_interval
+
+    def watch(self, path: str) -> None:
+        pass
+
+    def wait(self, timeout: float) -> None:
+        time.sleep(min(self._interval, timeout))
+        self._interval = min(self._interval * 2, self.max_interval)
+
+    def reset(self) -> None:
+        self._interval = self.min_interval
+
+    def close(self) -> None:
+        pass
+
+
+def _make_waiter(use_inotify: Optional[bool], min_interval: float, max_interval: float):
+    if use_inotify is None:
+        use_inotify = sys.platform.startswith("linux")
+    if use_inotify:
+        try:
+            return _Inotify()
+        except (OSError, AttributeError) as e:  # AttributeError: libc without inotify_init1
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+    return _Backoff(min_interval, max_interval)
+
+
+def follow_lines(
+    path: Union[str, os.PathLike],
+    mode: str = "str",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    from_end: bool = False,
+    use_inotify: Optional[bool] = None,
+    min_interval: float = 0.01,
+    max_interval: float = 1.0,
+    stop: Optional[threading.Event] = None,
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+) -> Generator[Line, None, None]:
+    r"""
+    Yield the lines of a file and keep yielding new ones as it grows, like ``tail -F``.
+
+    Lines are framed like `get_lines_from_reader()` (split on LF, trailing CR stripped),
+    except that an unterminated last line is held back until its newline arrives: the
+    writer may be in the middle of it. It is flushed when the file is truncated or
+    rotated away, since nothing will be appended to it anymore.
+
+    - Truncation (size below what was read): reading restarts at the top.
+    - Rotation (the path now names a different file, or is missing): the old file is
+      read to its end, then the new one is opened from its start as soon as it exists.
+
+    .. code-block:: python
+
+        for line in follow_lines("/var/log/app.log"):
+            sink.send(line)
+
+    :param path: str
+        The file to follow. It must exist when following starts.
+    :param mode: str
+        ``"str"`` or ``"bytes"``.
+    :param chunk_size: int
+        Most bytes per read.
+    :param from_end: bool
+        Skip what the file already holds and only yield lines written from now on.
+    :param use_inotify: bool
+        ``None`` picks inotify on Linux, ``False`` forces polling.
+    :param min_interval: float
+        First polling delay after data arrived (polling fallback).
+    :param max_interval: float
+        Longest wait between checks for truncation, rotation and ``stop``.
+    :param stop: threading.Event
+        Set it from another thread to end the generator (it returns within ``max_interval``).
+    :param encoding: str
+        Encoding of the lines in ``"str"`` mode.
+    :param errors: str
+        Policy for malformed lines, see `get_lines_from_reader()`; the default drops them.
+    :param stats: DecodeStats
+        Where malformed lines are counted.
+
+    :yield: str or bytes
+        Lines without trailing newline characters.
+    """
+    path = os.fspath(path)
+    framer = LineFramer(mode, encoding=encoding, errors=errors, stats=stats)
+    waiter = _make_waiter(use_inotify, min_interval, max_interval)
+    f = open(path, "rb", buffering=0)
+    try:
+        waiter.watch(path)
+        if from_end:
+            f.seek(0, os.SEEK_END)
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while stop is None or not stop.is_set():
+            n = f.readinto(view)
+            if n:
+                waiter.reset()
+                yield from framer.feed(view[:n])
+                continue
+
+            # At EOF: has the file been truncated or replaced?
+            position = f.tell()
+            if os.fstat(f.fileno()).st_size < position:
+                logger.info(f"{path} was truncated, reading from the top")
+                yield from framer.close()
+                f.seek(0)
+                continue
+            if _rotated(path, f):
+                # Whatever the old file still holds was read above; switch over
+                yield from framer.close()
+                new_f = _reopen(path)
+                if new_f is None:
+                    waiter.wait(max_interval)
+                    continue
+                logger.info(f"{path} was rotated, following the new file")
+                f.close()
+                f = new_f
+                waiter.watch(path)
+                continue
+
+            waiter.wait(max_interval)
+    finally:
+        f.close()
+        waiter.close()
+
+
+def _rotated(path: str, f) -> bool:
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return True
+    opened = os.fstat(f.fileno())
+    return (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino)
+
+
+def _reopen(path: str):
+    try:
+        return open(path, "rb", buffering=0)
+    except FileNotFoundError:
+        return None  # moved away, not re-created yet
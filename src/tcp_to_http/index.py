@@ -0,0 +1,243 @@
+import mmap
+import operator
+import os
+import struct
+import zlib
+from array import array
+from itertools import accumulate, islice, repeat
+from typing import List, Optional, Union
+
+from tcp_to_http.tcplistener import DecodeStats, Line, LineDecoder
+
+# Random access into big line files.
+#
+# The index is the byte offset of the start of every line, one unsigned 64-bit integer
+# per line in an `array("Q")`, so line N is one `pread()` away. It is kept in a sidecar
+# file next to the data ("<file>.idx") with a small header:
+#
+#   magic, file size and mtime when indexed, CRC-32 of the last indexed bytes, offset count
+#
+# A file that only grew (a capture still being written) is indexed incrementally from
+# where the last run stopped; anything else (shrunk, rewritten) is indexed from scratch.
+#
+# ref:
+# - https://docs.python.org/3/library/array.html
+# - https://docs.python.org/3/library/os.html#os.pread
+
+_MAGIC = b"TTHLIDX1"
+_HEADER = struct.Struct("<8sQqIQ")  # magic, size, mtime_ns, tail_crc, count
+# Bytes before the end of the indexed part that must be unchanged for an append
+_TAIL_CHECK_BYTES = 4096
+# Bytes scanned per step while indexing
+_SCAN_SIZE = 1 << 20
+
+
+class LineIndex:
+    r"""
+    Persistent line-offset index of a file.
+
+    `get_line()` and `get_lines()` read the lines asked for and nothing before them.
+
+    .. code-block:: python
+
+        with LineIndex("capture.txt") as index:   # builds or loads "capture.txt.idx"
+            print(len(index), index.get_line(1_000_000))
+            ...
+            index.refresh()                        # pick up lines appended since
+
+    Lines are framed like everywhere else: split on LF, a trailing CR is stripped, and
+    an unterminated last line counts as a line (until more is appended to it).
+
+    The index is checked against the file (size, mtime and a CRC of the last indexed
+    bytes) when it is opened and on every `refresh()`, not on every lookup.
+
+    :param path: str
+        The data file.
+    :param index_path: str
+        Where to keep the index, ``<path>.idx`` by default.
+    :param mode: str
+        ``"str"`` for decoded lines, ``"bytes"`` for raw ones.
+    :param encoding: str
+        Encoding of the lines in ``"str"`` mode; one whose newline is the byte ``\n``.
+    :param errors: str
+        Policy for malformed lines, see `get_lines_from_reader()`; the default drops them,
+        so `get_lines()` returns fewer lines than asked for and `get_line()` raises.
+    :param stats: DecodeStats
+        Where malformed lines are counted.
+    :param persist: bool
+        Write the index back to ``index_path`` whenever it changed.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        index_path: Optional[Union[str, os.PathLike]] = None,
+        mode: str = "str",
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        stats: Optional[DecodeStats] = None,
+        persist: bool = True,
+    ):
+        if mode not in ("str", "bytes"):
+            raise ValueError("mode must be 'str' or 'bytes'")
+        # Unknown encodings and error handlers raise `LookupError` here, not on the first lookup
+        self._decoder = LineDecoder(encoding, errors, stats) if mode == "str" else None
+        if self._decoder is not None and self._decoder.incremental:
+            raise ValueError("LineIndex splits on the byte b'\\n', which {} doesn't".format(encoding))
+        self.path = os.fspath(path)
+        self.index_path = os.fspath(index_path) if index_path is not None else self.path + ".idx"
+        self.mode = mode
+        self.persist = persist
+
+        # Start of every complete line, plus the end of the last one (the position
+        # after its newline), which is where the next line starts.
+        self._starts = array("Q", [0])
+        self._size = 0  # file size when last indexed
+        self._mtime_ns = 0
+        self._indexed_crc = 0  # CRC-32 of the last indexed bytes when last indexed
+        self._fd = os.open(self.path, os.O_RDONLY)
+        try:
+            loaded = self._load()
+            self.refresh(force_rebuild=not loaded)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def __len__(self) -> int:
+        """Number of lines, counting an unterminated last one."""
+        complete = len(self._starts) - 1
+        return complete + 1 if self._size > self._starts[-1] else complete
+
+    def __enter__(self) -> "LineIndex":
+        """Return the index itself."""
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Close the index (see `close()`)."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the data file; the index is not saved again."""
+        if self._fd != -1:
+            os.close(self._fd)
+            self._fd = -1
+
+    def refresh(self, force_rebuild: bool = False) -> int:
+        """
+        Bring the index up to date with the file.
+
+        :return: int
+            How many lines the file gained (or has, after a rebuild).
+        """
+        info = os.fstat(self._fd)
+        if not force_rebuild and info.st_size == self._size and info.st_mtime_ns == self._mtime_ns:
+            return 0
+        before = len(self)
+        if force_rebuild or not self._is_append(info.st_size):
+            self._starts = array("Q", [0])
+            before = 0
+        self._scan(info.st_size)
+        self._indexed_crc = self._tail_crc()
+        self._size = info.st_size
+        self._mtime_ns = info.st_mtime_ns
+        if self.persist:
+            self.save()
+        return len(self) - before
+
+    def offset(self, n: int) -> int:
+        """Byte offset where line ``n`` starts; ``offset(len(index))`` is the end of the file."""
+        if not 0 <= n <= len(self):
+            raise IndexError("line index out of range")
+        return self._starts[n] if n < len(self._starts) else self._size
+
+    def get_line(self, n: int) -> Line:
+        """Line ``n`` (0-based); `IndexError` past the end, `ValueError` if it was dropped as malformed."""
+        if not 0 <= n < len(self):
+            raise IndexError("line index out of range")
+        lines = self.get_lines(n, n + 1)
+        if not lines:
+            raise ValueError("Line {} is not valid {} (errors='strict')".format(n, self._decoder.encoding))
+        return lines[0]
+
+    def get_lines(self, start: int, stop: int) -> List[Line]:
+        """Lines ``start`` up to (not including) ``stop``, read with a single `pread()`."""
+        stop = min(stop, len(self))
+        if start < 0 or start >= stop:
+            return []
+        starts = self._starts
+        begin = starts[start]
+        end = starts[stop] if stop < len(starts) else self._size
+        data = os.pread(self._fd, end - begin, begin)
+        if data.endswith(b"\n"):
+            data = data[:-1]
+        if self._decoder is not None:
+            # The decoder drops (or repairs) and counts malformed lines
+            lines: List[Line] = self._decoder.decode_lines(data)
+            carriage_return: Union[str, bytes] = "\r"
+        else:
+            lines = data.split(b"\n")
+            carriage_return = b"\r"
+        if b"\r" in data:
+            lines = [line[:-1] if line.endswith(carriage_return) else line for line in lines]
+        return lines
+
+    def save(self) -> None:
+        """Write the index to ``index_path`` (atomically, through a temporary file)."""
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, self._size, self._mtime_ns, self._indexed_crc, len(self._starts)))
+            self._starts.tofile(f)
+        os.replace(tmp_path, self.index_path)
+
+    # ------------------------------------------------------------------ #
+
+    def _load(self) -> bool:
+        try:
+            with open(self.index_path, "rb") as f:
+                header = f.read(_HEADER.size)
+                if len(header) != _HEADER.size:
+                    return False
+                magic, size, mtime_ns, tail_crc, count = _HEADER.unpack(header)
+                if magic != _MAGIC:
+                    return False
+                starts = array("Q")
+                starts.fromfile(f, count)
+        except (OSError, EOFError):
+            return False
+
+        self._starts, self._size, self._mtime_ns, self._indexed_crc = starts, size, mtime_ns, tail_crc
+        return True
+
+    def _tail_crc(self) -> int:
+        end = self._starts[-1]
+        begin = max(0, end - _TAIL_CHECK_BYTES)
+        return zlib.crc32(os.pread(self._fd, end - begin, begin))
+
+    def _is_append(self, size: int) -> bool:
+        # Only growth with the last indexed bytes untouched is indexed incrementally;
+        # same size with a new mtime means the file was rewritten in place.
+        return size > self._size and self._tail_crc() == self._indexed_crc
+
+    def _scan(self, size: int) -> None:
+        """Append the start of every line completed between the last indexed newline and ``size``."""
+        position = self._starts[-1]
+        if position >= size:
+            return
+        # Map from the last indexed newline on; the offset must be a multiple of the granularity
+        base = position - position % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(self._fd, size - base, access=mmap.ACCESS_READ, offset=base) as mm:
+            starts = self._starts
+            scan = position - base
+            end = size - base
+            while scan < end:
+                cut = mm.rfind(b"\n", scan, scan + _SCAN_SIZE)
+                if cut == -1:
+                    # A line longer than the scan window
+                    cut = mm.find(b"\n", scan + _SCAN_SIZE)
+                    if cut == -1:
+                        break
+                # One split per window; the running sum of (line length + 1) is every
+                # next line's start, all computed in C.
+                lengths = map(operator.add, map(len, mm[scan:cut].split(b"\n")), repeat(1))
+                starts.extend(islice(accumulate(lengths, initial=base + scan), 1, None))
+                scan = cut + 1
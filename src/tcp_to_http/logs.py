@@ -0,0 +1,241 @@
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from tcp_to_http import logger
+
+# Opt-in asynchronous logging for the ``tcp_to_http`` logger.
+#
+# By default the package logger writes through a `StreamHandler`, so every
+# `logger.exception()` in an accept or read loop formats a traceback and writes it to
+# stderr inline. `setup_async_logging()` moves the handlers behind a queue:
+#
+#   logger -> RateLimitFilter -> QueueHandler -> queue -> QueueListener thread -> handlers
+#
+# - The calling thread only creates the record and puts it on a bounded queue; message
+#   arguments and tracebacks are formatted later, by the listener thread.
+# - Records from the same call site (and exception type) beyond ``burst`` per
+#   ``period`` seconds are dropped before they are even queued, and counted; the next
+#   one that gets through says how many were suppressed.
+# - A full queue drops records instead of blocking.
+#
+# ref:
+# - https://docs.python.org/3/library/logging.handlers.html#queuehandler
+# - https://docs.python.org/3/howto/logging-cookbook.html#dealing-with-handlers-that-block
+
+# Standard `LogRecord` attributes; anything else on a record came from ``extra=``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record, for log shippers::
+
+        {"time": "2024-05-01T12:00:00.123Z", "level": "ERROR", "logger": "tcp_to_http",
+         "message": "...", "thread": "Thread-3", "where": "server.py:294", "exc": "Traceback ..."}
+
+    Fields passed with ``extra={...}`` are included as they are (`str()` if they are not
+    JSON serializable), and so is ``suppressed`` from `RateLimitFilter`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """The record as one line of JSON."""
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + ".{:03d}Z".format(int(record.msecs)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "where": f"{record.filename}:{record.lineno}",
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and name not in entry:
+                entry[name] = value
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    r"""
+    Let at most ``burst`` records per ``period`` seconds through from each call site.
+
+    A call site is the logging call's file and line, plus the exception type for
+    `logger.exception()`: a client that resets its connection in a loop produces the
+    same record over and over, however many addresses it comes from. The first record
+    of the next window carries ``suppressed`` (and says so in its message).
+
+    :param burst: int
+        Records per call site and window.
+    :param period: float
+        Window length in seconds.
+    :param min_level: int
+        Records below this level are never limited (e.g. "Connected by" at INFO).
+    """
+
+    def __init__(self, burst: int = 10, period: float = 1.0, min_level: int = logging.WARNING):
+        super().__init__()
+        if burst < 1:
+            raise ValueError("burst must be >= 1")
+        self.burst = burst
+        self.period = period
+        self.min_level = min_level
+        # Records dropped so far, over all call sites
+        self.suppressed = 0
+        # call site -> [window start, records let through, records suppressed]
+        self._windows: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """``False`` if the record's call site is over its burst in the current window."""
+        if record.levelno < self.min_level:
+            return True
+        key = (record.pathname, record.lineno, record.exc_info[0] if record.exc_info else None)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+            record.args = (record.getMessage(), suppressed)
+            record.msg = "%s (%d similar message(s) suppressed)"
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """`QueueHandler` that neither formats in the caller's thread nor blocks on a full queue."""
+
+    def __init__(self, queue_: queue.Queue):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message and the traceback right here so the
+        # record can be pickled; ours stays in the process, so the listener does it.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogging:
+    r"""
+    What `setup_async_logging()` installed.
+
+    `stop()` (or leaving the ``with`` block) writes out what is queued and puts the
+    original handlers back.
+
+    ``dropped`` counts records lost to a full queue, ``rate_limit.suppressed`` the
+    ones the rate limit held back.
+    """
+
+    def __init__(
+        self,
+        target: logging.Logger,
+        handlers: List[logging.Handler],
+        formatter: Optional[logging.Formatter],
+        rate_limit: Optional[RateLimitFilter],
+        max_queue: int,
+    ):
+        self.logger = target
+        self.handlers = handlers
+        self.rate_limit = rate_limit
+        self._saved_handlers = list(target.handlers)
+        self._saved_formatters = [handler.formatter for handler in handlers]
+        if formatter is not None:
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+        self._queue_handler = _QueueHandler(queue.Queue(max_queue))
+        if rate_limit is not None:
+            self._queue_handler.addFilter(rate_limit)
+        self._listener = logging.handlers.QueueListener(
+            self._queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        self._listener.start()
+        for handler in self._saved_handlers:
+            target.removeHandler(handler)
+        target.addHandler(self._queue_handler)
+
+    @property
+    def dropped(self) -> int:
+        """Records lost to a full queue."""
+        return self._queue_handler.dropped
+
+    def stop(self) -> None:
+        """Write out what is queued and put the original handlers back; idempotent."""
+        if self._listener is None:
+            return
+        self.logger.removeHandler(self._queue_handler)
+        self._listener.stop()  # handles everything queued before returning
+        self._listener = None
+        for handler, formatter in zip(self.handlers, self._saved_formatters):
+            handler.setFormatter(formatter)
+        for handler in self._saved_handlers:
+            self.logger.addHandler(handler)
+
+    def __enter__(self) -> "AsyncLogging":
+        """Return the installed logging itself."""
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Stop (see `stop()`)."""
+        self.stop()
+
+
+def setup_async_logging(
+    handlers: Optional[List[logging.Handler]] = None,
+    json_format: bool = False,
+    rate_limit: Optional[Tuple[int, float]] = (10, 1.0),
+    max_queue: int = 10_000,
+    target: logging.Logger = logger,
+) -> AsyncLogging:
+    r"""
+    Make the ``tcp_to_http`` logger (or ``target``) log through a queue and a background thread.
+
+    .. code-block:: python
+
+        with setup_async_logging(json_format=True):
+            LineServer(backend="selectors").serve_forever()
+
+    :param handlers: List[logging.Handler]
+        Where records end up; by default the handlers ``target`` has now (the package's
+        stderr `StreamHandler`).
+    :param json_format: bool
+        Format with `JSONFormatter` instead of the handlers' own formatters.
+    :param rate_limit: Tuple[int, float]
+        ``(burst, period)`` for `RateLimitFilter` on WARNING and above; ``None`` disables it.
+    :param max_queue: int
+        Records waiting for the listener at most; more are dropped (``dropped``).
+
+    :return: AsyncLogging
+        Call ``.stop()`` to flush and restore the synchronous handlers.
+    """
+    if handlers is None:
+        handlers = list(target.handlers)
+    return AsyncLogging(
+        target,
+        handlers,
+        JSONFormatter() if json_format else None,
+        RateLimitFilter(*rate_limit) if rate_limit is not None else None,
+        max_queue,
+    )
@@ -0,0 +1,271 @@
+import bisect
+import math
+import threading
+import weakref
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from tcp_to_http import logger
+from tcp_to_http.tcplistener import HOST
+
+# In-process metrics with a Prometheus text endpoint.
+#
+# Counters and histograms are sharded per thread: every thread adds to its own cell
+# (a small list only it writes to), so updating needs no lock and never loses an
+# increment to another thread's read-modify-write. Reading sums the cells; cells of
+# threads that have exited are folded into a base value so thread-per-connection
+# servers don't accumulate them.
+#
+# Updates are meant to happen per read or per batch of lines, not per line: the
+# servers count bytes and lines per chunk and time the handler over a whole batch.
+#
+# ref:
+# - https://prometheus.io/docs/instrumenting/exposition_formats/#text-based-format
+# - https://prometheus.io/docs/practices/naming/
+
+# Content-Type of `Registry.render()`
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Where `serve_metrics()` listens by default, next to the line server's 42069
+METRICS_PORT = 42070
+# Handler time per line: 1 us to 1 s
+DEFAULT_BUCKETS = (
+    0.000001,
+    0.0000025,
+    0.000005,
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+
+class _Sharded:
+    """Per-thread cells of ``size`` numbers, summed on read."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._base = [0] * size  # what threads that have exited left behind
+        self._cells: List[Tuple[weakref.ref, list]] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()  # only taken to add a thread's cell and to read
+
+    def _cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            with self._lock:
+                self._cells.append((weakref.ref(threading.current_thread()), cell))
+            self._local.cell = cell
+            return cell
+
+    def _totals(self) -> list:
+        with self._lock:
+            live = []
+            for thread_ref, cell in self._cells:
+                thread = thread_ref()
+                if thread is None or not thread.is_alive():
+                    # It won't write again: fold its cell in and forget it
+                    self._base = [a + b for a, b in zip(self._base, cell)]
+                else:
+                    live.append((thread_ref, cell))
+            self._cells = live
+            totals = list(self._base)
+            for _, cell in live:
+                totals = [a + b for a, b in zip(totals, cell)]
+            return totals
+
+
+class Counter(_Sharded):
+    """A monotonically increasing count, e.g. bytes received."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(1)
+        self.name = name
+        self.help = description
+
+    def inc(self, amount: float = 1) -> None:
+        """Add ``amount``, to this thread's cell only."""
+        try:
+            self._local.cell[0] += amount
+        except AttributeError:
+            self._cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        """The total over every thread."""
+        return self._totals()[0]
+
+    def samples(self) -> List[Tuple[str, float]]:
+        """The ``(name, value)`` pairs to render."""
+        return [(self.name, self.value)]
+
+
+class Histogram(_Sharded):
+    r"""
+    Observations counted into fixed buckets, e.g. handler time per line.
+
+    :param buckets: Sequence[float]
+        Upper bounds, ascending; ``+Inf`` is implied.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError("buckets must be a non-empty ascending sequence")
+        self.bounds = [float(b) for b in buckets if b != math.inf]
+        # One cell: a count per bucket, the +Inf bucket, then the sum
+        super().__init__(len(self.bounds) + 2)
+        self.name = name
+        self.help = description
+
+    def observe(self, value: float, count: int = 1) -> None:
+        """Record ``value`` ``count`` times (e.g. the mean time per line of a batch of ``count`` lines)."""
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._cell()
+        cell[bisect.bisect_left(self.bounds, value)] += count
+        cell[-1] += value * count
+
+    def samples(self) -> List[Tuple[str, float]]:
+        """Cumulative ``_bucket`` counts, then ``_sum`` and ``_count``."""
+        totals = self._totals()
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + [math.inf], totals):
+            cumulative += count
+            samples.append(('{}_bucket{{le="{}"}}'.format(self.name, _format(bound)), cumulative))
+        samples.append((self.name + "_sum", totals[-1]))
+        samples.append((self.name + "_count", cumulative))
+        return samples
+
+
+class Callback:
+    """A value read from ``fn`` at scrape time, e.g. the number of open connections."""
+
+    def __init__(self, name: str, description: str, fn: Callable[[], float], kind: str = "gauge"):
+        if kind not in ("gauge", "counter"):
+            raise ValueError("kind must be 'gauge' or 'counter'")
+        self.name = name
+        self.help = description
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> List[Tuple[str, float]]:
+        """Call ``fn`` for the current value."""
+        return [(self.name, self.fn())]
+
+
+class Registry:
+    """
+    A set of metrics rendered together.
+
+    .. code-block:: python
+
+        registry = Registry()
+        server = LineServer(metrics=registry)
+        serve_metrics(registry)   # GET http://127.0.0.1:42070/metrics
+        server.serve_forever()
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError("A metric named {!r} is already registered".format(metric.name))
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        """Register a new `Counter`; `ValueError` if the name is taken."""
+        return self._add(Counter(name, description))
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Register a new `Histogram`; `ValueError` if the name is taken."""
+        return self._add(Histogram(name, description, buckets))
+
+    def callback(self, name: str, description: str, fn: Callable[[], float], kind: str = "gauge") -> Callback:
+        """Register a new `Callback`; `ValueError` if the name is taken."""
+        return self._add(Callback(name, description, fn, kind))
+
+    def get(self, name: str):
+        """The metric registered as ``name``, or ``None``."""
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        out = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:  # a failing callback must not break the whole scrape
+                logger.exception(e)
+                continue
+            out.append("# HELP {} {}".format(metric.name, metric.help.replace("\\", "\\\\").replace("\n", "\\n")))
+            out.append("# TYPE {} {}".format(metric.name, metric.kind))
+            out.extend("{} {}".format(name, _format(value)) for name, value in samples)
+        return "\n".join(out) + "\n"
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def metrics_handler(registry: Registry, path: str = "/metrics"):
+    """An `HTTPServer` handler that answers ``GET <path>`` with the registry, 404 otherwise."""
+    from tcp_to_http.connection import Response  # lazy: connection imports the server, which imports us
+
+    def _handler(request, body) -> Response:
+        body.drain()
+        if request.target.split("?", 1)[0] != path:
+            return Response(404, b"Not Found\n")
+        if request.method not in ("GET", "HEAD"):
+            return Response(405, b"Method Not Allowed\n", {"Content-Type": "text/plain", "Allow": "GET, HEAD"})
+        return Response(200, registry.render().encode(), {"Content-Type": CONTENT_TYPE})
+
+    return _handler
+
+
+def serve_metrics(registry: Registry, host: str = HOST, port: int = METRICS_PORT, **kwargs):
+    """
+    Serve ``/metrics`` with the project's `HTTPServer` on a background thread.
+
+    How to run:
+
+    1. Run `uv run python -c "from tcp_to_http.server import serve; serve('selectors', metrics_port=42070)"`
+    2. In another terminal run `curl http://127.0.0.1:42070/metrics`
+
+    :return: HTTPServer
+        Already bound (so ``port=0`` works, see ``.address``); call ``.shutdown()`` to stop it.
+    """
+    from tcp_to_http.connection import HTTPServer
+
+    server = HTTPServer(host=host, port=port, handler=metrics_handler(registry), **kwargs)
+    server.bind()
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{server.address[0]}:{server.address[1]}/metrics")
+    return server
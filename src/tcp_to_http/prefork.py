@@ -0,0 +1,175 @@
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from tcp_to_http import logger
+from tcp_to_http.server import LineServer, create_listener
+from tcp_to_http.tcplistener import HOST, PORT
+
+# One Python process only ever runs Python code on one core at a time (the GIL),
+# so to use all cores the listener runs as N worker processes:
+#
+# - reuse_port=True:  every worker binds HOST:PORT itself with SO_REUSEPORT and the
+#                     kernel spreads new connections evenly across their sockets.
+# - reuse_port=False: the supervisor binds once and the workers inherit the listening
+#                     socket through fork(); they all accept() from the same queue.
+#
+# ref:
+# - https://docs.python.org/3/library/os.html#os.fork
+# - https://lwn.net/Articles/542629/ (The SO_REUSEPORT socket option)
+
+ServerFactory = Callable[..., LineServer]
+
+
+class Supervisor:
+    r"""
+    Pre-fork supervisor: runs ``workers`` server processes and keeps them running.
+
+    - A worker that dies is restarted (after ``restart_delay`` if it crashed within
+      a second of starting, so a broken config doesn't fork-bomb).
+    - SIGTERM / SIGINT to the supervisor is forwarded to every worker as SIGTERM, which
+      triggers the server's graceful drain. Workers still alive after
+      ``graceful_timeout`` are killed.
+
+    :param factory: Callable[..., LineServer]
+        Builds the server inside each worker. Called with ``host``, ``port`` and
+        ``backlog`` plus either ``reuse_port=True`` or ``sock=<inherited socket>``,
+        e.g. ``LineServer`` itself, `HTTPServer`, or a ``functools.partial`` of either.
+    :param workers: int
+        Number of worker processes (defaults to the number of CPUs).
+    :param reuse_port: bool
+        ``SO_REUSEPORT`` per worker (True) or one inherited socket (False).
+    :param listen_options: dict
+        More `create_listener()` arguments (``dual_stack``, ``rcvbuf``, ``sndbuf``) for
+        the inherited socket; with ``reuse_port`` the factory binds, so pass them to it.
+    """
+
+    def __init__(
+        self,
+        factory: ServerFactory = LineServer,
+        workers: Optional[int] = None,
+        host: str = HOST,
+        port: int = PORT,
+        backlog: int = 128,
+        reuse_port: bool = True,
+        graceful_timeout: float = 10.0,
+        restart_delay: float = 1.0,
+        listen_options: Optional[dict] = None,
+    ):
+        self.factory = factory
+        self.workers = workers or os.cpu_count() or 1
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.graceful_timeout = graceful_timeout
+        self.restart_delay = restart_delay
+        self.listen_options = listen_options or {}
+
+        self._sock: Optional[socket.socket] = None
+        self._children: Dict[int, int] = {}  # pid -> worker index
+        self._started: Dict[int, float] = {}  # worker index -> start time
+        self._restarts: Dict[int, float] = {}  # worker index -> when to restart it
+        self._stopping = False
+
+    def run(self) -> None:
+        """Start the workers and supervise them until SIGTERM/SIGINT; blocks."""
+        if not self.reuse_port:
+            self._sock = create_listener(self.host, self.port, self.backlog, **self.listen_options)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+
+        mode = "SO_REUSEPORT" if self.reuse_port else "inherited socket"
+        logger.info(f"Supervisor {os.getpid()} starting {self.workers} workers on {self.host}:{self.port} ({mode})")
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            self._supervise()
+        finally:
+            if self._sock is not None:
+                self._sock.close()
+            logger.info("Supervisor stopped")
+
+    def _on_signal(self, signum, frame) -> None:
+        if not self._stopping:
+            logger.info(f"Received signal {signum}, draining workers")
+            self._stopping = True
+            self._signal_children(signal.SIGTERM)
+
+    def _supervise(self) -> None:
+        deadline = None
+        while self._children or (self._restarts and not self._stopping):
+            if self._stopping and deadline is None:
+                deadline = time.monotonic() + self.graceful_timeout
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning(f"{len(self._children)} worker(s) did not stop in time, killing them")
+                self._signal_children(signal.SIGKILL)
+                deadline = float("inf")
+
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid, status = 0, 0
+            if pid == 0:
+                self._restart_due()
+                time.sleep(0.1)
+                continue
+
+            index = self._children.pop(pid)
+            if self._stopping:
+                continue
+            code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+            lived = time.monotonic() - self._started[index]
+            delay = self.restart_delay if lived < 1.0 else 0.0
+            logger.warning(f"Worker {index} (pid {pid}) exited with {code} after {lived:.1f}s, restarting")
+            self._restarts[index] = time.monotonic() + delay
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        for index, when in list(self._restarts.items()):
+            if when <= now and not self._stopping:
+                del self._restarts[index]
+                self._spawn(index)
+
+    def _signal_children(self, signum: int) -> None:
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self._children[pid] = index
+            self._started[index] = time.monotonic()
+            return
+
+        # --- in the worker ---
+        code = 0
+        try:
+            code = self._run_worker(index)
+        except Exception as e:
+            logger.exception(e)
+            code = 1
+        finally:
+            # os._exit() skips interpreter cleanup, so flush what the handlers printed,
+            # and never fall back into the supervisor's code in the child
+            sys.stdout.flush()
+            os._exit(code)
+
+    def _run_worker(self, index: int) -> int:
+        # Ctrl+C reaches the whole process group; let the supervisor decide, it forwards SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if self.reuse_port:
+            server = self.factory(host=self.host, port=self.port, backlog=self.backlog, reuse_port=True)
+        else:
+            server = self.factory(host=self.host, port=self.port, backlog=self.backlog, sock=self._sock)
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+        logger.info(f"Worker {index} started (pid {os.getpid()})")
+        server.serve_forever()
+        return 0
@@ -0,0 +1,338 @@
+import io
+import mmap
+import os
+import socket
+import stat
+from typing import Callable, Generator, Iterator, List, Optional, Union
+
+from tcp_to_http.follow import follow_lines
+from tcp_to_http.tcplistener import (
+    DEFAULT_CHUNK_SIZE,
+    LINE_MODES,
+    DecodeStats,
+    Line,
+    LineDecoder,
+    _frame_chunks,
+    _get_read_into,
+)
+
+# One line-reading API over the strategies explored in `scripts/read_lines.py`.
+#
+# Every backend frames lines the same way as `get_lines_from_reader()`: split on LF,
+# a trailing CR is stripped, the final unterminated line is kept, and lines come out
+# as ``str``, ``bytes`` or ``memoryview`` depending on ``mode``. In ``"str"`` mode they
+# all decode through a `LineDecoder`, so a malformed line is dropped (or repaired, per
+# ``errors``) and counted the same way whichever backend read it.
+#
+# - "buffered": the built-in buffered file object, `for line in f` (C readline).
+# - "readinto": `readinto()`/`recv_into()` into one reused buffer, the framing engine
+#               of `get_lines_from_reader()`.
+# - "os.read":  raw `os.read(fd, n)` syscalls; each chunk is a new bytes object that is
+#               copied into the framing buffer.
+# - "mmap":     map the whole file and split it in place: no read syscalls and no copy
+#               into a buffer. Regular files only.
+# - "auto":     mmap for regular files of at least ``mmap_threshold`` bytes, readinto for
+#               everything else (small files, pipes, sockets, terminals).
+#
+# ref:
+# - https://docs.python.org/3/library/mmap.html
+# - https://docs.python.org/3/library/os.html#os.read
+# - https://docs.python.org/3/library/stat.html#stat.S_ISREG
+BACKENDS = ("auto", "buffered", "readinto", "os.read", "mmap")
+
+# Below this, mapping (and unmapping) a file costs more than reading it
+MMAP_THRESHOLD = 1 << 20
+
+Source = Union[str, bytes, os.PathLike, int, io.RawIOBase, socket.socket]
+
+
+def choose_backend(fd: int, mmap_threshold: int = MMAP_THRESHOLD) -> str:
+    """What ``backend="auto"`` resolves to for an open file descriptor."""
+    info = os.fstat(fd)
+    if stat.S_ISREG(info.st_mode) and info.st_size >= mmap_threshold:
+        return "mmap"
+    return "readinto"
+
+
+def read_lines(
+    source: Source,
+    backend: str = "auto",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mode: str = "str",
+    mmap_threshold: int = MMAP_THRESHOLD,
+    follow: bool = False,
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+) -> Iterator[Line]:
+    r"""
+    Iterate over the lines of a file, pipe or socket with a selectable read strategy.
+
+    .. code-block:: python
+
+        for line in read_lines("messages.txt"):             # picks the fastest backend
+            ...
+        for line in read_lines(sys.stdin.fileno()):         # a pipe -> readinto
+            ...
+        for line in read_lines(conn, backend="os.read"):    # a socket, forced backend
+            ...
+        for line in read_lines("app.log", follow=True):     # tail -F, never ends
+            ...
+
+    Line lifetimes follow `get_lines_from_reader()`. In ``"view"`` mode the mmap backend
+    hands out views of the mapping itself, which stay valid while they are referenced.
+
+    :param source: str or os.PathLike or int or stream or socket
+        A path (opened and closed here), or an open file descriptor, binary stream or
+        socket (left open). Streams without a ``.fileno()`` only support ``"readinto"``
+        (and ``"auto"``).
+    :param backend: str
+        One of ``"auto"``, ``"buffered"``, ``"readinto"``, ``"os.read"``, ``"mmap"``.
+    :param chunk_size: int
+        Bytes per read, or per split for mmap.
+    :param mode: str
+        One of ``"str"``, ``"bytes"`` or ``"view"``.
+    :param mmap_threshold: int
+        Smallest regular file ``"auto"`` maps instead of reading.
+    :param follow: bool
+        Keep waiting for new lines at EOF, see `tcp_to_http.follow.follow_lines()`.
+        Paths only, and ``backend`` doesn't apply (it reads with `readinto()`).
+    :param encoding: str
+        Encoding of the lines in ``"str"`` mode. Encodings whose newline isn't the
+        byte ``\n`` (UTF-16, ...) need the ``"readinto"`` or ``"os.read"`` backend
+        (``"auto"`` picks ``"readinto"`` for them).
+    :param errors: str
+        Policy for malformed lines, see `get_lines_from_reader()`; the default drops them.
+    :param stats: DecodeStats
+        Where malformed lines are counted.
+
+    :return: Iterator[str] or Iterator[bytes] or Iterator[memoryview]
+        Lines without trailing newline characters. Files are opened lazily, so a
+        missing path raises `FileNotFoundError` on the first ``next()``.
+
+    :raise ValueError: on an unknown backend or mode, or a backend the source (or
+        ``encoding``) can't use.
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend {!r}, expected one of {}".format(backend, BACKENDS))
+    if mode not in LINE_MODES:
+        raise ValueError("mode must be one of {}".format(LINE_MODES))
+    # Unknown encodings and error handlers raise `LookupError` here, not on the first line
+    decoder = LineDecoder(encoding, errors, stats) if mode == "str" else None
+    if decoder is not None and decoder.incremental:
+        if backend in ("buffered", "mmap"):
+            raise ValueError("The {!r} backend splits on the byte b'\\n', which {} doesn't".format(backend, encoding))
+        if backend == "auto":
+            backend = "readinto"
+    if follow:
+        if not isinstance(source, (str, bytes, os.PathLike)):
+            raise ValueError("follow=True needs a path (rotation is detected by name)")
+        if mode == "view":
+            raise ValueError("follow=True supports the 'str' and 'bytes' modes")
+        return follow_lines(source, mode=mode, chunk_size=chunk_size, encoding=encoding, errors=errors, stats=stats)
+    if isinstance(source, (str, bytes, os.PathLike)):
+        return _read_path(source, backend, chunk_size, mode, mmap_threshold, decoder)
+
+    fd = source if isinstance(source, int) else _fileno(source)
+    if fd is None:
+        if backend not in ("auto", "readinto"):
+            raise ValueError("The {!r} backend needs a source with a file descriptor".format(backend))
+        return _read_into_lines(_get_read_into(source), chunk_size, mode, decoder)
+    if backend == "readinto" and not isinstance(source, int):
+        # Keep the stream's own readinto()/recv_into(), e.g. a socket with a timeout
+        return _read_into_lines(_get_read_into(source), chunk_size, mode, decoder)
+    return _read_fd(fd, backend, chunk_size, mode, mmap_threshold, decoder)
+
+
+def _fileno(stream) -> Optional[int]:
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError):  # io.UnsupportedOperation is both
+        return None
+
+
+def _read_path(
+    path: Union[str, bytes, os.PathLike],
+    backend: str,
+    chunk_size: int,
+    mode: str,
+    mmap_threshold: int,
+    decoder: Optional[LineDecoder],
+) -> Generator[Line, None, None]:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        yield from _read_fd(fd, backend, chunk_size, mode, mmap_threshold, decoder)
+    finally:
+        os.close(fd)
+
+
+def _read_fd(
+    fd: int, backend: str, chunk_size: int, mode: str, mmap_threshold: int, decoder: Optional[LineDecoder]
+) -> Iterator[Line]:
+    if backend == "auto":
+        backend = choose_backend(fd, mmap_threshold)
+    if backend == "buffered":
+        return _buffered_lines(fd, mode, decoder)
+    if backend == "mmap":
+        return _mmap_lines(fd, 0, None, chunk_size, mode, decoder)
+    if backend == "os.read":
+        return _read_into_lines(_os_read_into(fd), chunk_size, mode, decoder)
+    # closefd=False: the descriptor belongs to the caller (or to `_read_path()`)
+    return _read_into_lines(io.FileIO(fd, "rb", closefd=False).readinto, chunk_size, mode, decoder)
+
+
+def _read_into_lines(
+    read_into: Callable[[memoryview], Optional[int]], chunk_size: int, mode: str, decoder: Optional[LineDecoder]
+) -> Generator[Line, None, None]:
+    for lines, _ in _frame_chunks(read_into, chunk_size, mode, decoder=decoder):
+        yield from lines
+
+
+def _os_read_into(fd: int) -> Callable[[memoryview], int]:
+    read = os.read
+
+    def _copy_into(view: memoryview) -> int:
+        data = read(fd, len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    return _copy_into
+
+
+def _buffered_lines(fd: int, mode: str, decoder: Optional[LineDecoder]) -> Generator[Line, None, None]:
+    encoding = decoder.encoding if decoder is not None else None
+    with open(fd, "rb", closefd=False) as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                line = line[:-2] if line.endswith(b"\r\n") else line[:-1]
+            elif line.endswith(b"\r"):
+                line = line[:-1]
+            if mode == "str":
+                try:
+                    text = str(line, encoding)
+                except UnicodeDecodeError:
+                    # Dropped or repaired, and counted, per the decoder's ``errors``
+                    yield from decoder.decode_lines(line)
+                    continue
+                yield text
+            elif mode == "bytes":
+                yield line
+            else:
+                yield memoryview(line)
+
+
+def mmap_lines(
+    fd: int,
+    start: int = 0,
+    stop: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mode: str = "str",
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+) -> Generator[Line, None, None]:
+    r"""
+    Lines of the byte range ``[start, stop)`` of a regular file (the ``"mmap"`` backend of `read_lines()`).
+
+    They are split in place in a read-only mapping of just that range. Ranges let
+    several processes share one file (see `tcp_to_http.scan`): ``start`` should be the
+    first byte of a line and ``stop`` the byte after a newline (or the end of the file),
+    otherwise the lines at the edges come out cut.
+
+    :param fd: int
+        An open regular file.
+    :param start: int
+        First byte of the range.
+    :param stop: int
+        End of the range, the end of the file by default.
+    :param chunk_size: int
+        Bytes split per step.
+    :param mode: str
+        One of ``"str"``, ``"bytes"`` or ``"view"``.
+    :param encoding: str
+        Encoding of the lines in ``"str"`` mode; one whose newline is the byte ``\n``.
+    :param errors: str
+        Policy for malformed lines, see `get_lines_from_reader()`; the default drops them.
+    :param stats: DecodeStats
+        Where malformed lines are counted.
+
+    :yield: str or bytes or memoryview
+        Lines without trailing newline characters.
+    """
+    decoder = LineDecoder(encoding, errors, stats) if mode == "str" else None
+    if decoder is not None and decoder.incremental:
+        raise ValueError("mmap_lines() splits on the byte b'\\n', which {} doesn't".format(encoding))
+    return _mmap_lines(fd, start, stop, chunk_size, mode, decoder)
+
+
+def _mmap_lines(
+    fd: int, start: int, stop: Optional[int], chunk_size: int, mode: str, decoder: Optional[LineDecoder]
+) -> Generator[Line, None, None]:
+    info = os.fstat(fd)
+    if not stat.S_ISREG(info.st_mode):
+        raise ValueError("The 'mmap' backend needs a regular file")
+    stop = info.st_size if stop is None else min(stop, info.st_size)
+    if start >= stop:
+        return  # nothing to read (and empty files can't be mapped)
+
+    # The mapping has to start at a multiple of the allocation granularity
+    base = start - start % mmap.ALLOCATIONGRANULARITY
+    mm = mmap.mmap(fd, stop - base, access=mmap.ACCESS_READ, offset=base)
+    view = memoryview(mm)
+    try:
+        # Same shape as `_frame_chunks()`, except the "buffer" is the whole range: each step
+        # takes the complete lines of the next ``chunk_size`` bytes and splits them in one go.
+        decode = mode == "str"
+        new_line_char, carriage_return = ("\n", "\r") if decode else (b"\n", b"\r")
+        start -= base
+        size = stop - base
+        while start < size:
+            cut = mm.rfind(b"\n", start, start + chunk_size)
+            if cut == -1:
+                # A line longer than chunk_size
+                cut = mm.find(b"\n", start + chunk_size)
+                if cut == -1:
+                    break
+
+            if mode == "view":
+                while start <= cut:
+                    new_line = mm.find(b"\n", start, cut + 1)
+                    line_end = new_line - 1 if new_line > start and mm[new_line - 1] == 13 else new_line
+                    yield view[start:line_end]
+                    start = new_line + 1
+                continue
+
+            block = view[start:cut]
+            try:
+                text = str(block, decoder.encoding) if decode else bytes(block)
+            except UnicodeDecodeError:
+                # Rare: the decoder drops (or repairs) and counts the malformed line(s)
+                text = None
+                lines: List[Line] = [
+                    line[:-1] if line.endswith(carriage_return) else line for line in decoder.decode_lines(block)
+                ]
+            block.release()
+            if text is not None:
+                lines = text.split(new_line_char)
+                # Look for CR in the copy: mmap.find() is a plain byte loop, `in` uses memchr
+                if carriage_return in text:
+                    lines = [line[:-1] if line.endswith(carriage_return) else line for line in lines]
+            yield from lines
+            start = cut + 1
+
+        # The last line, if the range doesn't end with a newline
+        if start < size:
+            end = size - 1 if mm[size - 1] == 13 else size
+            last_line = view[start:end]
+            if decode:
+                yield from decoder.decode_lines(last_line)
+            elif mode == "bytes":
+                yield bytes(last_line)
+            else:
+                yield last_line
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            pass  # "view" lines still reference it; it is unmapped once they are gone
@@ -0,0 +1,211 @@
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from tcp_to_http.index import LineIndex
+from tcp_to_http.scan import count_lines
+from tcp_to_http.tcplistener import HOST, PORT
+
+# Replay a capture to a TCP endpoint, e.g. as a load generator for `LineServer`.
+#
+# The file goes from the page cache to the socket with sendfile(2): no read() into
+# Python, no copy through user space. `socket.sendfile()` uses `os.sendfile()` where
+# the platform has it and falls back to plain send() elsewhere.
+#
+# Pacing by lines needs line boundaries, which come from a `LineIndex`: every tick
+# the lines that are due go out as one sendfile() of their byte range.
+#
+# ref:
+# - https://docs.python.org/3/library/socket.html#socket.socket.sendfile
+# - https://man7.org/linux/man-pages/man2/sendfile.2.html
+
+# Shortest pause between two paced sends; more lines per send above 1/_MIN_TICK lines/s
+_MIN_TICK = 0.001
+
+
+def _send_paced(sock: socket.socket, f, index: LineIndex, rate: float) -> None:
+    total = len(index)
+    sent = 0
+    start = time.perf_counter()
+    while sent < total:
+        due = min(total, int((time.perf_counter() - start) * rate) + 1)
+        if due > sent:
+            begin, end = index.offset(sent), index.offset(due)
+            sock.sendfile(f, begin, end - begin)
+            sent = due
+        # Sleep until the next line is due
+        delay = sent / rate - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(max(delay, _MIN_TICK))
+
+
+def _replay_connection(
+    address: Tuple[str, int],
+    path: str,
+    index: Optional[LineIndex],
+    rate: float,
+    loops: int,
+    wait_close: float,
+    ready: threading.Barrier,
+    stats: dict,
+) -> None:
+    size = os.path.getsize(path)
+    with socket.create_connection(address) as sock, open(path, "rb") as f:
+        ready.wait()  # every connection starts sending at the same time
+        start = time.perf_counter()
+        for _ in range(loops):
+            if index is not None:
+                _send_paced(sock, f, index, rate)
+            else:
+                sock.sendfile(f, 0, size)
+            stats["bytes"] += size
+        # Half-close and wait for the server to close its side, so the clock includes
+        # the time it needed to get through everything we sent.
+        sock.shutdown(socket.SHUT_WR)
+        if wait_close:
+            sock.settimeout(wait_close)
+            try:
+                while sock.recv(65536):
+                    pass
+            except socket.timeout:
+                pass
+        stats["seconds"] = time.perf_counter() - start
+
+
+def replay(
+    path: str,
+    host: str = HOST,
+    port: int = PORT,
+    connections: int = 1,
+    rate: float = 0.0,
+    loops: int = 1,
+    wait_close: float = 10.0,
+) -> dict:
+    r"""
+    Stream a file to ``host:port`` over ``connections`` parallel connections.
+
+    :param path: str
+        The file to replay, sent as is.
+    :param connections: int
+        Connections opened at once, each one sends the whole file (``loops`` times).
+    :param rate: float
+        Lines per second per connection; ``0`` sends as fast as the kernel allows.
+    :param loops: int
+        How many times each connection sends the file.
+    :param wait_close: float
+        Seconds to wait for the server to close after we half-closed (``0`` doesn't wait).
+
+    :return: dict
+        Counters: ``connections``, ``lines``, ``bytes``, ``seconds`` (the slowest
+        connection) and ``failed`` connections.
+    """
+    if connections < 1:
+        raise ValueError("connections must be >= 1")
+    index = None
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if rate > 0:
+            index = LineIndex(path, persist=False)
+            lines = len(index)
+        else:
+            lines = count_lines(fd, 0, size)
+        # Without a trailing newline the last line runs into the first one of the next loop
+        partial = 1 if size and os.pread(fd, 1, size - 1) != b"\n" else 0
+    finally:
+        os.close(fd)
+
+    ready = threading.Barrier(connections)
+    per_connection: List[dict] = [{"bytes": 0, "seconds": 0.0, "error": None} for _ in range(connections)]
+
+    def _run(stats: dict) -> None:
+        try:
+            _replay_connection((host, port), path, index, rate, loops, wait_close, ready, stats)
+        except (OSError, threading.BrokenBarrierError) as e:
+            stats["error"] = e
+            ready.abort()
+
+    threads = [threading.Thread(target=_run, args=(stats,), daemon=True) for stats in per_connection]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if index is not None:
+            index.close()
+
+    ok = [stats for stats in per_connection if stats["error"] is None]
+    for stats in per_connection:
+        if stats["error"] is not None and not isinstance(stats["error"], threading.BrokenBarrierError):
+            print(f"Connection failed: {stats['error']}", file=sys.stderr)
+    return {
+        "connections": len(ok),
+        "failed": connections - len(ok),
+        "lines": ((lines - partial) * loops + partial) * len(ok),
+        "bytes": sum(stats["bytes"] for stats in ok),
+        "seconds": max((stats["seconds"] for stats in ok), default=0.0),
+    }
+
+
+def report(stats: dict) -> None:
+    """Print the throughput of a `replay()` run."""
+    seconds = stats["seconds"] or 1e-9
+    print(
+        "Replayed {lines:,} lines ({bytes:,} bytes) over {connections} connection(s) in {seconds:.3f}s".format(**stats),
+        file=sys.stderr,
+    )
+    print(
+        "{:,.0f} lines/s, {:.2f} MB/s{}".format(
+            stats["lines"] / seconds,
+            stats["bytes"] / seconds / 1e6,
+            ", {} connection(s) failed".format(stats["failed"]) if stats["failed"] else "",
+        ),
+        file=sys.stderr,
+    )
+
+
+def cli() -> None:
+    """
+    Command line for the replay tool.
+
+    How to run:
+
+    1. Start a server, e.g. `uv run python -c "from tcp_to_http.server import serve; serve('selectors')" > /dev/null`
+    2. Run `uv run tcp-to-http-replay messages.txt --connections 8 --loops 1000`
+       or, paced, `uv run tcp-to-http-replay capture.txt --rate 5000`
+    """
+    parser = argparse.ArgumentParser(description="Replay a file to a TCP endpoint with sendfile().")
+    parser.add_argument("path", help="file to replay")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--connections", type=int, default=1, help="parallel connections, each sends the file")
+    parser.add_argument("--rate", type=float, default=0.0, help="lines per second per connection (0 = unpaced)")
+    parser.add_argument("--loops", type=int, default=1, help="times each connection sends the file")
+    parser.add_argument("--wait-close", type=float, default=10.0, help="seconds to wait for the server to close")
+    args = parser.parse_args()
+
+    try:
+        stats = replay(
+            args.path,
+            host=args.host,
+            port=args.port,
+            connections=args.connections,
+            rate=args.rate,
+            loops=args.loops,
+            wait_close=args.wait_close,
+        )
+    except FileNotFoundError:
+        print(f"File Not Found at path: {args.path}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit(130)
+    report(stats)
+
+
+if __name__ == "__main__":
+    cli()
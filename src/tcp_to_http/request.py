@@ -0,0 +1,272 @@
+import io
+import socket
+from typing import Dict, Optional, Tuple, Union
+
+from tcp_to_http.tcplistener import DEFAULT_CHUNK_SIZE, _get_read_into
+
+# HTTP/1.1 message syntax:
+# - RFC 9112 (HTTP/1.1): https://www.rfc-editor.org/rfc/rfc9112.html#name-message-format
+# - RFC 9110 (Semantics), field names are case-insensitive tokens:
+#   https://www.rfc-editor.org/rfc/rfc9110.html#name-field-names
+#
+#   HTTP-message   = start-line CRLF
+#                    *( field-line CRLF )
+#                    CRLF
+#                    [ message-body ]
+#   request-line   = method SP request-target SP HTTP-version
+#   field-line     = field-name ":" OWS field-value OWS
+
+# tchar = "!" / "#" / "$" / "%" / "&" / "'" / "*" / "+" / "-" / "." / "^" / "_" / "`" / "|" / "~" / DIGIT / ALPHA
+_TOKEN_CHARS = b"!#$%&'*+-.^_`|~0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SUPPORTED_VERSIONS = ("HTTP/1.1", "HTTP/1.0")
+
+# Limits, in the same ballpark as nginx/gunicorn defaults
+MAX_REQUEST_LINE_BYTES = 8190
+MAX_HEADER_BYTES = 64 * 1024
+MAX_HEADERS = 100
+
+
+class HTTPParseError(ValueError):
+    """Malformed or oversized request head; ``status`` is the response code to send back."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_token(value: bytes) -> bool:
+    # bytes.translate(None, delete) strips every token char in C; a token leaves nothing behind
+    return bool(value) and not value.translate(None, _TOKEN_CHARS)
+
+
+class Request:
+    r"""
+    A parsed request head.
+
+    :ivar method: str
+        e.g. ``"GET"``.
+    :ivar target: str
+        The request-target as sent, e.g. ``"/coffee?size=l"``.
+    :ivar version: str
+        ``"HTTP/1.1"`` or ``"HTTP/1.0"``.
+    :ivar headers: Dict[str, str]
+        Field names lower-cased; repeated fields are joined with ``", "``.
+    """
+
+    __slots__ = ("method", "target", "version", "headers")
+
+    def __init__(self, method: str, target: str, version: str, headers: Optional[Dict[str, str]] = None):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers: Dict[str, str] = headers if headers is not None else {}
+
+    def header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Case-insensitive header lookup."""
+        return self.headers.get(name.lower(), default)
+
+    def __repr__(self) -> str:
+        """Method, target, version and headers, e.g. in log messages."""
+        return f"Request({self.method!r}, {self.target!r}, {self.version!r}, headers={self.headers!r})"
+
+
+class RequestParser:
+    r"""
+    Incremental, resumable parser for an HTTP/1.1 request head.
+
+    Feed it bytes as they arrive, split at any offset. It stops right after the
+    blank line that ends the head and never consumes body bytes: `feed()` returns
+    how many bytes of the given data it used, the rest belongs to the body (or to
+    the next pipelined request).
+
+    Lines follow the same framing rules as `get_lines_from_reader()`: split on LF,
+    a trailing CR is stripped, so bare-LF clients are accepted as well.
+
+    .. code-block:: python
+
+        parser = RequestParser()
+        while not parser.done:
+            chunk = conn.recv(65536)
+            used = parser.feed(chunk)
+        body_start = chunk[used:]
+        request = parser.request
+
+    :param max_request_line: int
+        Longest accepted request line (414 above it).
+    :param max_header_bytes: int
+        Most bytes the whole head may take, request line included (431 above it).
+    :param max_headers: int
+        Most header fields accepted (431 above it).
+    """
+
+    __slots__ = (
+        "max_request_line",
+        "max_header_bytes",
+        "max_headers",
+        "request",
+        "done",
+        "_buffer",
+        "_scan",
+        "_head_bytes",
+        "_header_count",
+    )
+
+    def __init__(
+        self,
+        max_request_line: int = MAX_REQUEST_LINE_BYTES,
+        max_header_bytes: int = MAX_HEADER_BYTES,
+        max_headers: int = MAX_HEADERS,
+    ):
+        self.max_request_line = max_request_line
+        self.max_header_bytes = max_header_bytes
+        self.max_headers = max_headers
+        self.reset()
+
+    def reset(self) -> None:
+        """Get ready for the next request on the same connection."""
+        self.request: Optional[Request] = None
+        self.done = False
+        self._buffer = bytearray()
+        self._scan = 0
+        self._head_bytes = 0
+        self._header_count = 0
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> int:
+        """
+        Consume bytes of the request head.
+
+        :param data: bytes
+            The next bytes received from the connection.
+
+        :return: int
+            Number of bytes of ``data`` that belong to the head. Less than
+            ``len(data)`` only once `done` is set.
+
+        :raise HTTPParseError: on malformed input or when a limit is exceeded.
+        """
+        if self.done:
+            return 0
+        buffer = self._buffer
+        already_buffered = len(buffer)
+        buffer.extend(data)
+
+        find = buffer.find
+        parse_line = self._parse_line
+        start = 0
+        scan = self._scan
+        while True:
+            new_line = find(b"\n", scan)
+            if new_line == -1:
+                self._scan = len(buffer)
+                self._check_pending(len(buffer) - start)
+                break
+
+            line_end = new_line - 1 if new_line > start and buffer[new_line - 1] == 13 else new_line
+            self._head_bytes += new_line + 1 - start
+            if self._head_bytes > self.max_header_bytes:
+                raise HTTPParseError("Request header fields too large", status=431)
+            parse_line(bytes(buffer[start:line_end]))
+            start = scan = new_line + 1
+            if self.done:
+                self._buffer = bytearray()
+                return start - already_buffered
+
+        # Keep only the incomplete line around
+        if start:
+            del buffer[:start]
+            self._scan -= start
+        return len(data)
+
+    def _check_pending(self, pending: int) -> None:
+        # Fail early on a line that can't fit, instead of buffering until the newline shows up
+        if self.request is None and pending > self.max_request_line:
+            raise HTTPParseError("Request-URI too long", status=414)
+        if self._head_bytes + pending > self.max_header_bytes:
+            raise HTTPParseError("Request header fields too large", status=431)
+
+    def _parse_line(self, line: bytes) -> None:
+        if self.request is None:
+            if not line and self._head_bytes <= 2:
+                # RFC 9112 2.2: ignore at least one empty line before the request-line
+                self._head_bytes = 0
+                return
+            if len(line) > self.max_request_line:
+                raise HTTPParseError("Request-URI too long", status=414)
+            self.request = self._parse_request_line(line)
+            return
+
+        if not line:
+            self.done = True
+            return
+
+        if line[0] in (32, 9):  # SP / HTAB: obsolete line folding
+            raise HTTPParseError("Obsolete line folding is not supported")
+
+        self._header_count += 1
+        if self._header_count > self.max_headers:
+            raise HTTPParseError("Too many header fields", status=431)
+
+        name, colon, value = line.partition(b":")
+        if not colon or not _is_token(name):
+            # Covers "Host : x" too: no whitespace allowed between field-name and colon
+            raise HTTPParseError("Malformed header field: {!r}".format(line))
+
+        key = name.decode("ascii").lower()
+        text = value.strip(b" \t").decode("latin-1")
+        headers = self.request.headers
+        headers[key] = headers[key] + ", " + text if key in headers else text
+
+    @staticmethod
+    def _parse_request_line(line: bytes) -> Request:
+        parts = line.split(b" ")
+        if len(parts) != 3:
+            raise HTTPParseError("Malformed request line: {!r}".format(line))
+        method, target, version = parts
+        if not _is_token(method) or not method.isupper():
+            raise HTTPParseError("Invalid method: {!r}".format(method))
+        if not target:
+            raise HTTPParseError("Empty request target")
+        version_text = version.decode("ascii", "replace")
+        if version_text not in SUPPORTED_VERSIONS:
+            if version_text.startswith("HTTP/"):
+                raise HTTPParseError("HTTP version not supported: {}".format(version_text), status=505)
+            raise HTTPParseError("Malformed HTTP version: {!r}".format(version))
+        return Request(method.decode("ascii"), target.decode("latin-1"), version_text)
+
+
+def request_from_reader(
+    stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    parser: Optional[RequestParser] = None,
+) -> Tuple[Optional[Request], bytes]:
+    """
+    Read and parse one request head from a binary stream or socket.
+
+    :param stream: io.FileIO or socket.SocketIO or socket.socket
+        Same kinds of streams as `get_lines_from_reader()` accepts.
+    :param chunk_size: int
+        Most bytes requested per read.
+    :param parser: RequestParser
+        Parser to use (e.g. with custom limits); a default one otherwise.
+
+    :return: Tuple[Request, bytes]
+        The request (``None`` if the peer closed before sending anything) and the
+        bytes read past the end of the head, i.e. the start of the body.
+
+    :raise HTTPParseError: on malformed input, a limit being exceeded, or EOF mid-head.
+    """
+    read_into = _get_read_into(stream)
+    parser = parser or RequestParser()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    seen_any = False
+    while True:
+        n = read_into(view)
+        if not n:
+            if not seen_any:
+                return None, b""
+            raise HTTPParseError("Connection closed before the end of the request head")
+        seen_any = True
+        used = parser.feed(view[:n])
+        if parser.done:
+            return parser.request, bytes(view[used:n])
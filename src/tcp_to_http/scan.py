@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+from tcp_to_http.readers import mmap_lines
+from tcp_to_http.tcplistener import DEFAULT_CHUNK_SIZE, Line
+
+# Scanning one big file on all cores.
+#
+# The file is cut into byte ranges that each end right after a newline, so every line
+# lies in exactly one range. Each range is mapped and split by a worker process on its
+# own (`readers.mmap_lines()`), the per-range results come back in file order and are
+# merged. Processes instead of threads: splitting and decoding hold the GIL.
+#
+# ref:
+# - https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+# - https://docs.python.org/3/library/os.html#os.pread
+
+ByteRange = Tuple[int, int]
+Reducer = Callable[[Iterator[Line]], Any]
+
+# How far `split_ranges()` reads ahead at a time looking for the next newline
+_ALIGN_READ_SIZE = 64 * 1024
+
+
+def split_ranges(path: Union[str, os.PathLike], parts: int) -> List[ByteRange]:
+    """
+    Cut a file into at most ``parts`` byte ranges of about equal size, aligned on lines.
+
+    Each ``(start, stop)`` starts at the beginning of a line and stops right after a
+    newline (the last one at the end of the file). Fewer ranges come back when lines
+    are longer than a range would be.
+    """
+    if parts < 1:
+        raise ValueError("parts must be >= 1")
+    size = os.path.getsize(path)
+    if not size:
+        return []
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        ranges = []
+        start = 0
+        for i in range(1, parts + 1):
+            if start == size:
+                break
+            stop = size if i == parts else max(start + 1, size * i // parts)
+            # Move the cut forward to just past the newline that ends the line it fell into
+            position = stop - 1
+            while stop < size:
+                chunk = os.pread(fd, _ALIGN_READ_SIZE, position)
+                new_line = chunk.find(b"\n")
+                if new_line != -1:
+                    stop = position + new_line + 1
+                    break
+                position += len(chunk)
+                stop = position
+            if stop > start:
+                ranges.append((start, stop))
+                start = stop
+        return ranges
+    finally:
+        os.close(fd)
+
+
+def count_lines(fd: int, start: int, stop: int) -> int:
+    """Lines in ``[start, stop)`` without framing them: counts newlines, plus an unterminated last line."""
+    count = 0
+    position = start
+    last = b""
+    while position < stop:
+        chunk = os.pread(fd, min(1 << 20, stop - position), position)
+        if not chunk:
+            break
+        count += chunk.count(b"\n")
+        position += len(chunk)
+        last = chunk[-1:]
+    return count + (1 if last and last != b"\n" else 0)
+
+
+def _scan_range(
+    path: Union[str, os.PathLike], byte_range: ByteRange, reducer: Optional[Reducer], mode: str, chunk_size: int
+) -> Any:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        start, stop = byte_range
+        if reducer is None:
+            return count_lines(fd, start, stop)
+        return reducer(mmap_lines(fd, start, stop, chunk_size=chunk_size, mode=mode))
+    finally:
+        os.close(fd)
+
+
+def parallel_scan(
+    path: Union[str, os.PathLike],
+    reducer: Optional[Reducer] = None,
+    merge: Optional[Callable[[List[Any]], Any]] = None,
+    workers: Optional[int] = None,
+    parts: Optional[int] = None,
+    mode: str = "str",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Any:
+    r"""
+    Run ``reducer`` over a file's lines, range by range, in a process pool.
+
+    .. code-block:: python
+
+        # How many lines?
+        total = parallel_scan("capture.txt")
+
+        # Requests per method, merged from every range
+        def count_methods(lines):
+            return collections.Counter(line.split(" ", 1)[0] for line in lines)
+
+        methods = parallel_scan("capture.txt", count_methods, merge=lambda counters: sum(counters, Counter()))
+
+    Lines are framed like everywhere else (split on LF, CR stripped, the last line kept
+    even without a newline) and each line is seen by exactly one reducer call.
+
+    :param path: str
+        A regular file.
+    :param reducer: Callable[[Iterator[str]], Any]
+        Called once per range with an iterator over its lines, in a worker process; it
+        returns that range's result. Has to be picklable, i.e. a module-level function.
+        Without one, lines are counted (newlines only, nothing is decoded).
+    :param merge: Callable[[List[Any]], Any]
+        Combines the per-range results, which it gets in file order. Runs in this process,
+        so a lambda is fine. Defaults to `sum()` when counting lines, and to returning the
+        list as is with a ``reducer``.
+    :param workers: int
+        Worker processes (defaults to the number of CPUs).
+    :param parts: int
+        Number of ranges (defaults to 4 per worker, so a slow range doesn't leave the
+        other workers idle at the end).
+    :param mode: str
+        Line mode handed to the reducer: ``"str"``, ``"bytes"`` or ``"view"``.
+    :param chunk_size: int
+        Bytes split per step inside a range.
+
+    :return: Any
+        The merged result.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_ranges(path, parts or 4 * workers)
+    if merge is None:
+        merge = sum if reducer is None else list
+
+    if workers == 1 or len(ranges) <= 1:
+        # Not worth a pool (and handy for debugging a reducer)
+        results = [_scan_range(path, r, reducer, mode, chunk_size) for r in ranges]
+        return merge(results)
+
+    n = len(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_scan_range, [path] * n, ranges, [reducer] * n, [mode] * n, [chunk_size] * n))
+    return merge(results)
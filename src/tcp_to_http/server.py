@@ -0,0 +1,652 @@
+import selectors
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from tcp_to_http import logger
+from tcp_to_http.metrics import Registry, serve_metrics
+from tcp_to_http.sinks import Sink, StdoutSink
+from tcp_to_http.tcplistener import (
+    DEFAULT_CHUNK_SIZE,
+    HOST,
+    PORT,
+    DecodeStats,
+    LineDecoder,
+    LineFramer,
+    LineTooLongError,
+    get_line_batches,
+    get_lines_from_reader,
+)
+from tcp_to_http.timeouts import REAP_REASONS, ConnectionReapedError, ConnectionTimer, Reaper, TimedReader
+
+# Server backends:
+# - "thread":    one thread per accepted connection (simple, good for few long-lived clients)
+# - "pool":      a bounded ThreadPoolExecutor; extra connections wait for a free worker
+# - "selectors": a single-threaded event loop over non-blocking sockets
+# ref:
+# - https://docs.python.org/3/library/selectors.html
+# - https://docs.python.org/3/library/concurrent.futures.html#threadpoolexecutor
+BACKENDS = ("thread", "pool", "selectors")
+
+LineHandler = Callable[[str], None]
+
+
+def create_listener(
+    host: str = HOST,
+    port: int = PORT,
+    backlog: int = 128,
+    reuse_port: bool = False,
+    dual_stack: bool = False,
+    rcvbuf: Optional[int] = None,
+    sndbuf: Optional[int] = None,
+) -> socket.socket:
+    """
+    Create a bound, listening TCP socket.
+
+    An IPv6 ``host`` (anything with a ``:``, e.g. ``"::1"``) gets an ``AF_INET6`` socket.
+
+    :param reuse_port: bool
+        Set ``SO_REUSEPORT`` so several processes can bind the same address and the
+        kernel load-balances new connections between them (Linux >= 3.9, BSDs).
+    :param dual_stack: bool
+        Accept IPv4 clients on an IPv6 socket too (``IPV6_V6ONLY=0``, they show up as
+        ``::ffff:a.b.c.d``); ``host`` must be IPv6, usually ``"::"``.
+    :param rcvbuf: int
+        ``SO_RCVBUF`` in bytes, inherited by accepted connections. Set before
+        `listen()` so the TCP window scale is negotiated for it. Linux doubles the
+        value and caps it at ``net.core.rmem_max``.
+    :param sndbuf: int
+        ``SO_SNDBUF`` in bytes, likewise (capped at ``net.core.wmem_max``).
+    """
+    ipv6 = ":" in host
+    if dual_stack and not ipv6:
+        raise ValueError("dual_stack needs an IPv6 host, e.g. '::'")
+    sock = socket.socket(family=socket.AF_INET6 if ipv6 else socket.AF_INET, type=socket.SOCK_STREAM)
+    try:
+        # Allow quick restarts while old connections sit in TIME_WAIT
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            if not hasattr(socket, "SO_REUSEPORT"):
+                raise OSError("SO_REUSEPORT is not available on this platform")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if ipv6:
+            # The default differs between systems (net.ipv6.bindv6only), so always set it
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0 if dual_stack else 1)
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        if sndbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def print_line(line: str) -> None:
+    """
+    Unbuffered line handler, mirrors the output of `receive_data_from_tcp_conn()`.
+
+    One `print()` per line; the servers default to a `StdoutSink` with the same output,
+    which writes in batches from a background thread.
+    """
+    print("read:", line)
+
+
+class _ServerMetrics:
+    """What a `LineServer` (or an `AsyncLineServer`) publishes in a `Registry`."""
+
+    def __init__(self, registry: Registry, server):
+        self.accepted = registry.counter("tcp_to_http_connections_accepted_total", "Connections accepted.")
+        registry.callback(
+            "tcp_to_http_connections_active", "Connections open right now.", lambda: server.active_connections
+        )
+        self.received_bytes = registry.counter("tcp_to_http_received_bytes_total", "Bytes received from clients.")
+        self.lines = registry.counter("tcp_to_http_lines_total", "Lines handed to the line handler.")
+        registry.callback(
+            "tcp_to_http_decode_errors_total",
+            "Lines that were not valid in the server's encoding.",
+            lambda: server.decode_totals().malformed,
+            kind="counter",
+        )
+        registry.callback(
+            "tcp_to_http_long_lines_total",
+            "Lines over max_line_bytes that were truncated or skipped.",
+            lambda: server.decode_totals().too_long,
+            kind="counter",
+        )
+        for reason in REAP_REASONS:
+            registry.callback(
+                f"tcp_to_http_connections_reaped_{reason}_total",
+                f"Connections closed by the {reason} timeout.",
+                lambda reason=reason: server.reaper.reaped[reason] if server.reaper is not None else 0,
+                kind="counter",
+            )
+        self.handler_seconds = registry.histogram(
+            "tcp_to_http_handler_seconds", "Line handler time per line, averaged over each batch of lines."
+        )
+
+    def record(self, nbytes: int, lines: int, seconds: float) -> None:
+        """Account for one read: ``nbytes`` received, ``lines`` handled in ``seconds``."""
+        self.received_bytes.inc(nbytes)
+        if lines:
+            self.lines.inc(lines)
+            self.handler_seconds.observe(seconds / lines, lines)
+
+
+class LineServer:
+    r"""
+    Long-running TCP server that serves many clients concurrently.
+
+    Every accepted connection gets its own framing pipeline (`get_lines_from_reader`
+    for the threaded backends, an equivalent `LineFramer` for the selectors backend),
+    so lines from different clients never interleave inside a line.
+
+    :param host: str
+        Address to bind to.
+    :param port: int
+        Port to bind to.
+    :param backend: str
+        One of ``"thread"``, ``"pool"`` or ``"selectors"``.
+    :param handler: Callable[[str], None]
+        Called once for every decoded line. Must be thread-safe for the threaded backends.
+        Defaults to a `StdoutSink` (``read: <line>``), flushed when `serve_forever()` returns;
+        see `tcp_to_http.sinks` for files and callbacks. An exception from it is logged and
+        closes that client's connection (with every backend); the other clients go on.
+    :param max_connections: int
+        Maximum number of connections served at the same time. Clients above the limit
+        are not accepted and wait in the kernel's listen backlog.
+    :param pool_size: int
+        Number of worker threads for the ``"pool"`` backend (defaults to ``max_connections``).
+    :param backlog: int
+        Listen backlog passed to `socket.listen()`.
+    :param drain_timeout: float
+        Seconds `shutdown()` waits for in-flight connections to flush their lines.
+    :param poll_interval: float
+        How often the accept loop checks for a shutdown request.
+    :param reuse_port: bool
+        Bind with ``SO_REUSEPORT`` (one socket per worker process, see `tcp_to_http.prefork`).
+    :param sock: socket.socket
+        An already listening socket to serve instead of binding one, e.g. inherited
+        from a pre-forking parent. ``host``/``port``/``backlog`` are ignored then.
+    :param encoding: str
+        Encoding clients send in.
+    :param errors: str
+        Policy for lines that are not valid in ``encoding`` (see `get_lines_from_reader()`).
+        Malformed lines never end a connection; they add up in `decode_stats`.
+    :param max_line_bytes: int
+        Longest line a client may send, see `get_lines_from_reader()`. Together with the
+        64 KiB reads it caps what one connection can make the server buffer. Handlers
+        run inline, so a slow handler stops the reads and TCP pushes back on the client.
+    :param on_long_line: str
+        ``"error"`` closes the connection, ``"truncate"`` and ``"skip"`` keep it open.
+    :param dual_stack: bool
+        Also accept IPv4 clients on an IPv6 ``host`` (see `create_listener()`).
+    :param rcvbuf: int
+        ``SO_RCVBUF`` for the listening socket and the connections it accepts.
+    :param sndbuf: int
+        ``SO_SNDBUF``, likewise.
+    :param nodelay: bool
+        Set ``TCP_NODELAY`` on every accepted connection, so small writes (e.g. HTTP
+        responses) go out without waiting for Nagle's algorithm.
+    :param chunk_size: int
+        Most bytes per read from a connection.
+    :param read_timeout: float
+        Close connections that sent nothing for that many seconds.
+    :param header_timeout: float
+        Close connections that take longer than that to finish a line (an HTTP request
+        head) once they started it, i.e. clients trickling bytes to hold a connection.
+    :param connection_timeout: float
+        Close connections after that many seconds, busy or not.
+
+        The three timeouts (``None``: no limit) are enforced by one `Reaper` for all
+        connections, see `tcp_to_http.timeouts`. The unfinished line of a connection
+        closed for a timeout is dropped, not handed to ``handler``.
+    :param metrics: Registry
+        Publish the server's metrics in it (accepts, open connections, bytes, lines,
+        decode errors, reaped connections, handler time; see `tcp_to_http.metrics`).
+        ``None`` turns them off.
+        They are updated once per read, not per line.
+    """
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = PORT,
+        backend: str = "thread",
+        handler: Optional[LineHandler] = None,
+        max_connections: int = 128,
+        pool_size: Optional[int] = None,
+        backlog: int = 128,
+        drain_timeout: float = 5.0,
+        poll_interval: float = 0.5,
+        reuse_port: bool = False,
+        sock: Optional[socket.socket] = None,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        max_line_bytes: Optional[int] = None,
+        on_long_line: str = "error",
+        dual_stack: bool = False,
+        rcvbuf: Optional[int] = None,
+        sndbuf: Optional[int] = None,
+        nodelay: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        read_timeout: Optional[float] = None,
+        header_timeout: Optional[float] = None,
+        connection_timeout: Optional[float] = None,
+        metrics: Optional[Registry] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend {!r}, expected one of {}".format(backend, BACKENDS))
+        if max_connections < 1:
+            raise ValueError("max_connections must be >= 1")
+
+        self.host = host
+        self.port = port
+        self.backend = backend
+        self.handler: LineHandler = handler or StdoutSink()
+        self.max_connections = max_connections
+        self.pool_size = pool_size or max_connections
+        self.backlog = backlog
+        self.drain_timeout = drain_timeout
+        self.poll_interval = poll_interval
+        self.reuse_port = reuse_port
+        self.dual_stack = dual_stack
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self.nodelay = nodelay
+        self.chunk_size = chunk_size
+        LineDecoder(encoding, errors)  # unknown encodings and error handlers fail here, not per connection
+        self.encoding = encoding
+        self.errors = errors
+        LineFramer(max_line_bytes=max_line_bytes, on_long_line=on_long_line)  # same, for the limit
+        self.max_line_bytes = max_line_bytes
+        self.on_long_line = on_long_line
+        # Malformed input over all finished connections
+        self.decode_stats = DecodeStats()
+        reaper = Reaper(read_idle=read_timeout, header=header_timeout, total=connection_timeout)
+        # None without timeouts; ``reaper.reaped`` counts the connections it closed
+        self.reaper: Optional[Reaper] = reaper if reaper.enabled else None
+        self.metrics = metrics
+
+        self._sock: Optional[socket.socket] = sock
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._connections: Dict[socket.socket, Tuple[str, int]] = {}
+        self._live_decode_stats: Dict[socket.socket, DecodeStats] = {}
+        self._timers: Dict[socket.socket, ConnectionTimer] = {}
+        self._metrics = _ServerMetrics(metrics, self) if metrics is not None else None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The bound ``(host, port)``, useful when binding to port 0."""
+        if self._sock is None:
+            return (self.host, self.port)
+        return self._sock.getsockname()[:2]
+
+    @property
+    def active_connections(self) -> int:
+        """Connections open right now."""
+        with self._lock:
+            return len(self._connections)
+
+    def bind(self) -> None:
+        """Create, bind and listen on the server socket (done lazily by `serve_forever()`)."""
+        if self._sock is not None:
+            return
+        self._sock = create_listener(
+            self.host,
+            self.port,
+            self.backlog,
+            reuse_port=self.reuse_port,
+            dual_stack=self.dual_stack,
+            rcvbuf=self.rcvbuf,
+            sndbuf=self.sndbuf,
+        )
+
+    def serve_forever(self) -> None:
+        """Accept and serve connections until `shutdown()` is called (or Ctrl+C)."""
+        self.bind()
+        logger.info(f"Listening on {self.address} with {self.backend=}, {self.max_connections=}")
+        try:
+            if self.backend == "selectors":
+                self._serve_selectors()
+            else:
+                self._serve_threaded()
+        except KeyboardInterrupt:
+            # The backends drain in their own `finally` blocks
+            self._stop.set()
+        finally:
+            self._sock.close()
+            if isinstance(self.handler, Sink):
+                self.handler.flush()
+            logger.info("Server stopped")
+
+    def shutdown(self) -> None:
+        """
+        Request a graceful shutdown.
+
+        The server stops accepting, half-closes every open connection for reading so no
+        new data is consumed, and lets each pipeline flush the lines it already buffered
+        (including a final unterminated line) before the connection is closed.
+        Safe to call from another thread or from a signal handler.
+        """
+        self._stop.set()
+
+    # ------------------------------------------------------------------ #
+    # Threaded backends ("thread" and "pool")
+    # ------------------------------------------------------------------ #
+
+    def _serve_threaded(self) -> None:
+        self._sock.settimeout(self.poll_interval)
+        pool = ThreadPoolExecutor(max_workers=self.pool_size) if self.backend == "pool" else None
+        if self.reaper is not None:
+            # Shuts expired connections down, their threads then see EOF and close them
+            self.reaper.start()
+        try:
+            while not self._stop.is_set():
+                # Wait for a free slot *before* accepting, so clients above the limit
+                # stay in the kernel backlog instead of being accepted and starved.
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                try:
+                    conn, addr = self._sock.accept()
+                except socket.timeout:
+                    self._slots.release()
+                    continue
+                except OSError:
+                    self._slots.release()
+                    if self._stop.is_set():
+                        break
+                    raise
+
+                conn.settimeout(None)
+                self._tune(conn)
+                with self._lock:
+                    self._connections[conn] = addr
+                if self._metrics is not None:
+                    self._metrics.accepted.inc()
+                if pool is not None:
+                    pool.submit(self._handle_conn, conn, addr)
+                else:
+                    threading.Thread(target=self._handle_conn, args=(conn, addr), daemon=True).start()
+        finally:
+            self._stop.set()
+            self._drain_threaded()
+            if self.reaper is not None:
+                self.reaper.stop()
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    def _tune(self, conn: socket.socket) -> None:
+        if self.nodelay:
+            # Not reliably inherited from the listening socket, so per connection
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _handle_conn(self, conn: socket.socket, addr: Tuple[str, int]) -> None:
+        try:
+            with conn:
+                logger.info(f"Connected by {addr=}")
+                self._track(conn, addr)
+                try:
+                    self._serve_conn(conn, addr)
+                finally:
+                    self._untrack(conn)  # before the socket is closed and its fd reused
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            with self._lock:
+                self._connections.pop(conn, None)
+            self._slots.release()
+
+    def _serve_conn(self, conn: socket.socket, addr: Tuple[str, int]) -> None:
+        """Serve one connection on a worker thread; subclasses override this for other protocols."""
+        stats = DecodeStats()
+        with self._lock:
+            self._live_decode_stats[conn] = stats
+        try:
+            with conn.makefile(mode="rb", buffering=0) as raw_bytes:
+                timer = self._timers.get(conn)
+                if timer is not None:
+                    raw_bytes = TimedReader(raw_bytes, timer)
+                if self._metrics is None:
+                    for line in get_lines_from_reader(raw_bytes, self.chunk_size, stats=stats, **self._framing):
+                        self.handler(line)
+                else:
+                    # Batches give the byte counts, and the handler is timed per batch
+                    for lines, nbytes in get_line_batches(
+                        raw_bytes, chunk_size=self.chunk_size, stats=stats, **self._framing
+                    ):
+                        start = time.perf_counter()
+                        for line in lines:
+                            self.handler(line)
+                        self._metrics.record(nbytes, len(lines), time.perf_counter() - start)
+        except LineTooLongError as e:
+            logger.warning(f"Closing {addr=}: {e}")
+        except ConnectionReapedError as e:
+            logger.debug(f"Dropped the unfinished line of {addr=}: {e}")
+        finally:
+            self._add_decode_stats(conn, addr, stats)
+
+    def _track(self, conn: socket.socket, addr: Tuple[str, int]) -> None:
+        if self.reaper is not None:
+            timer = self.reaper.track(conn, addr)
+            with self._lock:
+                self._timers[conn] = timer
+
+    def _untrack(self, conn: socket.socket) -> None:
+        if self.reaper is not None:
+            with self._lock:
+                timer = self._timers.pop(conn, None)
+            if timer is not None:
+                self.reaper.untrack(timer)
+
+    @property
+    def _framing(self) -> dict:
+        """Keyword arguments for the line framers."""
+        return {
+            "encoding": self.encoding,
+            "errors": self.errors,
+            "max_line_bytes": self.max_line_bytes,
+            "on_long_line": self.on_long_line,
+        }
+
+    def _add_decode_stats(self, conn: socket.socket, addr: Tuple[str, int], stats: DecodeStats) -> None:
+        if stats.malformed or stats.too_long:
+            logger.warning(
+                f"{addr=} sent {stats.malformed} malformed line(s) ({stats.dropped} dropped) "
+                f"and {stats.too_long} line(s) over {self.max_line_bytes} bytes"
+            )
+        with self._lock:
+            self._live_decode_stats.pop(conn, None)
+            self.decode_stats.add(stats)
+
+    def decode_totals(self) -> DecodeStats:
+        """`decode_stats` plus what the connections still open have counted so far."""
+        totals = DecodeStats()
+        with self._lock:
+            totals.add(self.decode_stats)
+            for stats in self._live_decode_stats.values():
+                totals.add(stats)
+        return totals
+
+    def _drain_threaded(self) -> None:
+        with self._lock:
+            conns = list(self._connections)
+        # SHUT_RD makes a blocked recv() return b"" so every pipeline sees EOF,
+        # flushes whatever it has buffered and exits on its own.
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+
+        deadline = time.monotonic() + self.drain_timeout
+        while self.active_connections and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self.active_connections:
+            logger.warning(f"{self.active_connections} connection(s) still busy after {self.drain_timeout}s drain")
+
+    # ------------------------------------------------------------------ #
+    # Event loop backend ("selectors")
+    # ------------------------------------------------------------------ #
+
+    def _serve_selectors(self) -> None:
+        chunk_size = self.chunk_size
+        sel = selectors.DefaultSelector()
+        self._sock.setblocking(False)
+        sel.register(self._sock, selectors.EVENT_READ, data=None)
+        accepting = True
+        reaper = self.reaper
+        try:
+            while not self._stop.is_set():
+                timeout = self.poll_interval
+                if reaper is not None:
+                    # Expired connections are shut down, and show up readable (EOF) right away
+                    reaper.reap_expired()
+                    deadline = reaper.next_deadline()
+                    if deadline is not None:
+                        timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+                for key, _ in sel.select(timeout=timeout):
+                    if key.data is None:
+                        self._accept_nonblocking(sel)
+                    else:
+                        conn: socket.socket = key.fileobj
+                        try:
+                            chunk = conn.recv(chunk_size)
+                        except (BlockingIOError, InterruptedError):
+                            continue
+                        except OSError as e:
+                            logger.exception(e)
+                            chunk = b""
+                        if chunk:
+                            if reaper is not None:
+                                self._timers[conn].note_read(chunk, len(chunk))
+                            self._feed_selector_conn(sel, conn, key.data, chunk)
+                        else:
+                            self._close_selector_conn(sel, conn, key.data)
+
+                # Stop watching the listening socket while we are at the limit
+                at_limit = self.active_connections >= self.max_connections
+                if accepting and at_limit:
+                    sel.unregister(self._sock)
+                    accepting = False
+                elif not accepting and not at_limit:
+                    sel.register(self._sock, selectors.EVENT_READ, data=None)
+                    accepting = True
+        finally:
+            self._stop.set()
+            self._drain_selectors(sel, chunk_size)
+            sel.close()
+
+    def _drain_selectors(self, sel: selectors.BaseSelector, chunk_size: int) -> None:
+        # Pick up whatever is already sitting in the kernel buffers, then flush each framer
+        for key in list(sel.get_map().values()):
+            if key.data is None:
+                continue
+            conn = key.fileobj
+            while True:
+                try:
+                    chunk = conn.recv(chunk_size)
+                except OSError:
+                    chunk = b""
+                if not chunk:
+                    self._close_selector_conn(sel, conn, key.data)
+                    break
+                if not self._feed_selector_conn(sel, conn, key.data, chunk):
+                    break  # closed over a line that was too long
+
+    def _accept_nonblocking(self, sel: selectors.BaseSelector) -> None:
+        try:
+            conn, addr = self._sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        logger.info(f"Connected by {addr=}")
+        conn.setblocking(False)
+        self._tune(conn)
+        framer = LineFramer(**self._framing)
+        with self._lock:
+            self._connections[conn] = addr
+            self._live_decode_stats[conn] = framer.stats
+        if self._metrics is not None:
+            self._metrics.accepted.inc()
+        self._track(conn, addr)
+        sel.register(conn, selectors.EVENT_READ, data=framer)
+
+    def _feed_selector_conn(
+        self, sel: selectors.BaseSelector, conn: socket.socket, framer: LineFramer, chunk: bytes
+    ) -> bool:
+        """Frame and handle one chunk; False if it closed the connection (a line over the limit, a handler error)."""
+        try:
+            try:
+                self._emit(framer.feed(chunk), len(chunk))
+                return True
+            except LineTooLongError as e:
+                self._emit(e.lines)
+                logger.warning(f"Closing addr={self._connections.get(conn)}: {e}")
+        except Exception as e:
+            logger.exception(e)  # from the handler: ends this connection, like on the threaded backends
+        self._close_selector_conn(sel, conn, framer, flush=False)
+        return False
+
+    def _close_selector_conn(
+        self, sel: selectors.BaseSelector, conn: socket.socket, framer: LineFramer, flush: bool = True
+    ) -> None:
+        timer = self._timers.get(conn)
+        if flush and (timer is None or timer.reaped is None):  # a reaped connection's partial line is dropped
+            try:
+                self._emit(framer.close())
+            except LineTooLongError as e:
+                logger.warning(f"Dropping the last line of addr={self._connections.get(conn)}: {e}")
+            except Exception as e:
+                logger.exception(e)
+        sel.unregister(conn)
+        self._untrack(conn)
+        conn.close()
+        with self._lock:
+            addr = self._connections.pop(conn, None)
+        self._add_decode_stats(conn, addr, framer.stats)
+
+    def _emit(self, lines, nbytes: int = 0) -> None:
+        start = time.perf_counter() if self._metrics is not None else 0.0
+        for line in lines:
+            self.handler(line)
+        if self._metrics is not None:
+            self._metrics.record(nbytes, len(lines), time.perf_counter() - start)
+
+
+def serve(backend: str = "thread", metrics_port: Optional[int] = None, **kwargs) -> None:
+    """
+    Run a `LineServer` in the foreground until SIGINT/SIGTERM.
+
+    How to run:
+
+    1. Run `uv run python -c "from tcp_to_http.server import serve; serve('selectors')"`
+    2. In other terminals run `cat messages.txt | nc -w 1 127.0.0.1 42069` (as many as you like)
+    3. Ctrl+C (or `kill <pid>`) drains the open connections and exits.
+
+    With ``metrics_port`` (e.g. ``serve('selectors', metrics_port=42070)``) the server's
+    metrics are served at ``http://127.0.0.1:<metrics_port>/metrics`` as well.
+    """
+    metrics_server = None
+    if metrics_port is not None:
+        kwargs["metrics"] = kwargs.get("metrics") or Registry()
+        metrics_server = serve_metrics(kwargs["metrics"], host=kwargs.get("host", HOST), port=metrics_port)
+    server = LineServer(backend=backend, **kwargs)
+
+    def _on_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        server.shutdown()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+    try:
+        server.serve_forever()
+    finally:
+        if metrics_server is not None:
+            metrics_server.shutdown()
@@ -0,0 +1,445 @@
+import os
+import sys
+import threading
+from collections import deque
+from typing import Callable, Deque, Iterable, List, Optional, Union
+
+from tcp_to_http import logger
+from tcp_to_http.tcplistener import Line
+
+# Where handled lines go: batched, off the receive path.
+#
+# A sink is a line handler (``sink(line)``) that only appends the line to a deque and
+# returns: no lock, `deque.append()` is atomic. A writer thread takes everything that
+# is pending at once and writes it with a single join + write(), when ``flush_lines``
+# lines have piled up or every ``flush_interval`` seconds at the latest. The receive
+# loop never waits on the terminal or the disk; it only waits when the writer is
+# ``max_pending`` lines behind (``on_full="block"``, TCP then pushes back on the
+# clients), or it drops lines (``on_full="drop"``).
+#
+#   server = LineServer(handler=FileSink("lines.txt"))
+#
+# ref:
+# - https://docs.python.org/3/library/collections.html#collections.deque (thread-safe appends and pops)
+# - https://docs.python.org/3/library/logging.handlers.html#rotatingfilehandler
+
+# Pending lines that wake the writer up before ``flush_interval``
+DEFAULT_FLUSH_LINES = 4096
+# Lines a sink holds before `write()` blocks or drops
+DEFAULT_MAX_PENDING = 100_000
+FULL_POLICIES = ("block", "drop")
+
+
+class SinkStats:
+    """Counters of one sink. ``dropped`` and ``errors`` are lines that were never written."""
+
+    __slots__ = ("lines", "batches", "bytes", "dropped", "errors")
+
+    def __init__(self):
+        self.lines = 0
+        self.batches = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def add(self, other: "SinkStats") -> None:
+        """Add the counts of ``other`` (e.g. another sink's) to these."""
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def __repr__(self) -> str:
+        """All the counters, e.g. ``SinkStats(lines=10, batches=1, ...)``."""
+        return "SinkStats({})".format(", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__))
+
+
+class _FlushMarker:
+    """Queued by `Sink.flush()`; the writer sets it once everything queued before it is written."""
+
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class Sink:
+    r"""
+    Base class: queues lines and writes them in batches from a background thread.
+
+    Subclasses implement `_write()` (one encoded batch) and, if they hold a resource,
+    `_close_target()`; `CallbackSink` overrides `_write_batch()` to get the lines as is.
+
+    The writer thread starts with the first line. `flush()` waits until everything
+    written so far is out, `close()` flushes and stops the thread; a sink is also a
+    context manager.
+
+    :param flush_lines: int
+        Write as soon as this many lines are pending.
+    :param flush_interval: float
+        Most seconds a line waits before it is written.
+    :param max_pending: int
+        Lines held at most while the writer is busy.
+    :param on_full: str
+        What `write()` does when ``max_pending`` lines are pending: ``"block"`` until
+        the writer caught up, or ``"drop"`` the line (counted in ``stats.dropped``).
+    :param prefix: str
+        Written before every line, e.g. ``"read: "``.
+    :param encoding: str
+        Encoding of ``str`` lines.
+    """
+
+    def __init__(
+        self,
+        flush_lines: int = DEFAULT_FLUSH_LINES,
+        flush_interval: float = 0.1,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        on_full: str = "block",
+        prefix: str = "",
+        encoding: str = "utf-8",
+    ):
+        if on_full not in FULL_POLICIES:
+            raise ValueError("on_full must be one of {}".format(FULL_POLICIES))
+        if not 1 <= flush_lines <= max_pending:
+            raise ValueError("need 1 <= flush_lines <= max_pending")
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_full = on_full
+        self.prefix = prefix
+        self.encoding = encoding
+        self.stats = SinkStats()
+
+        self._pending: Deque[Union[Line, _FlushMarker]] = deque()
+        self._markers = 0  # `_FlushMarker`s in `_pending`
+        self._closed = False
+        self._stopped = False  # the writer thread is gone, nothing queued gets written anymore
+        # `write()` takes the slow path at this many pending lines: 0 until the writer
+        # runs and once closed, ``flush_lines`` normally, ``max_pending`` while the writer
+        # has been woken up but hasn't drained yet (it may have to wait for the GIL)
+        self._slow_at = 0
+        self._urgent = threading.Event()  # write now, don't wait for flush_interval
+        self._lock = threading.Lock()  # everything but the append itself
+        self._room = threading.Condition(self._lock)  # blocked writers wait here
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "Sink":
+        """Return the sink itself."""
+        return self
+
+    def __exit__(self, *exc) -> None:
+        """Close the sink (see `close()`)."""
+        self.close()
+
+    def write(self, line: Line) -> None:
+        """Queue one line (without its newline)."""
+        if type(line) is memoryview:
+            line = bytes(line)  # "view" lines are only valid until the next read
+        if len(self._pending) >= self._slow_at and not self._make_room():
+            self.stats.dropped += 1
+            return
+        self._pending.append(line)
+        if self._closed:
+            # Raced `close()` between the check and the append
+            self._drop_unwritten()
+
+    __call__ = write  # a sink is a line handler; no extra call per line
+
+    def write_many(self, lines: Iterable[Line]) -> None:
+        """Queue several lines at once, e.g. a `LineBatch`."""
+        lines = [bytes(line) if type(line) is memoryview else line for line in lines]
+        if len(self._pending) + len(lines) > self._slow_at and not self._make_room():
+            self.stats.dropped += len(lines)
+            return
+        self._pending.extend(lines)
+        if self._closed:
+            self._drop_unwritten()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every line queued so far has been written.
+
+        :return: bool
+            ``False`` if ``timeout`` ran out first.
+        """
+        if self._thread is None:
+            return True
+        marker = _FlushMarker()
+        with self._lock:
+            self._markers += 1
+            self._pending.append(marker)
+        self._urgent.set()
+        return marker.done.wait(timeout)
+
+    def close(self) -> None:
+        """
+        Write what is pending, stop the writer thread and release the target.
+
+        A line written concurrently with `close()` is either written or counted in
+        ``stats.dropped``; after it, `write()` raises `ValueError`.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._slow_at = 0
+            self._room.notify_all()
+            thread, self._thread = self._thread, None
+        self._urgent.set()
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._stopped = True
+            self._drop_unwritten_locked()
+        self._close_target()
+
+    # ------------------------------------------------------------------ #
+
+    def _make_room(self) -> bool:
+        """
+        Slow path of `write()`; ``False`` means drop the line(s).
+
+        Starts the writer, wakes it up, and waits for room when ``max_pending`` lines
+        are pending.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("write to a closed sink")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+                self._thread.start()
+                self._slow_at = self.flush_lines
+            if len(self._pending) < self.flush_lines:
+                return True
+            self._urgent.set()
+            self._slow_at = self.max_pending
+            if len(self._pending) < self.max_pending:
+                return True
+            if self.on_full == "drop":
+                return False
+            self._room.wait_for(lambda: len(self._pending) < self.max_pending or self._closed)
+            if self._closed:
+                raise ValueError("write to a closed sink")
+            return True
+
+    def _drop_unwritten(self) -> None:
+        with self._lock:
+            if self._stopped:
+                self._drop_unwritten_locked()
+            # else `close()` counts them once the writer thread has stopped
+
+    def _drop_unwritten_locked(self) -> None:
+        # Lines appended after the writer's last pass: count them instead of losing them silently
+        pending = self._pending
+        while pending:
+            item = pending.popleft()
+            if type(item) is _FlushMarker:
+                item.done.set()
+            else:
+                self.stats.dropped += 1
+
+    def _run(self) -> None:
+        pending = self._pending
+        while True:
+            self._urgent.wait(self.flush_interval)
+            self._urgent.clear()
+            closed = self._closed
+            batch = [pending.popleft() for _ in range(len(pending))]
+            with self._lock:
+                if not self._closed:
+                    self._slow_at = self.flush_lines
+            markers = []
+            if self._markers:
+                markers = [item for item in batch if type(item) is _FlushMarker]
+                batch = [item for item in batch if type(item) is not _FlushMarker]
+                with self._lock:
+                    self._markers -= len(markers)
+            if batch:
+                with self._lock:
+                    self._room.notify_all()  # there is room again
+                self._write_batch_safely(batch)
+            for marker in markers:
+                marker.done.set()
+            if closed and not pending:
+                return
+
+    def _write_batch_safely(self, batch: List[Line]) -> None:
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            # A full disk or a closed pipe loses this batch, not the writer thread
+            self.stats.errors += len(batch)
+            logger.exception(e)
+            return
+        self.stats.lines += len(batch)
+        self.stats.batches += 1
+
+    def _write_batch(self, batch: List[Line]) -> None:
+        data = self._encode(batch)
+        self._write(data)
+        self.stats.bytes += len(data)
+
+    def _encode(self, batch: List[Line]) -> bytes:
+        prefix = self.prefix
+        if type(batch[0]) is str:
+            try:
+                text = prefix + ("\n" + prefix).join(batch) + "\n"
+            except TypeError:
+                pass  # str and bytes lines mixed
+            else:
+                try:
+                    return text.encode(self.encoding, "surrogateescape")
+                except UnicodeEncodeError:
+                    return text.encode(self.encoding, "backslashreplace")
+        raw_prefix = prefix.encode(self.encoding)
+        lines = (line if type(line) is bytes else str(line).encode(self.encoding, "backslashreplace") for line in batch)
+        return raw_prefix + (b"\n" + raw_prefix).join(lines) + b"\n"
+
+    def _write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    def _close_target(self) -> None:
+        pass
+
+
+class StdoutSink(Sink):
+    r"""
+    Lines to standard output (or another stream), by default in the format of `print_line()`.
+
+    :param stream: TextIO
+        ``None`` means whatever `sys.stdout` is when a batch is written.
+    """
+
+    def __init__(self, stream=None, prefix: str = "read: ", **kwargs):
+        super().__init__(prefix=prefix, **kwargs)
+        self.stream = stream
+
+    def _write(self, data: bytes) -> None:
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.flush()  # anything print()ed before goes first
+        raw = getattr(stream, "buffer", None)
+        if raw is not None:
+            raw.write(data)
+            raw.flush()
+        else:  # e.g. io.StringIO
+            stream.write(data.decode(self.encoding, "replace"))
+            stream.flush()
+
+
+class FileSink(Sink):
+    r"""
+    Lines appended to a file, one ``write()`` syscall per batch.
+
+    :param path: str
+        The file; created if missing.
+    :param mode: str
+        ``"a"`` appends, ``"w"`` truncates first.
+    :param fsync: bool
+        `os.fsync()` after every batch (durable, much slower).
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], mode: str = "a", fsync: bool = False, **kwargs):
+        if mode not in ("a", "w"):
+            raise ValueError("mode must be 'a' or 'w'")
+        super().__init__(**kwargs)
+        self.path = os.fspath(path)
+        self.fsync = fsync
+        # Opened now, so a bad path fails here and not in the writer thread
+        self._file = open(self.path, mode + "b", buffering=0)
+
+    def _write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:  # a raw write() may be partial
+            view = view[self._file.write(view) :]
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _close_target(self) -> None:
+        self._file.close()
+
+
+class RotatingFileSink(FileSink):
+    r"""
+    `FileSink` that rolls over at ``max_bytes``.
+
+    Like `logging.handlers.RotatingFileHandler`: ``path`` -> ``path.1`` -> ... ->
+    ``path.<backup_count>`` (the oldest is deleted).
+
+    Batches are split at line boundaries as needed, so a file only exceeds ``max_bytes``
+    when a single line is longer than that. ``backup_count=0`` truncates instead.
+
+    :param max_bytes: int
+        Size at which the file is rotated.
+    :param backup_count: int
+        Rotated files to keep.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], max_bytes: int, backup_count: int = 5, **kwargs):
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be >= 1")
+        super().__init__(path, mode="a", **kwargs)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._size = os.fstat(self._file.fileno()).st_size
+
+    def _write(self, data: bytes) -> None:
+        while self._size + len(data) > self.max_bytes:
+            # As many whole lines as still fit; at least one line into an empty file
+            cut = data.rfind(b"\n", 0, self.max_bytes - self._size) + 1
+            if not cut and not self._size:
+                cut = data.find(b"\n") + 1 or len(data)
+            if cut:
+                super()._write(data[:cut])
+                data = data[cut:]
+            self._rotate()
+        if data:
+            super()._write(data)
+            self._size += len(data)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "wb", buffering=0)
+        self._size = 0
+
+
+class CallbackSink(Sink):
+    r"""
+    Hands every batch to ``callback(lines)`` on the writer thread.
+
+    Use it e.g. to bulk-insert into a database without slowing the receive loop down.
+
+    :param callback: Callable[[List[str]], None]
+        Gets a list of lines (no prefix, no newlines); an exception loses that batch.
+    """
+
+    def __init__(self, callback: Callable[[List[Line]], None], **kwargs):
+        super().__init__(**kwargs)
+        self.callback = callback
+
+    def _write_batch(self, batch: List[Line]) -> None:
+        self.callback(batch)
+
+
+class NullSink(Sink):
+    """Counts lines and discards them, right away and without a writer thread; for benchmarks."""
+
+    def write(self, line: Line) -> None:
+        """Count one line."""
+        with self._lock:
+            self.stats.lines += 1
+
+    def write_many(self, lines: Iterable[Line]) -> None:
+        """Count several lines."""
+        count = sum(1 for _ in lines)
+        with self._lock:
+            self.stats.lines += count
+
+    __call__ = write
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Nothing to wait for."""
+        return True
@@ -0,0 +1,372 @@
+import email.utils
+import mimetypes
+import os
+import posixpath
+import socket
+import stat
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote
+
+from tcp_to_http.body import BodyReader
+from tcp_to_http.connection import Response
+from tcp_to_http.metrics import Registry
+from tcp_to_http.request import Request
+
+# Static files for `HTTPServer`: ``HTTPServer(handler=StaticFiles("public"))``.
+#
+# Two read paths, picked per file size:
+# - small files (<= ``cache_file_bytes``) are read once and kept in an LRU cache, bounded
+#   by total bytes, together with their response headers and ETag. A hit costs one
+#   `os.stat()` to check the file didn't change, and no read at all.
+# - larger files go out with `socket.sendfile()`: sendfile(2) copies from the page cache
+#   to the socket inside the kernel, so the bytes never pass through Python (it falls
+#   back to read/send where sendfile(2) isn't available).
+# This is the serving counterpart of the mmap / os.read experiments in
+# `scripts/read_lines.py` and `tcp_to_http.readers`: for whole files nothing beats not
+# copying them at all.
+#
+# Conditional and partial requests, GET and HEAD only:
+# - ``If-None-Match`` (ETag) and ``If-Modified-Since`` answer 304 Not Modified;
+#   If-None-Match wins when both are sent.
+# - A single ``Range: bytes=...`` answers 206 Partial Content (416 if it is past the
+#   end). Multiple ranges get the whole file (200), which RFC 9110 allows; so does an
+#   ``If-Range`` that doesn't match the current ETag / date.
+#
+# ref:
+# - https://www.rfc-editor.org/rfc/rfc9110.html#name-conditional-requests
+# - https://www.rfc-editor.org/rfc/rfc9110.html#name-range-requests
+# - https://man7.org/linux/man-pages/man2/sendfile.2.html
+# - https://docs.python.org/3/library/socket.html#socket.socket.sendfile
+
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_CACHE_FILE_BYTES = 256 * 1024
+
+# Sent with the head of a sendfile() response so it leaves in one segment with the
+# first file bytes (Linux); 0 elsewhere
+_MSG_MORE = getattr(socket, "MSG_MORE", 0)
+
+
+class RangeNotSatisfiableError(ValueError):
+    """A ``Range`` that starts past the end of the file (416)."""
+
+
+class FileResponse(Response):
+    r"""
+    A response whose body is ``count`` bytes of an open file from ``offset``.
+
+    It is sent with `socket.sendfile()`, and the file is closed once it is sent.
+    """
+
+    __slots__ = ("file", "offset", "count")
+
+    def __init__(self, status: int, file, offset: int, count: int, headers: Dict[str, str]):
+        super().__init__(status, b"", headers)
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    @property
+    def content_length(self) -> int:
+        """``count``: the body is not held in memory."""
+        return self.count
+
+    def send(self, sock: socket.socket, keep_alive: bool, head_only: bool = False) -> None:
+        """Send the head, then the file bytes with `socket.sendfile()`; closes the file either way."""
+        try:
+            if head_only or not self.count:
+                sock.sendall(self.head(keep_alive))
+                return
+            sock.sendall(self.head(keep_alive), _MSG_MORE)
+            sent = sock.sendfile(self.file, self.offset, self.count)
+            if sent < self.count:
+                # The file shrank after its size went out in Content-Length; all we
+                # can do is close the connection so the client sees it's incomplete.
+                raise ConnectionAbortedError(
+                    "{} was truncated while being sent ({} of {} bytes)".format(self.file.name, sent, self.count)
+                )
+        finally:
+            self.file.close()
+
+
+class _File:
+    """What is known about one version of a file: validators, headers and (when cached) the bytes."""
+
+    __slots__ = ("version", "size", "mtime", "etag", "headers", "body")
+
+    def __init__(self, path: str, info: os.stat_result, body: Optional[bytes] = None):
+        self.version = (info.st_ino, info.st_mtime_ns, info.st_size)
+        self.size = info.st_size
+        self.mtime = int(info.st_mtime)  # HTTP dates have second resolution
+        self.etag = '"{:x}-{:x}"'.format(info.st_mtime_ns, info.st_size)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        self.headers = {
+            "Content-Type": content_type,
+            "ETag": self.etag,
+            "Last-Modified": email.utils.formatdate(self.mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+        self.body = body
+
+
+class FileCache:
+    r"""
+    Thread-safe LRU cache of small files, bounded by the sum of their sizes.
+
+    Entries are looked up with the file's current `os.stat()` and are only returned
+    if the file is still the same (inode, mtime and size), so edited files are picked
+    up on the next request.
+
+    :param max_bytes: int
+        Most file bytes held at once; the least recently used files go first.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, _File]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, info: os.stat_result) -> Optional[_File]:
+        """The cached entry for ``path`` if ``info`` says the file is unchanged, else ``None``."""
+        version = (info.st_ino, info.st_mtime_ns, info.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            if entry is not None:  # changed on disk
+                del self._entries[path]
+                self.size -= entry.size
+            self.misses += 1
+            return None
+
+    def put(self, path: str, entry: _File) -> None:
+        """Cache ``entry``, evicting the least recently used files to make room."""
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[path] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        """Number of cached files."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        """Size and hit counts, e.g. ``FileCache(files=3, size=2048, hits=10, ...)``."""
+        return "FileCache(files={}, size={}, hits={}, misses={}, evictions={})".format(
+            len(self), self.size, self.hits, self.misses, self.evictions
+        )
+
+
+class StaticFiles:
+    r"""
+    `HTTPServer` handler that serves the files under ``root``.
+
+    How to run:
+
+    1. Run `uv run tcp-to-http --mode http --root . --nodelay`
+    2. In another terminal run `curl -v http://127.0.0.1:42069/messages.txt`, then
+       `curl -v -r 0-99 ...` (206) and `curl -v -H 'If-None-Match: "<etag>"' ...` (304).
+
+    ``/dir/`` serves ``/dir/index.html``, ``/dir`` redirects to ``/dir/``. There are no
+    directory listings. ``..`` can't climb out of ``root`` (symlinks inside it are followed).
+
+    :param root: str
+        Directory to serve.
+    :param index: str
+        File served for a directory.
+    :param cache_bytes: int
+        Memory for the hot-file cache; ``0`` disables it.
+    :param cache_file_bytes: int
+        Files up to this size are cached, larger ones are sent with `socket.sendfile()`.
+    :param metrics: Registry
+        Publish cache hits, misses and size in it (see `tcp_to_http.metrics`).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        index: str = "index.html",
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        cache_file_bytes: int = DEFAULT_CACHE_FILE_BYTES,
+        metrics: Optional[Registry] = None,
+    ):
+        self.root = os.path.realpath(root)
+        if not os.path.isdir(self.root):
+            raise ValueError("Not a directory: {!r}".format(root))
+        self.index = index
+        self.cache_file_bytes = cache_file_bytes if cache_bytes else -1
+        self.cache = FileCache(cache_bytes)
+        if metrics is not None:
+            cache = self.cache
+            metrics.callback(
+                "tcp_to_http_static_cache_hits_total", "Files served from memory.", lambda: cache.hits, kind="counter"
+            )
+            metrics.callback(
+                "tcp_to_http_static_cache_misses_total",
+                "Files looked up in the cache and read from disk.",
+                lambda: cache.misses,
+                kind="counter",
+            )
+            metrics.callback("tcp_to_http_static_cache_bytes", "File bytes held in the cache.", lambda: cache.size)
+
+    def __call__(self, request: Request, body: BodyReader) -> Response:
+        """Answer one request: the file, 206, 304, 416, or 301/404/405."""
+        body.drain()
+        if request.method not in ("GET", "HEAD"):
+            return Response(405, b"Method Not Allowed\n", {"Content-Type": "text/plain", "Allow": "GET, HEAD"})
+
+        url_path = unquote(request.target.split("?", 1)[0].split("#", 1)[0])
+        if not url_path.startswith("/") or "\0" in url_path:
+            return _not_found()
+        # normpath() of an absolute path can't go above "/", so neither above root
+        path = os.path.join(self.root, posixpath.normpath(url_path).lstrip("/"))
+        try:
+            info = os.stat(path)
+            if stat.S_ISDIR(info.st_mode):
+                if not url_path.endswith("/"):
+                    return Response(301, b"", {"Location": request.target.split("?", 1)[0] + "/"})
+                path = os.path.join(path, self.index)
+                info = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            return _not_found()
+        if not stat.S_ISREG(info.st_mode):
+            return _not_found()
+
+        file = None
+        entry = self.cache.get(path, info) if info.st_size <= self.cache_file_bytes else None
+        if entry is None:
+            try:
+                file = open(path, "rb")
+            except (FileNotFoundError, PermissionError):
+                return _not_found()
+            # What is actually open, in case the file was replaced since the stat()
+            info = os.fstat(file.fileno())
+            if info.st_size <= self.cache_file_bytes:
+                with file:
+                    entry = _File(path, info, file.read())
+                file = None
+                self.cache.put(path, entry)
+            else:
+                entry = _File(path, info)
+
+        try:
+            return self._respond(request, entry, file)
+        except BaseException:
+            if file is not None:
+                file.close()
+            raise
+
+    def _respond(self, request: Request, entry: _File, file) -> Response:
+        if _not_modified(request, entry):
+            if file is not None:
+                file.close()
+            headers = {name: entry.headers[name] for name in ("ETag", "Last-Modified")}
+            return Response(304, b"", headers)
+
+        headers = dict(entry.headers)
+        status, first, count = 200, 0, entry.size
+        value = request.header("range")
+        if value is not None and request.method == "GET" and _if_range_matches(request, entry):
+            try:
+                byte_range = _parse_range(value, entry.size)
+            except RangeNotSatisfiableError:
+                if file is not None:
+                    file.close()
+                headers = {"Content-Type": "text/plain", "Content-Range": "bytes */{}".format(entry.size)}
+                return Response(416, b"Range Not Satisfiable\n", headers)
+            if byte_range is not None:
+                first, last = byte_range
+                status, count = 206, last - first + 1
+                headers["Content-Range"] = "bytes {}-{}/{}".format(first, last, entry.size)
+
+        if file is not None:
+            return FileResponse(status, file, first, count, headers)
+        body = entry.body if status == 200 else entry.body[first : first + count]
+        return Response(status, body, headers)
+
+
+def _not_found() -> Response:
+    return Response(404, b"Not Found\n")
+
+
+def _not_modified(request: Request, entry: _File) -> bool:
+    # RFC 9110 13.2.2: If-None-Match first, If-Modified-Since only without it
+    if_none_match = request.header("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: W/"x" matches "x"
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return entry.etag in tags or "W/" + entry.etag in tags
+    if_modified_since = request.header("if-modified-since")
+    if if_modified_since is not None:
+        since = _parse_date(if_modified_since)
+        return since is not None and entry.mtime <= since
+    return False
+
+
+def _if_range_matches(request: Request, entry: _File) -> bool:
+    """Whether a ``Range`` applies: without ``If-Range``, or if it names this version (RFC 9110 13.1.5)."""
+    if_range = request.header("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', "W/")):
+        return if_range == entry.etag  # strong comparison
+    return _parse_date(if_range) == entry.mtime
+
+
+def _parse_date(value: str) -> Optional[int]:
+    parsed = email.utils.parsedate_tz(value)
+    return email.utils.mktime_tz(parsed) if parsed is not None else None
+
+
+def _is_digits(value: str) -> bool:
+    return value.isdigit() and value.isascii()
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    ``(first, last)`` byte positions (inclusive) of a single ``bytes=`` range.
+
+    ``None`` for ranges that are ignored (other units, several ranges, bad syntax),
+    in which case the whole file is sent.
+
+    :raise RangeNotSatisfiableError: when the range starts past the end of the file.
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last) or not all(_is_digits(part) for part in (first, last) if part):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        suffix = int(last)
+        if not suffix or not size:
+            raise RangeNotSatisfiableError(value)
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError(value)
+    return start, min(int(last), size - 1) if last else size - 1
+
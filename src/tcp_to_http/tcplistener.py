@@ -1,75 +1,837 @@
+import codecs
 import io
+import select
 import socket
-from typing import Callable, Generator, Optional, Union
+import time
+from typing import Callable, Generator, List, NamedTuple, Optional, Tuple, Union
 
 from tcp_to_http import logger
 
+# Default read size: 64 KiB amortises the syscall cost over hundreds of lines,
+# where the original 8-byte reads paid one syscall per 8 bytes.
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
-def get_lines_from_reader(stream: Union[io.FileIO, socket.SocketIO, socket.socket]) -> Generator[str, None, None]:
+
+def _get_read_into(
+    stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+) -> Callable[[memoryview], Optional[int]]:
+    """Return a ``read_into(view) -> n`` callable for the stream, preferring zero-copy methods."""
+    # readinto()/recv_into() fill our preallocated buffer directly instead of
+    # allocating a new bytes object per read.
+    # ref:
+    # - https://docs.python.org/3/library/io.html#io.RawIOBase.readinto
+    # - https://docs.python.org/3/library/socket.html#socket.socket.recv_into
+    read_into = getattr(stream, "readinto", None) or getattr(stream, "recv_into", None)
+    if read_into:
+        return read_into
+
+    reader: Optional[Callable[[int], bytes]] = getattr(stream, "read", None) or getattr(stream, "recv", None)
+    if not reader:
+        raise ValueError("Need .read() or .recv()")
+
+    def _copy_into(view: memoryview) -> int:
+        data = reader(len(view))
+        view[: len(data)] = data
+        return len(data)
+
+    return _copy_into
+
+
+# What `get_lines_from_reader()` yields per line, see its docstring for the lifetime rules
+LINE_MODES = ("str", "bytes", "view")
+Line = Union[str, bytes, memoryview]
+
+# Decoding:
+# - Codecs that encode ASCII as ASCII and are stateless (UTF-8, Latin-1, cp1252,
+#   Shift-JIS, GB18030, ...) are framed on bytes: b"\n" can't occur inside a multi-byte
+#   sequence, so every line decodes on its own and one bad line stays one bad line.
+# - Everything else (UTF-16/32, UTF-7, ISO-2022) is decoded as one stream with an
+#   incremental decoder, which carries sequences split across reads over, and framed
+#   on the decoded text.
+# ref:
+# - https://docs.python.org/3/library/codecs.html#incremental-decoding
+# - https://docs.python.org/3/library/codecs.html#error-handlers
+_ASCII = bytes(range(128))
+# Codecs whose own decoder is as fast as decoding ASCII, so the ASCII fast path only costs
+_FAST_CODECS = frozenset({"utf-8", "ascii", "iso8859-1"})
+
+
+class DecodeStats:
+    """
+    Malformed input seen while framing and decoding lines.
+
+    ``malformed`` counts lines that were not valid in the encoding (for codecs that are
+    decoded incrementally: reads, since there are no byte-level lines to blame) and
+    ``dropped`` how many of those lines were discarded (``errors="strict"``).
+    ``too_long`` counts lines over ``max_line_bytes`` that were truncated or skipped.
+    """
+
+    __slots__ = ("malformed", "dropped", "too_long")
+
+    def __init__(self):
+        self.malformed = 0
+        self.dropped = 0
+        self.too_long = 0
+
+    def add(self, other: "DecodeStats") -> None:
+        """Add the counts of ``other`` (e.g. a worker's) to these."""
+        self.malformed += other.malformed
+        self.dropped += other.dropped
+        self.too_long += other.too_long
+
+
+class LineDecoder:
+    r"""
+    Decodes framed lines with an explicit encoding and error policy.
+
+    Malformed input never raises: it is counted in `stats` and handled per ``errors``.
+
+    - ``"strict"``: the malformed line is dropped. With an incremental codec the
+      offending bytes can't be tied to a line, they are replaced with U+FFFD instead.
+    - Any other codec error handler (``"replace"``, ``"ignore"``, ``"surrogateescape"``,
+      ``"backslashreplace"``, ...): the line is decoded with it.
+
+    Pure-ASCII blocks skip the codec for encodings whose decoder is slow (cp1252,
+    Shift-JIS, GB18030, ...) and are decoded as ASCII instead.
+
+    :param encoding: str
+        Any codec known to `codecs.lookup()`.
+    :param errors: str
+        ``"strict"`` or the name of a registered error handler.
+    :param stats: DecodeStats
+        Where to count malformed input; a fresh one by default.
+    """
+
+    def __init__(self, encoding: str = "utf-8", errors: str = "strict", stats: Optional[DecodeStats] = None):
+        info = codecs.lookup(encoding)  # LookupError for unknown encodings...
+        codecs.lookup_error(errors)  # ...and for unknown error handlers, up front
+        self.encoding = info.name
+        self.errors = errors
+        self.stats = stats if stats is not None else DecodeStats()
+        self.incremental = not _is_line_safe(info.name)
+        self._ascii_fast_path = not self.incremental and info.name not in _FAST_CODECS
+        if self.incremental:
+            self._decoder = info.incrementaldecoder("strict")
+            self._fallback = info.incrementaldecoder("replace" if errors == "strict" else errors)
+
+    def decode_lines(self, block: Union[bytes, bytearray, memoryview]) -> List[str]:
+        """Decode LF-separated lines (no trailing LF) and split them; for byte-framed codecs only."""
+        if self._ascii_fast_path:
+            try:
+                return str(block, "ascii").split("\n")
+            except UnicodeDecodeError:
+                pass
+        try:
+            return str(block, self.encoding).split("\n")
+        except UnicodeDecodeError:
+            # Rare: find the bad line(s) and apply the error policy to them alone
+            return self._decode_each(bytes(block).split(b"\n"))
+
+    def decode_head(self, head: Union[bytes, bytearray, memoryview]) -> List[str]:
+        """Decode the kept part of a truncated line, minus a character the cut went through."""
+        try:
+            return [str(head, self.encoding)]
+        except UnicodeDecodeError as e:
+            if e.end == len(head):
+                head = head[: e.start]
+        return self.decode_lines(head)
+
+    def _decode_each(self, raw_lines: List[bytes]) -> List[str]:
+        lines = []
+        for raw in raw_lines:
+            try:
+                lines.append(str(raw, self.encoding))
+            except UnicodeDecodeError as e:
+                self.stats.malformed += 1
+                if self.errors == "strict":
+                    self.stats.dropped += 1
+                    logger.debug(f"Dropped a malformed line: {e}")
+                else:
+                    lines.append(str(raw, self.encoding, self.errors))
+        return lines
+
+    def decode(self, data: Union[bytes, memoryview], final: bool = False) -> str:
+        """Decode the next piece of the stream; for incremental codecs only."""
+        state = self._decoder.getstate()
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            self.stats.malformed += 1
+            # Redo this piece from the same state with the error handler
+            self._fallback.setstate(state)
+            text = self._fallback.decode(data, final)
+            self._decoder.setstate(self._fallback.getstate())
+            return text
+
+
+def _is_line_safe(encoding: str) -> bool:
+    """Whether lines of ``encoding`` can be framed on the LF byte and decoded one by one."""
+    if encoding.startswith("iso2022"):  # ASCII-compatible, but escape sequences switch state
+        return False
+    try:
+        return str(_ASCII, encoding) == str(_ASCII, "ascii")
+    except UnicodeDecodeError:
+        return False
+
+
+# What to do with a line longer than ``max_line_bytes``
+LONG_LINE_POLICIES = ("error", "truncate", "skip")
+
+
+class LineTooLongError(ValueError):
+    """
+    A line went over ``max_line_bytes`` with ``on_long_line="error"``.
+
+    ``lines`` holds the lines completed before it that were not handed out yet (by
+    `LineFramer.feed()`; the generators yield them before raising).
+    """
+
+    def __init__(self, message: str, lines: Optional[List[Line]] = None):
+        super().__init__(message)
+        self.lines = lines or []
+
+
+class _LineLimit:
+    """``max_line_bytes`` and the ``on_long_line`` policy, shared by the framers."""
+
+    __slots__ = ("max_bytes", "policy", "stats", "error")
+
+    def __init__(self, max_bytes: int, policy: str = "error", stats: Optional[DecodeStats] = None):
+        if max_bytes < 1:
+            raise ValueError("max_line_bytes must be >= 1")
+        if policy not in LONG_LINE_POLICIES:
+            raise ValueError("on_long_line must be one of {}".format(LONG_LINE_POLICIES))
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.stats = stats if stats is not None else DecodeStats()
+        self.error: Optional[LineTooLongError] = None
+
+    def exceeded(self, size: int) -> None:
+        """
+        Count a line of ``size`` (or more) over the limit.
+
+        With the ``"error"`` policy the error is only noted: the framer stops at that
+        line, hands out the lines before it and then calls `check()`.
+        """
+        if self.policy == "error":
+            if self.error is None:
+                self.error = LineTooLongError("Line of {} bytes or more, limit is {}".format(size, self.max_bytes))
+            return
+        self.stats.too_long += 1
+
+    def check(self, lines: Optional[List[Line]] = None) -> None:
+        """Raise the noted `LineTooLongError`, with the ``lines`` not handed out yet."""
+        if self.error is not None:
+            self.error.lines = lines or []
+            raise self.error
+
+    def cap_lines(self, lines: List[Union[bytes, str]]) -> List[Union[bytes, str]]:
+        """Apply the limit to complete lines (CR still attached), e.g. as split from a block."""
+        limit = self.max_bytes
+        if max(map(len, lines)) <= limit:
+            capped = lines
+        else:
+            capped = []
+            for line in lines:
+                size = len(line) - (line[-1:] in (b"\r", "\r"))
+                if size <= limit:
+                    capped.append(line)
+                else:
+                    self.exceeded(size)
+                    if self.policy == "error":
+                        break  # nothing after it is handed out
+                    if self.policy == "truncate":
+                        capped.append(line[:limit])
+        return capped
+
+    def split(self, block: Union[bytes, bytearray, memoryview], decoder: Optional[LineDecoder]) -> List[Line]:
+        """Split (and decode) a block of complete lines like the framers do, applying the limit."""
+        lines = bytes(block).split(b"\n")
+        raw = self.cap_lines(lines)
+        if decoder is None:
+            return raw
+        if raw is lines:  # nothing over the limit
+            return decoder.decode_lines(block)
+        if self.policy != "truncate":
+            return decoder.decode_lines(b"\n".join(raw)) if raw else []
+        # The cut may have gone through a multi-byte character
+        limit = self.max_bytes
+        return [text for line in raw for text in (decoder.decode_head if len(line) == limit else decoder.decode_lines)(line)]
+
+
+def _split_text(text: str) -> Tuple[List[str], str]:
+    """Split decoded text into complete lines (CR stripped) and the unfinished rest."""
+    last_new_line = text.rfind("\n")
+    if last_new_line == -1:
+        return [], text
+    lines = text[:last_new_line].split("\n")
+    if "\r" in text:
+        lines = [line[:-1] if line.endswith("\r") else line for line in lines]
+    return lines, text[last_new_line + 1 :]
+
+
+def get_lines_from_reader(
+    stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mode: str = "str",
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+    max_line_bytes: Optional[int] = None,
+    on_long_line: str = "error",
+) -> Generator[Line, None, None]:
     r"""
     Incrementally read text lines from a binary stream or socket.
 
-    The function consumes bytes from the given stream-like object in
-    small chunks, accumulates them in a buffer, and yields decoded
-    lines one at a time when a newline character is encountered.
+    The function reads the stream in ``chunk_size`` pieces straight into one
+    preallocated buffer, and yields decoded lines one at a time when a newline
+    character is encountered.
+
+    Framing engine
+    --------------
+    - ``readinto()`` / ``recv_into()`` write into the buffer, no per-read allocation
+      (streams that only have ``.read()`` / ``.recv()`` are copied in instead).
+    - ``start`` marks the beginning of the current line and ``scan`` where the
+      newline search resumes, so no byte is searched twice. All complete lines of
+      a chunk are decoded and split in one go.
+    - The unfinished tail is moved to the front of the buffer once per chunk (not
+      once per line), and the buffer only grows when a single line is longer than it.
+
+    Bounded memory
+    --------------
+    Without ``max_line_bytes`` one client that never sends a newline makes the buffer
+    grow without end. With it, a line is dealt with as soon as its unfinished part
+    goes over the limit (``on_long_line``), so the buffer stays below
+    ``max(chunk_size, max_line_bytes + 2)`` bytes:
+
+    - ``"error"``: raise `LineTooLongError` (the stream can't be resynchronised by us).
+    - ``"truncate"``: yield its first ``max_line_bytes`` bytes, discard the rest up to the next newline.
+    - ``"skip"``: discard all of it up to the next newline.
+
+    Reads only happen when the consumer asks for the next line, so a slow consumer
+    leaves the data in the kernel's socket buffer and TCP flow control pushes back on
+    the sender; nothing piles up in Python.
 
-    :param reader: io.FileIO or socket.SocketIO or socket.socket
-        A file-like object with a ``.read(size) -> bytes`` method, or
-        a socket-like object with a ``.recv(size) -> bytes`` method.
+    Other read errors end the lines (and are logged), except `socket.timeout` from a
+    socket with a timeout set, which is raised like `LineTooLongError`.
 
-    :yield: str
-        Decoded lines of text without trailing newline characters.
+    Line modes and lifetimes
+    ------------------------
+    - ``"str"``: decoded ``str`` (the default). Independent objects, keep them as long as you like.
+    - ``"bytes"``: raw ``bytes``, no decoding. Also independent objects, safe to keep.
+    - ``"view"``: a ``memoryview`` slice of the receive buffer, no copy at all. A view is
+      only valid until the generator is advanced again: the next read compacts and
+      overwrites the buffer underneath it. Consume it right away (hash it, write it,
+      parse it) or keep ``bytes(line)``. Views that are kept around never raise, they
+      just show whatever bytes later replaced them.
+      Views are cut one line at a time in Python, so for short lines ``"bytes"`` (split
+      in C) is usually faster; ``"view"`` pays off when lines are long.
+
+    :param stream: io.FileIO or socket.SocketIO or socket.socket
+        A file-like object with a ``.readinto(buffer)`` or ``.read(size) -> bytes`` method, or
+        a socket-like object with a ``.recv_into(buffer)`` or ``.recv(size) -> bytes`` method.
+    :param chunk_size: int
+        Initial buffer size and the most bytes requested per read.
+    :param mode: str
+        One of ``"str"``, ``"bytes"`` or ``"view"`` (see above).
+    :param encoding: str
+        Encoding of the stream in ``"str"`` mode.
+    :param errors: str
+        What to do with lines that are not valid in ``encoding``: ``"strict"`` drops them,
+        any codec error handler (``"replace"``, ``"surrogateescape"``, ...) decodes them
+        with it. Either way the stream goes on, see `LineDecoder`.
+    :param stats: DecodeStats
+        Counts malformed, dropped and over-long lines, pass one in to read them.
+    :param max_line_bytes: int
+        Longest line accepted, in bytes without CR/LF (in characters for codecs that
+        are decoded incrementally, like UTF-16). ``None`` means no limit.
+    :param on_long_line: str
+        ``"error"``, ``"truncate"`` or ``"skip"`` (see above).
+
+    :yield: str or bytes or memoryview
+        Lines without trailing newline characters.
 
     """
-    # if not (isinstance(f, io.FileIO) or isinstance(f, socket.SocketIO) or isinstance(f, socket.socket)):
-    #     raise ValueError("Invalid file or connection type provided!")
+    if mode not in LINE_MODES:
+        raise ValueError("mode must be one of {}".format(LINE_MODES))
+    read_into = _get_read_into(stream)
+    stats = stats if stats is not None else DecodeStats()
+    decoder = LineDecoder(encoding, errors, stats) if mode == "str" else None
+    limit = _LineLimit(max_line_bytes, on_long_line, stats) if max_line_bytes is not None else None
+    # If the stream has `.readinto()`, read_into is a bound method (callable: read_into(view) -> int).
+    # The TCP connection object exposes `conn.recv_into()` if you have passed the connection
+    # object itself as the stream. (See `receive_data_from_tcp_conn()` for more)
 
-    reader: Optional[Callable[[int], bytes]] = getattr(stream, "read", None)
-    receiver: Optional[Callable[[int], bytes]] = getattr(stream, "recv", None)
-    # If f has a .read(), reader is a bound method (callable: reader(n) -> bytes). If not, it’s None.
-    # Similarly, the TCP connection object exposes `conn.recv()` method to read the bytes sent
-    # if you have passed the connection object as the stream. (See `get_from_conn()` method for more)
-    # So their types are “either a callable that returns bytes, or None.
+    try:
+        for lines, _ in _frame_chunks(read_into, chunk_size, mode, decoder=decoder, limit=limit):
+            yield from lines
+    except (LineTooLongError, socket.timeout):
+        raise  # the caller decides what happens to the connection
+    except Exception as e:
+        logger.exception(e)
 
-    if not reader and not receiver:
-        raise ValueError("Need .read() or .recv()")
+
+class LineBatch(NamedTuple):
+    """A batch of complete lines and the number of raw bytes (newlines included) they were framed from."""
+
+    lines: List[Line]
+    nbytes: int
+
+
+def get_line_batches(
+    stream: Union[io.FileIO, socket.SocketIO, socket.socket],
+    max_batch: int = 1024,
+    max_delay: float = 0.0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mode: str = "str",
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+    max_line_bytes: Optional[int] = None,
+    on_long_line: str = "error",
+    max_batch_bytes: Optional[int] = None,
+) -> Generator[LineBatch, None, None]:
+    r"""
+    Incrementally read lines from a binary stream or socket, delivered in batches.
+
+    Same framing as `get_lines_from_reader()`, but instead of one line per `next()`
+    it yields a `LineBatch` with every complete line from one or more reads, so
+    per-line generator overhead disappears and handlers can process and write in bulk.
+
+    Batching rules
+    --------------
+    - With ``max_delay=0`` (the default) each read that completes lines becomes one batch.
+    - With ``max_delay > 0`` more reads are added to the batch while more data is
+      already waiting, for at most ``max_delay`` seconds after the batch's first read.
+      An idle stream never holds a batch back longer than that (waiting is done with
+      `select()`, so the stream needs a ``.fileno()``).
+    - A batch is flushed as soon as it holds ``max_batch`` lines or more (or
+      ``max_batch_bytes`` raw bytes). Lines from one read are never split across
+      batches, so a batch may overshoot by one read's worth.
+
+    Errors are handled like in `get_lines_from_reader()`; before `LineTooLongError` or
+    `socket.timeout` is raised, the open batch is yielded.
+
+    :param stream: io.FileIO or socket.SocketIO or socket.socket
+        Same as for `get_lines_from_reader()`.
+    :param max_batch: int
+        Line count that triggers a flush.
+    :param max_delay: float
+        Seconds to keep a non-empty batch open for further reads.
+    :param chunk_size: int
+        Initial buffer size and the most bytes requested per read.
+    :param mode: str
+        ``"str"`` or ``"bytes"``. ``"view"`` is not supported because a batch spans
+        several reads and views only live until the next one.
+    :param encoding: str
+        Same as for `get_lines_from_reader()`.
+    :param errors: str
+        Same as for `get_lines_from_reader()`.
+    :param stats: DecodeStats
+        Same as for `get_lines_from_reader()`.
+    :param max_line_bytes: int
+        Same as for `get_lines_from_reader()`.
+    :param on_long_line: str
+        Same as for `get_lines_from_reader()`.
+    :param max_batch_bytes: int
+        Raw bytes that trigger a flush; with ``max_line_bytes`` this bounds everything
+        a connection holds in memory.
+
+    :yield: LineBatch
+        ``(lines, nbytes)`` with ``nbytes`` counting the raw bytes including CR/LF.
+    """
+    if mode not in ("str", "bytes"):
+        raise ValueError("mode must be 'str' or 'bytes' for batches")
+    if max_batch < 1:
+        raise ValueError("max_batch must be >= 1")
+    if max_batch_bytes is not None and max_batch_bytes < 1:
+        raise ValueError("max_batch_bytes must be >= 1")
+    read_into = _get_read_into(stream)
+    stats = stats if stats is not None else DecodeStats()
+    decoder = LineDecoder(encoding, errors, stats) if mode == "str" else None
+    limit = _LineLimit(max_line_bytes, on_long_line, stats) if max_line_bytes is not None else None
+
+    batch: List[Line] = []
+    nbytes = 0
+    deadline = 0.0
+
+    def _is_idle() -> bool:
+        # Only wait while a batch is open, otherwise just block in the next read
+        if not batch:
+            return False
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return True
+        readable, _, _ = select.select([stream], [], [], timeout)
+        return not readable
 
     try:
-        buffer = bytearray()
-        while True:
-            # Read 8 bytes at a time
-            # chunk = f.read(8) if isinstance(f, io.FileIO) else f.recv(8)
-            chunk = reader(8) if reader else receiver(8)
-            if not chunk:  # EOF reached
-                # Files: .read() returns b'' at EOF
-                # TCP: .recv() returns b'' when the peer cleanly closes
-                break
-
-            buffer.extend(chunk)
-            # Emit as many complete lines in buffer
+        idle = _is_idle if max_delay > 0 else None
+        for lines, n in _frame_chunks(read_into, chunk_size, mode, is_idle=idle, decoder=decoder, limit=limit):
+            if lines:
+                if not batch:
+                    deadline = time.monotonic() + max_delay
+                batch.extend(lines)
+                nbytes += n
+                below_bytes = max_batch_bytes is None or nbytes < max_batch_bytes
+                if max_delay > 0 and len(batch) < max_batch and below_bytes:
+                    continue
+            if batch:
+                yield LineBatch(batch, nbytes)
+                batch = []
+                nbytes = 0
+        if batch:
+            yield LineBatch(batch, nbytes)
+    except (LineTooLongError, socket.timeout):
+        if batch:  # the lines before the long one (or the timeout)
+            yield LineBatch(batch, nbytes)
+        raise
+    except Exception as e:
+        logger.exception(e)
+
+
+def _frame_chunks(
+    read_into: Callable[[memoryview], Optional[int]],
+    chunk_size: int,
+    mode: str,
+    is_idle: Optional[Callable[[], bool]] = None,
+    decoder: Optional[LineDecoder] = None,
+    limit: Optional[_LineLimit] = None,
+) -> Generator[Tuple[List[Line], int], None, None]:
+    """
+    The framing engine behind `get_lines_from_reader()` and `get_line_batches()`.
+
+    Yields ``(lines, nbytes)`` for every read that completed at least one line. If
+    ``is_idle`` is given it is asked before each read, and ``([], 0)`` is yielded
+    when it reports that no data is ready, so the caller can flush. ``"str"`` mode
+    needs a ``decoder``. With a ``limit`` the buffer never grows past the line limit
+    (or ``chunk_size``, whichever is larger).
+    """
+    decode = mode == "str"
+    if decode and decoder is None:
+        decoder = LineDecoder()
+    if decode and decoder.incremental:
+        yield from _frame_text(read_into, chunk_size, decoder, is_idle, limit)
+        return
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    start = 0  # first byte of the current (incomplete) line
+    scan = 0  # where to resume looking for b"\n"
+    end = 0  # number of valid bytes in the buffer
+    discarding = False  # dropping the rest of a line over the limit, up to its newline
+    while True:
+        if start:
+            # Compact: move the partial line to the front, once per chunk
+            tail = end - start
+            buffer[:tail] = buffer[start:end]
+            scan -= start
+            end = tail
+            start = 0
+        elif end == len(buffer):
+            # One line fills the whole buffer: move to one twice the size (but no larger
+            # than a line can get). A fresh bytearray is used because a buffer with live
+            # memoryviews (ours, or lines still held in "view" mode) can't be resized in place.
+            size = 2 * len(buffer) if limit is None else min(2 * len(buffer), limit.max_bytes + 2)
+            grown = bytearray(size)
+            grown[:end] = view[:end]
+            buffer, view = grown, memoryview(grown)
+
+        if is_idle is not None and is_idle():
+            yield [], 0
+
+        n = read_into(view[end:])
+        if not n:  # EOF reached
+            # Files: .readinto() returns 0 at EOF
+            # TCP: .recv_into() returns 0 when the peer cleanly closes
+            break
+        end += n
+
+        if discarding:
+            new_line = buffer.find(b"\n", start, end)
+            if new_line == -1:
+                start = scan = end
+                continue
+            start = scan = new_line + 1
+            discarding = False
+
+        if mode == "view":
+            # Views have to be cut one by one
+            lines = []
+            line_start = start
             while True:
-                new_line = buffer.find(b"\n")
-                if new_line == -1:  # Returns -1 if it cannot find the character in the buffer
+                new_line = buffer.find(b"\n", scan, end)
+                if new_line == -1:
+                    scan = end
                     break
+                line_end = new_line - 1 if new_line > start and buffer[new_line - 1] == 13 else new_line
+                if limit is not None and line_end - start > limit.max_bytes:
+                    limit.exceeded(line_end - start)
+                    if limit.policy == "error":
+                        break
+                    if limit.policy == "truncate":
+                        # Cut like the other modes: the CR goes with the cut, then a trailing CR is stripped
+                        cut = start + limit.max_bytes
+                        lines.append(view[start : cut - 1 if buffer[cut - 1] == 13 else cut])
+                else:
+                    lines.append(view[start:line_end])
+                start = scan = new_line + 1
+            if lines:
+                yield lines, start - line_start
+            if limit is not None:
+                limit.check()
+        else:
+            # Emit every complete line in the buffer. Only the last newline is
+            # searched for; the C-level split() then does the per-line work.
+            # Decoding up to a newline is safe: the decoder only frames on bytes for
+            # codecs where b"\n" never occurs inside a multi-byte sequence.
+            last_new_line = buffer.rfind(b"\n", scan, end)
+            if last_new_line == -1:  # Returns -1 if it cannot find the character in the buffer
+                scan = end
+            else:
+                block = view[start:last_new_line]
+                if limit is not None and last_new_line - start > limit.max_bytes:
+                    lines = limit.split(block, decoder)
+                else:
+                    lines = decoder.decode_lines(block) if decode else bytes(block).split(b"\n")
+                # Strip out any carriage return character (skipped entirely for LF-only input)
+                if buffer.find(b"\r", start, last_new_line) != -1:
+                    carriage_return = "\r" if decode else b"\r"
+                    lines = [line[:-1] if line.endswith(carriage_return) else line for line in lines]
+                yield lines, last_new_line + 1 - start
+                if limit is not None:
+                    limit.check()
+                start = scan = last_new_line + 1
 
-                line_bytes = buffer[:new_line]
-                # Strip out any carriage return character
-                if line_bytes.endswith(b"\r"):
-                    line_bytes = line_bytes[:-1]
+        if limit is not None and end - start > limit.max_bytes + 1:  # + 1: room for a CR
+            # The unfinished line is already over the limit: deal with it now rather than
+            # buffer the rest of it, and drop everything up to its newline.
+            limit.exceeded(end - start)
+            limit.check()
+            if limit.policy == "truncate":
+                head = view[start : start + limit.max_bytes]
+                if decode:
+                    yield decoder.decode_head(head), end - start
+                else:
+                    yield [head if mode == "view" else bytes(head)], end - start
+            start = scan = end
+            discarding = True
 
-                yield line_bytes.decode()
+    # Read the last line if present
+    if end > start:
+        nbytes = end - start
+        if buffer[end - 1] == 13:  # 13 == ord("\r")
+            end -= 1
+        truncated = False
+        if limit is not None and end - start > limit.max_bytes:
+            limit.exceeded(end - start)
+            limit.check()
+            if limit.policy == "skip":
+                return
+            end = start + limit.max_bytes
+            truncated = True
+        last_line = view[start:end]
+        if decode:
+            yield decoder.decode_head(last_line) if truncated else decoder.decode_lines(last_line), nbytes
+        elif mode == "bytes":
+            yield [bytes(last_line)], nbytes
+        else:
+            yield [last_line], nbytes
 
-                # Drop emitted line + '\n' from the accumulator
-                del buffer[: new_line + 1]
 
-        # Read the last line if present
-        if buffer:
-            if buffer.endswith((b"\r")):
-                buffer = buffer[:-1]
-            yield buffer.decode()
-        return
-    except Exception as e:
-        logger.exception(e)
+def _frame_text(
+    read_into: Callable[[memoryview], Optional[int]],
+    chunk_size: int,
+    decoder: LineDecoder,
+    is_idle: Optional[Callable[[], bool]] = None,
+    limit: Optional[_LineLimit] = None,
+) -> Generator[Tuple[List[Line], int], None, None]:
+    """`_frame_chunks()` for incremental codecs: decode every read, then frame the text."""
+    view = memoryview(bytearray(chunk_size))
+    framer = _TextFramer(decoder, limit)
+    nbytes = 0  # raw bytes read since the last yield
+    while True:
+        if is_idle is not None and is_idle():
+            yield [], 0
+        n = read_into(view)
+        if not n:
+            break
+        nbytes += n
+        try:
+            lines = framer.feed(view[:n])
+        except LineTooLongError as e:
+            if e.lines:
+                yield e.lines, nbytes
+            e.lines = []
+            raise
+        if lines:
+            yield lines, nbytes
+            nbytes = 0
+
+    lines = framer.close()
+    if lines:
+        yield lines, nbytes
+
+
+class _TextFramer:
+    """Frames the decoded text of an incremental codec; the line limit counts characters."""
+
+    def __init__(self, decoder: LineDecoder, limit: Optional[_LineLimit]):
+        self.decoder = decoder
+        self.limit = limit
+        self.rest = ""
+        self.discarding = False
+
+    def feed(self, data: Union[bytes, memoryview]) -> List[str]:
+        text = self.rest + self.decoder.decode(data)
+        if self.discarding:
+            new_line = text.find("\n")
+            if new_line == -1:
+                self.rest = ""
+                return []
+            text = text[new_line + 1 :]
+            self.discarding = False
+        lines, self.rest = _split_text(text)
+        limit = self.limit
+        if limit is None:
+            return lines
+        if lines:
+            lines = limit.cap_lines(lines)
+            limit.check(lines)
+        if len(self.rest) > limit.max_bytes + 1:
+            limit.exceeded(len(self.rest))
+            limit.check(lines)
+            if limit.policy == "truncate":
+                lines.append(self.rest[: limit.max_bytes])
+            self.rest = ""
+            self.discarding = True
+        return lines
+
+    def close(self) -> List[str]:
+        text, self.rest = self.rest + self.decoder.decode(b"", final=True), ""
+        if not text or self.discarding:
+            return []
+        lines, _ = _split_text(text + "\n")
+        if self.limit is not None:
+            lines = self.limit.cap_lines(lines)
+            self.limit.check()
+        return lines
+
+
+class LineFramer:
+    r"""
+    Push-based counterpart of `get_lines_from_reader()` for non-blocking sockets.
+
+    Event loops can't hand a blocking generator a stream to pull from, so instead
+    they `feed()` whatever bytes `recv()` returned and get back the complete lines.
+    Framing rules are identical: split on LF, strip a trailing CR, and `close()`
+    flushes the final unterminated line at EOF.
+
+    :param mode: str
+        ``"str"`` for decoded lines (the default) or ``"bytes"`` for raw ones.
+    :param encoding: str
+        Same as for `get_lines_from_reader()`.
+    :param errors: str
+        Same as for `get_lines_from_reader()`.
+    :param stats: DecodeStats
+        Same as for `get_lines_from_reader()`.
+    :param max_line_bytes: int
+        Same as for `get_lines_from_reader()`; an unfinished line is never buffered past it
+        (+ 1 for a CR).
+    :param on_long_line: str
+        Same as for `get_lines_from_reader()`.
+    """
+
+    def __init__(
+        self,
+        mode: str = "str",
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        stats: Optional[DecodeStats] = None,
+        max_line_bytes: Optional[int] = None,
+        on_long_line: str = "error",
+    ):
+        if mode not in ("str", "bytes"):
+            raise ValueError("mode must be 'str' or 'bytes'")
+        self.stats = stats if stats is not None else DecodeStats()
+        self._decode = mode == "str"
+        self._decoder = LineDecoder(encoding, errors, self.stats) if self._decode else None
+        self._limit = _LineLimit(max_line_bytes, on_long_line, self.stats) if max_line_bytes is not None else None
+        self._buffer = bytearray()
+        self._scan = 0
+        self._discarding = False  # dropping the rest of a line over the limit, up to its newline
+        # Incremental codecs are framed on the decoded text instead
+        self._text = _TextFramer(self._decoder, self._limit) if self._decode and self._decoder.incremental else None
+
+    def feed(self, data: bytes) -> List[Line]:
+        """Append received bytes and return every line they completed."""
+        if self._text is not None:
+            return self._text.feed(data)
+
+        buffer = self._buffer
+        buffer.extend(data)
+        if self._discarding:
+            new_line = buffer.find(b"\n")
+            if new_line == -1:
+                buffer.clear()
+                self._scan = 0
+                return []
+            del buffer[: new_line + 1]
+            self._scan = 0
+            self._discarding = False
+
+        lines: List[Line] = []
+        last_new_line = buffer.rfind(b"\n", self._scan)
+        if last_new_line != -1:
+            if self._limit is not None and last_new_line > self._limit.max_bytes:
+                lines = self._limit.split(buffer[:last_new_line], self._decoder)
+            elif self._decode:
+                lines = self._decoder.decode_lines(buffer[:last_new_line])
+            else:
+                lines = bytes(buffer[:last_new_line]).split(b"\n")
+            if buffer.find(b"\r", 0, last_new_line) != -1:
+                carriage_return = "\r" if self._decode else b"\r"
+                lines = [line[:-1] if line.endswith(carriage_return) else line for line in lines]
+            # Drop all emitted lines from the accumulator in one go
+            del buffer[: last_new_line + 1]
+        self._scan = len(buffer)
+
+        limit = self._limit
+        if limit is None:
+            return lines
+        limit.check(lines)
+        if len(buffer) > limit.max_bytes + 1:  # + 1: room for a CR
+            # The unfinished line is already over the limit, stop buffering it
+            limit.exceeded(len(buffer))
+            limit.check(lines)
+            if limit.policy == "truncate":
+                head = buffer[: limit.max_bytes]
+                lines.extend(self._decoder.decode_head(head) if self._decode else [bytes(head)])
+            buffer.clear()
+            self._scan = 0
+            self._discarding = True
+        return lines
+
+    def close(self) -> List[Line]:
+        """Flush the last line if the peer closed without a trailing newline."""
+        if self._text is not None:
+            return self._text.close()
+
+        buffer, self._buffer = self._buffer, bytearray()
+        self._scan = 0
+        self._discarding = False
+        if not buffer:
+            return []
+        if buffer.endswith(b"\r"):
+            buffer = buffer[:-1]
+        limit = self._limit
+        if limit is not None and len(buffer) > limit.max_bytes:
+            limit.exceeded(len(buffer))
+            limit.check()
+            if limit.policy == "skip":
+                return []
+            buffer = buffer[: limit.max_bytes]
+            return self._decoder.decode_head(buffer) if self._decode else [bytes(buffer)]
+        return self._decoder.decode_lines(buffer) if self._decode else [bytes(buffer)]
 
 
 # Socket Programming:
@@ -82,7 +844,7 @@ HOST = "127.0.0.1"  # Standard loopback interface address (localhost)
 PORT = 42069  # Port to listen on (non-privileged ports are > 1023)
 
 
-def receive_data_from_tcp_conn():
+def receive_data_from_tcp_conn(accept_timeout: Optional[float] = None, read_timeout: Optional[float] = None):
     """
     Receive data line by line from a TCP Connection.
 
@@ -91,22 +853,43 @@ def receive_data_from_tcp_conn():
     1. Run `uv run main.py`
     2. In another terminal run `cat messages.txt | nc -w 1 127.0.0.1 42069`
     3. If the it ran successfully, the terminal running the python script should have received the data.
+
+    This serves exactly one connection and returns. For a long-running server that
+    handles many clients concurrently see `tcp_to_http.server.LineServer`.
+
+    :param accept_timeout: float
+        Give up if no client connects within that many seconds (``None``: wait forever).
+    :param read_timeout: float
+        Close the connection once the client sent nothing for that many seconds.
+        (`LineServer` has header and total connection timeouts as well.)
     """
     # AF_INET --> IPv4
     with socket.socket(family=socket.AF_INET, type=socket.SOCK_STREAM) as s:  # create an INET, STREAMing socket
         s.bind((HOST, PORT))
         s.listen()
-        conn, addr = s.accept()  # <-- BLOCKS until a client connects
+        s.settimeout(accept_timeout)
+        try:
+            conn, addr = s.accept()  # <-- BLOCKS until a client connects
+        except socket.timeout:
+            logger.info(f"No connection within {accept_timeout=}s")
+            return
+        conn.settimeout(read_timeout)  # not inherited from the listening socket on every platform
         # with conn:
         #     logger.info(f"Connected by {addr=}")
         #     for line in get_lines_from_reader(stream=conn):
         #         print("read:", line)
 
         # conn.makefile() supports IO operations like `f.read()` instead of conn.recv()^^^ like above
-        with conn.makefile(mode="rb", buffering=0) as raw_bytes:
+        from tcp_to_http.sinks import StdoutSink  # lazy: sinks imports this module
+
+        # The sink prints in batches from its own thread, so the reads don't wait on the terminal
+        with conn, conn.makefile(mode="rb", buffering=0) as raw_bytes, StdoutSink() as sink:
             logger.info(f"Connected by {addr=}")
-            for line in get_lines_from_reader(stream=raw_bytes):
-                print("read:", line)
+            try:
+                for line in get_lines_from_reader(stream=raw_bytes):
+                    sink(line)
+            except socket.timeout:
+                logger.info(f"Closing {addr=}: nothing received for {read_timeout=}s")
 
 
 # if __name__ == "__main__":
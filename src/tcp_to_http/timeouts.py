@@ -0,0 +1,281 @@
+import heapq
+import itertools
+import re
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tcp_to_http import logger
+from tcp_to_http.tcplistener import _get_read_into
+
+# Connection timeouts, for all connections of a server in one heap.
+#
+# - read_idle: no bytes received for that long.
+# - header:    a line (or an HTTP request head) was started but not finished that
+#              long after its first byte: the slowloris pattern of trickling bytes.
+# - lifetime:  the connection has been open that long, whatever it does.
+#
+# Each connection has a `ConnectionTimer` with one entry in the heap, keyed by the
+# earliest moment it could expire. Reads only store a timestamp on the timer; nothing
+# is pushed per read. When an entry comes due, the timer is checked against its real
+# deadlines and either reaped or pushed back with the next one (lazy re-arming). An
+# entry is never further away than the shortest timeout, so a deadline that appeared
+# in the meantime (a line that started) is still caught on time.
+#
+# The threaded backends run one reaper thread that shuts expired sockets down; the
+# selectors and asyncio loops check the heap themselves between events.
+#
+# ref:
+# - https://docs.python.org/3/library/heapq.html
+# - https://en.wikipedia.org/wiki/Slowloris_(computer_security)
+# - https://www.usenix.org/legacy/publications/library/proceedings/usenix05/tech/general/full_papers/varghese/ (timing wheels, and why a heap is fine here)
+
+REAP_REASONS = ("read_idle", "header", "lifetime")
+
+
+class ConnectionReapedError(ConnectionAbortedError):
+    """
+    EOF on a connection the reaper shut down.
+
+    Raised by `TimedReader` instead of returning EOF, so a line reader stops without
+    flushing the unfinished line the client was trickling in.
+    """
+
+_NEWLINE = re.compile(b"\n")
+
+
+class ConnectionTimer:
+    """Timestamps of one connection, updated by whoever reads from it."""
+
+    __slots__ = ("conn", "addr", "started", "last_read", "partial_since", "closed", "reaped")
+
+    def __init__(self, conn, addr, now: float):
+        self.conn = conn
+        self.addr = addr
+        self.started = now
+        self.last_read = now
+        # When the unfinished line (or request head) got its first byte; None if there is none
+        self.partial_since: Optional[float] = None
+        self.closed = False
+        # The `REAP_REASONS` entry it was reaped for
+        self.reaped: Optional[str] = None
+
+    def note_read(self, data, n: int) -> None:
+        """
+        Account for ``n`` bytes just read into ``data`` (any buffer) by a line reader.
+
+        A read that ends on a newline finishes every line; one that doesn't leaves a
+        partial line that started in this read if it contains a newline, or at the
+        start of the current partial line otherwise.
+        """
+        now = time.monotonic()
+        self.last_read = now
+        if data[n - 1] == 10:
+            self.partial_since = None
+        elif self.partial_since is None or _NEWLINE.search(data, 0, n):
+            self.partial_since = now
+
+    def note_progress(self, done: bool) -> None:
+        """
+        Account for a read by a reader that frames on its own (an HTTP request head).
+
+        ``done`` if it finished what it was reading, else it is (still) partial.
+        """
+        now = time.monotonic()
+        self.last_read = now
+        if done:
+            self.partial_since = None
+        elif self.partial_since is None:
+            self.partial_since = now
+
+
+class TimedReader:
+    """
+    Wraps a stream so every read updates a `ConnectionTimer`.
+
+    For `get_lines_from_reader()` (``lines=True``) or anything else that reads through
+    `readinto()` (a request body). With ``lines=True``, EOF on a reaped connection
+    raises `ConnectionReapedError`: a partial line is dropped, not delivered.
+    """
+
+    def __init__(self, stream, timer: ConnectionTimer, lines: bool = True):
+        self._read_into = _get_read_into(stream)
+        self._timer = timer
+        self._lines = lines
+
+    def readinto(self, view) -> Optional[int]:
+        """Read into ``view`` like the wrapped stream, and tell the timer."""
+        n = self._read_into(view)
+        if n:
+            if self._lines:
+                self._timer.note_read(view, n)
+            else:
+                self._timer.last_read = time.monotonic()
+        elif self._lines and self._timer.reaped is not None:
+            raise ConnectionReapedError("{} timeout".format(self._timer.reaped))
+        return n
+
+
+class Reaper:
+    r"""
+    Read-idle, header and total timeouts of many connections in one heap.
+
+    ``None`` disables a timeout; with all three ``None`` there is nothing to do and
+    servers don't create a reaper at all.
+
+    .. code-block:: python
+
+        reaper = Reaper(read_idle=30, header=10, on_reap=lambda timer: timer.conn.shutdown(socket.SHUT_RDWR))
+        reaper.start()                        # own thread; or call `reap_expired()` from an event loop
+        timer = reaper.track(conn, addr)
+        ...                                   # timer.note_read(...) on every read
+        reaper.untrack(timer)                 # before closing the socket
+
+    :param read_idle: float
+        Seconds without a single byte from the client.
+    :param header: float
+        Seconds from the first byte of a line (request head) to its end.
+    :param total: float
+        Seconds a connection may stay open.
+    :param on_reap: Callable[[ConnectionTimer], None]
+        Called for every expired connection, with the reaper's lock held, so the
+        connection can't be untracked (and its socket closed and reused) meanwhile.
+        ``timer.reaped`` says why.
+    """
+
+    def __init__(
+        self,
+        read_idle: Optional[float] = None,
+        header: Optional[float] = None,
+        total: Optional[float] = None,
+        on_reap: Optional[Callable[[ConnectionTimer], None]] = None,
+    ):
+        timeouts = [t for t in (read_idle, header, total) if t is not None]
+        if any(t <= 0 for t in timeouts):
+            raise ValueError("timeouts must be > 0")
+        self.read_idle = read_idle
+        self.header = header
+        self.total = total
+        self.on_reap = on_reap or _shutdown
+        # Connections reaped so far, per reason
+        self.reaped: Dict[str, int] = dict.fromkeys(REAP_REASONS, 0)
+        # The shortest timeout: no heap entry is further away than this (see the module comment)
+        self.horizon = min(timeouts) if timeouts else None
+
+        self._heap: List[Tuple[float, int, ConnectionTimer]] = []
+        self._seq = itertools.count()  # tie-breaker, timers don't compare
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any timeout is set."""
+        return self.horizon is not None
+
+    def track(self, conn, addr) -> ConnectionTimer:
+        """Start timing a connection; the returned timer gets its reads."""
+        now = time.monotonic()
+        timer = ConnectionTimer(conn, addr, now)
+        if self.enabled:
+            with self._lock:
+                self._push(timer, now)
+        return timer
+
+    def untrack(self, timer: ConnectionTimer) -> None:
+        """Forget a connection; its heap entry is dropped when it comes due."""
+        with self._lock:
+            timer.closed = True
+
+    def next_deadline(self) -> Optional[float]:
+        """`time.monotonic()` of the earliest heap entry, for event loop timeouts."""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def reap_expired(self, now: Optional[float] = None) -> int:
+        """Reap every connection past one of its deadlines; returns how many."""
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                _, _, timer = heapq.heappop(heap)
+                if timer.closed:
+                    continue
+                reason = self._expired(timer, now)
+                if reason is None:
+                    self._push(timer, now)
+                    continue
+                timer.reaped = reason
+                timer.closed = True
+                self.reaped[reason] += 1
+                reaped += 1
+                logger.info(f"Reaping addr={timer.addr}: {reason} timeout")
+                try:
+                    self.on_reap(timer)
+                except Exception as e:
+                    logger.exception(e)
+        return reaped
+
+    def start(self) -> None:
+        """Reap from a background thread (for the blocking, thread per connection backends)."""
+        if self._thread is None and self.enabled:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread of `start()`."""
+        if self._thread is not None:
+            self._stop.set()
+            with self._lock:
+                self._changed.notify()
+            self._thread.join()
+            self._thread = None
+
+    # ------------------------------------------------------------------ #
+
+    def _deadline(self, timer: ConnectionTimer, now: float) -> float:
+        deadline = now + self.horizon
+        if self.read_idle is not None:
+            deadline = min(deadline, timer.last_read + self.read_idle)
+        if self.header is not None and timer.partial_since is not None:
+            deadline = min(deadline, timer.partial_since + self.header)
+        if self.total is not None:
+            deadline = min(deadline, timer.started + self.total)
+        return deadline
+
+    def _expired(self, timer: ConnectionTimer, now: float) -> Optional[str]:
+        if self.total is not None and now - timer.started >= self.total:
+            return "lifetime"
+        partial_since = timer.partial_since  # read once, the connection's thread writes it
+        if self.header is not None and partial_since is not None and now - partial_since >= self.header:
+            return "header"
+        if self.read_idle is not None and now - timer.last_read >= self.read_idle:
+            return "read_idle"
+        return None
+
+    def _push(self, timer: ConnectionTimer, now: float) -> None:
+        deadline = self._deadline(timer, now)
+        earliest = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, next(self._seq), timer))
+        if earliest:
+            self._changed.notify()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                if timeout is None or timeout > 0:
+                    self._changed.wait(timeout)
+            self.reap_expired()
+
+
+def _shutdown(timer: ConnectionTimer) -> None:
+    # Wakes up the thread blocked in recv() on it, which then closes the connection
+    try:
+        timer.conn.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
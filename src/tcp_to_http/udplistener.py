@@ -0,0 +1,487 @@
+import argparse
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from tcp_to_http import logger
+from tcp_to_http.server import LineHandler, print_line
+from tcp_to_http.sinks import StdoutSink
+from tcp_to_http.tcplistener import HOST, PORT, DecodeStats, Line, LineDecoder, LineFramer
+
+# Receiving side of `udpsender`.
+#
+# UDP keeps message boundaries: every recv returns exactly one datagram, and a datagram
+# that doesn't fit the buffer is silently truncated. The buffer here is as large as the
+# biggest possible UDP payload, so that never happens.
+#
+# Datagrams the kernel can't queue (socket receive buffer full) are dropped without
+# anyone noticing; that's what the sequence numbers and the /proc/net/udp "drops"
+# column below are for. Raise SO_RCVBUF (and net.core.rmem_max) when either grows.
+#
+# ref:
+# - https://docs.python.org/3/library/socket.html#socket.socket.recvfrom_into
+# - https://man7.org/linux/man-pages/man7/udp.7.html
+# - https://man7.org/linux/man-pages/man7/socket.7.html (SO_RCVBUF, SO_REUSEPORT)
+
+# 65535 - 8 (UDP header) - 20 (IPv4 header)
+MAX_DATAGRAM_SIZE = 65507
+
+# Optional datagram prefix written by `udpsender.bulk_send(sequence=True)`: a
+# big-endian unsigned 64-bit counter, starting at 0 for every sender socket.
+SEQUENCE_HEADER = struct.Struct("!Q")
+
+# A receive loop under a steady flood never finds its queue empty; it checks for a
+# shutdown request after this many datagrams in a row as well
+STOP_CHECK_INTERVAL = 1024
+
+
+def split_datagram(
+    data: memoryview,
+    mode: str = "str",
+    encoding: str = "utf-8",
+    errors: str = "strict",
+    stats: Optional[DecodeStats] = None,
+) -> List[Line]:
+    r"""
+    Split one datagram into lines with the same rules as `get_lines_from_reader()`.
+
+    A datagram is a complete message, so it is framed like a whole stream up to EOF:
+    split on LF, a trailing CR is stripped and a final unterminated line is kept.
+    A line that is not valid in ``encoding`` is handled per ``errors`` on its own,
+    the rest of the datagram is kept.
+
+    :param data: memoryview
+        The datagram payload.
+    :param mode: str
+        ``"str"`` for decoded lines, ``"bytes"`` for raw ones.
+    :param encoding: str
+        Same as for `get_lines_from_reader()`.
+    :param errors: str
+        Same as for `get_lines_from_reader()`.
+    :param stats: DecodeStats
+        Same as for `get_lines_from_reader()`.
+
+    :return: List[str] or List[bytes]
+    """
+    payload = bytes(data)
+    return _DatagramFramer(mode, encoding, errors, stats).split(payload, 0, len(payload))
+
+
+class _DatagramFramer:
+    """`split_datagram()` for one socket: the decoder is set up once, not per datagram."""
+
+    def __init__(self, mode: str, encoding: str, errors: str, stats: Optional[DecodeStats] = None):
+        if mode not in ("str", "bytes"):
+            raise ValueError("mode must be 'str' or 'bytes'")
+        self.stats = stats if stats is not None else DecodeStats()
+        self.decoder = LineDecoder(encoding, errors, self.stats) if mode == "str" else None
+        # Incremental codecs are framed on the decoded text, by a `LineFramer`
+        incremental = self.decoder is not None and self.decoder.incremental
+        self.framer = LineFramer(mode, encoding, errors, self.stats) if incremental else None
+
+    def split(self, buffer: Union[bytes, bytearray], start: int, end: int) -> List[Line]:
+        """Lines of the datagram in ``buffer[start:end]``."""
+        if self.framer is not None:
+            # feed() then close() frames up to the datagram's "EOF" and leaves the framer empty
+            lines = self.framer.feed(buffer[start:end])
+            lines.extend(self.framer.close())
+            return lines
+        if start == end:
+            return []
+        stop = end - 1 if buffer[end - 1] == 10 else end  # a final newline ends the last line, it doesn't start one
+        block = bytes(buffer[start:stop])
+        if b"\r" in block:
+            # Strip the CR of every line in one pass; b"\r" and b"\n" never occur inside a character here
+            block = block.replace(b"\r\n", b"\n")
+            if block.endswith(b"\r"):
+                block = block[:-1]
+        return block.split(b"\n") if self.decoder is None else self.decoder.decode_lines(block)
+
+
+def kernel_drops(sock: socket.socket) -> Optional[int]:
+    """
+    Datagrams the kernel dropped for this socket, from ``/proc/net/udp`` (Linux only).
+
+    :return: int
+        ``None`` when the counter isn't available.
+    """
+    inode = str(os.fstat(sock.fileno()).st_ino)
+    try:
+        with open("/proc/net/udp") as f:
+            next(f)  # header
+            for row in f:
+                fields = row.split()
+                # sl local rem st tx:rx tr:when retrnsmt uid timeout inode ref pointer drops
+                if fields[9] == inode:
+                    return int(fields[-1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+class UDPStats:
+    """
+    Counters for one receiving socket.
+
+    Each socket is read by exactly one thread, which owns its `UDPStats`, so the
+    counters are updated without a lock. `UDPLineListener.stats` adds them up.
+
+    ``drops`` is only counted for sequenced datagrams: a gap in a sender's sequence
+    numbers counts as lost, and the missing numbers are remembered. One of them that
+    shows up later counts as ``reordered`` (and is taken back out of ``drops``); any
+    other number below the highest one seen is a ``duplicates``. Only the latest
+    `MAX_MISSING` missing numbers per sender are remembered, older ones stay lost.
+    Losses after the last datagram that did arrive can't be told apart from the sender
+    having stopped; compare with the sender's own count for those.
+
+    ``malformed`` counts datagrams too short for their sequence header; lines that are
+    not valid in the listener's encoding are counted in ``decode_stats``.
+    """
+
+    __slots__ = (
+        "datagrams",
+        "lines",
+        "bytes",
+        "drops",
+        "reordered",
+        "duplicates",
+        "malformed",
+        "decode_stats",
+        "_expected",
+        "_missing",
+    )
+
+    # Missing sequence numbers remembered per sender, i.e. how late a datagram may be
+    # and still count as reordered instead of lost
+    MAX_MISSING = 4096
+
+    def __init__(self):
+        self.datagrams = 0
+        self.lines = 0
+        self.bytes = 0
+        self.drops = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.malformed = 0
+        self.decode_stats = DecodeStats()
+        self._expected: Dict[Tuple[str, int], int] = {}  # sender -> next sequence number
+        self._missing: Dict[Tuple[str, int], Set[int]] = {}  # sender -> gaps not filled yet
+
+    def track(self, sender: Tuple[str, int], sequence: int) -> None:
+        """Account for a sequence number received from ``sender``."""
+        expected = self._expected.get(sender, 0)
+        if sequence >= expected:
+            if sequence > expected:
+                self.drops += sequence - expected
+                missing = self._missing.setdefault(sender, set())
+                missing.update(range(max(expected, sequence - self.MAX_MISSING), sequence))
+                if len(missing) > 2 * self.MAX_MISSING:  # pruned in bulk, not on every gap
+                    oldest = sequence - self.MAX_MISSING
+                    self._missing[sender] = {n for n in missing if n >= oldest}
+            self._expected[sender] = sequence + 1
+            return
+        missing = self._missing.get(sender)
+        if missing is not None and sequence in missing:
+            missing.discard(sequence)
+            self.reordered += 1
+            self.drops -= 1
+        else:
+            self.duplicates += 1
+
+    def add(self, other: "UDPStats") -> None:
+        """Add the counters of ``other`` to these (the sequence tracking is per socket and not added)."""
+        self.datagrams += other.datagrams
+        self.lines += other.lines
+        self.bytes += other.bytes
+        self.drops += other.drops
+        self.reordered += other.reordered
+        self.duplicates += other.duplicates
+        self.malformed += other.malformed
+        self.decode_stats.add(other.decode_stats)
+
+    def __repr__(self) -> str:
+        """All counters, as `UDPLineListener.report()` prints them."""
+        return (
+            "UDPStats(datagrams={}, lines={}, bytes={}, drops={}, reordered={}, duplicates={}, malformed={}, "
+            "malformed_lines={}, dropped_lines={})".format(
+                self.datagrams,
+                self.lines,
+                self.bytes,
+                self.drops,
+                self.reordered,
+                self.duplicates,
+                self.malformed,
+                self.decode_stats.malformed,
+                self.decode_stats.dropped,
+            )
+        )
+
+
+class UDPLineListener:
+    r"""
+    UDP line receiver: the counterpart of `udpsender`.
+
+    Receive loop
+    ------------
+    Python has no ``recvmmsg()`` binding, so batching is done the other way around:
+    the socket is non-blocking and each wake-up drains *every* queued datagram with
+    back-to-back `recvfrom_into()` calls into one reused buffer, one syscall per
+    datagram and no allocation for the receive itself. Only an empty queue goes back
+    to `select()`.
+
+    Fan-out
+    -------
+    With ``sockets > 1`` that many sockets bind the same address with ``SO_REUSEPORT``,
+    each read by its own thread. The kernel hashes every sender to one socket, so each
+    gets its own receive queue (fewer drops under bursts) and per-sender ordering and
+    sequence tracking stay intact. `recvfrom_into()` releases the GIL while it waits.
+
+    How to run:
+
+    1. Run `uv run src/tcp_to_http/udplistener.py --quiet --sequence`
+    2. In another terminal run `uv run src/tcp_to_http/udpsender.py --bulk --sequence --file messages.txt`
+    3. Ctrl+C prints the counters.
+
+    :param host: str
+        Address to bind to.
+    :param port: int
+        Port to bind to.
+    :param handler: Callable[[str], None]
+        Called once for every line (from the socket's thread). ``None`` only counts.
+    :param sockets: int
+        Number of ``SO_REUSEPORT`` sockets (and threads).
+    :param sequenced: bool
+        Datagrams start with a `SEQUENCE_HEADER` (``udpsender --sequence``); used to
+        count drops and reordering per sender.
+    :param rcvbuf: int
+        ``SO_RCVBUF`` to request, in bytes (the kernel caps it at ``net.core.rmem_max``).
+    :param mode: str
+        ``"str"`` or ``"bytes"`` lines for the handler.
+    :param poll_interval: float
+        How often an idle receive loop checks for a shutdown request.
+    :param encoding: str
+        Encoding senders use.
+    :param errors: str
+        Policy for lines that are not valid in ``encoding`` (see `get_lines_from_reader()`);
+        only the bad line is affected, and counted in ``stats.decode_stats``.
+    """
+
+    def __init__(
+        self,
+        host: str = HOST,
+        port: int = PORT,
+        handler: Optional[LineHandler] = print_line,
+        sockets: int = 1,
+        sequenced: bool = False,
+        rcvbuf: Optional[int] = None,
+        mode: str = "str",
+        poll_interval: float = 0.5,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+    ):
+        if sockets < 1:
+            raise ValueError("sockets must be >= 1")
+
+        self.host = host
+        self.port = port
+        self.handler = handler
+        self.sockets = sockets
+        self.sequenced = sequenced
+        self.rcvbuf = rcvbuf
+        self.mode = mode
+        self.poll_interval = poll_interval
+        _DatagramFramer(mode, encoding, errors)  # bad modes, encodings and error handlers fail here, not per socket
+        self.encoding = encoding
+        self.errors = errors
+
+        self._socks: List[socket.socket] = []
+        self._stats: List[UDPStats] = []
+        self._stop = threading.Event()
+        self._started = 0.0
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """The bound ``(host, port)``, useful when binding to port 0."""
+        if not self._socks:
+            return (self.host, self.port)
+        return self._socks[0].getsockname()[:2]
+
+    @property
+    def stats(self) -> UDPStats:
+        """Counters summed over all sockets (a snapshot)."""
+        total = UDPStats()
+        for stats in self._stats:
+            total.add(stats)
+        return total
+
+    def bind(self) -> None:
+        """Create and bind the socket(s) (done lazily by `serve_forever()`)."""
+        if self._socks:
+            return
+        reuse_port = self.sockets > 1
+        if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+            raise OSError("SO_REUSEPORT is not available on this platform")
+
+        port = self.port
+        for _ in range(self.sockets):
+            sock = socket.socket(family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            if reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            if self.rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            sock.bind((self.host, port))
+            # Binding port 0 picks a free port; the other sockets must join that one
+            port = sock.getsockname()[1]
+            sock.setblocking(False)
+            self._socks.append(sock)
+            self._stats.append(UDPStats())
+
+        rcvbuf = self._socks[0].getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        logger.info(f"Listening on {self.address} (udp), {self.sockets=}, SO_RCVBUF={rcvbuf}")
+
+    def serve_forever(self) -> None:
+        """Receive until `shutdown()` is called (or Ctrl+C), then report the counters."""
+        self.bind()
+        self._started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._receive_loop, args=(sock, stats), daemon=True)
+            for sock, stats in zip(self._socks[1:], self._stats[1:])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self._receive_loop(self._socks[0], self._stats[0])
+        except KeyboardInterrupt:
+            self._stop.set()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            self.report()
+            for sock in self._socks:
+                sock.close()
+            logger.info("Server stopped")
+
+    def shutdown(self) -> None:
+        """
+        Request a shutdown; safe to call from another thread or from a signal handler.
+
+        Datagrams already queued in the kernel are still read, unless they keep coming:
+        a receive loop that never finds its queue empty stops within `STOP_CHECK_INTERVAL`
+        datagrams.
+        """
+        self._stop.set()
+
+    def report(self) -> None:
+        """Print the counters, rates and the kernel's own drop count (to stderr, like `udpsender.report()`)."""
+        stats = self.stats
+        seconds = max(time.perf_counter() - self._started, 1e-9)
+        print(f"{stats}", file=sys.stderr)
+        print(
+            "{:,.0f} datagrams/s, {:,.0f} lines/s, {:.2f} MB/s over {:.1f}s".format(
+                stats.datagrams / seconds, stats.lines / seconds, stats.bytes / seconds / 1e6, seconds
+            ),
+            file=sys.stderr,
+        )
+        drops = [kernel_drops(sock) for sock in self._socks]
+        if None not in drops:
+            print(f"Kernel receive buffer drops: {sum(drops)}", file=sys.stderr)
+
+    def _receive_loop(self, sock: socket.socket, stats: UDPStats) -> None:
+        buffer = bytearray(MAX_DATAGRAM_SIZE)
+        recvfrom_into = sock.recvfrom_into
+        handler, sequenced = self.handler, self.sequenced
+        framer = _DatagramFramer(self.mode, self.encoding, self.errors, stats.decode_stats)
+        header_size = SEQUENCE_HEADER.size
+        until_stop_check = STOP_CHECK_INTERVAL
+        while True:
+            try:
+                n, sender = recvfrom_into(buffer)
+            except BlockingIOError:
+                # Queue drained: check for shutdown, then wait for more
+                if self._stop.is_set():
+                    return
+                select.select([sock], [], [], self.poll_interval)
+                until_stop_check = STOP_CHECK_INTERVAL
+                continue
+
+            until_stop_check -= 1
+            if not until_stop_check:
+                # A flood never drains the queue
+                if self._stop.is_set():
+                    return
+                until_stop_check = STOP_CHECK_INTERVAL
+            stats.datagrams += 1
+            stats.bytes += n
+            start = 0
+            if sequenced:
+                if n < header_size:
+                    stats.malformed += 1
+                    continue
+                stats.track(sender, SEQUENCE_HEADER.unpack_from(buffer)[0])
+                start = header_size
+
+            lines = framer.split(buffer, start, n)
+            stats.lines += len(lines)
+            if handler is None:
+                continue
+            for line in lines:
+                try:
+                    handler(line)
+                except Exception as e:
+                    logger.exception(e)
+
+
+def cli() -> None:
+    """
+    Command line for the listener.
+
+    How to run:
+
+    - Print every line:          `uv run src/tcp_to_http/udplistener.py`
+    - Measure loss / throughput: `uv run src/tcp_to_http/udplistener.py --quiet --sequence --sockets 4`
+    """
+    parser = argparse.ArgumentParser(description="Receive lines over UDP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--sockets", type=int, default=1, help="SO_REUSEPORT sockets, one thread each")
+    parser.add_argument("--sequence", action="store_true", help="datagrams carry sequence numbers (count drops)")
+    parser.add_argument("--rcvbuf", type=int, default=None, help="SO_RCVBUF in bytes")
+    parser.add_argument("--quiet", action="store_true", help="don't print lines, only count them")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--errors", default="strict", help="decode error handler: strict, replace, ...")
+    args = parser.parse_args()
+
+    sink = None if args.quiet else StdoutSink()
+    listener = UDPLineListener(
+        host=args.host,
+        port=args.port,
+        handler=sink,
+        sockets=args.sockets,
+        sequenced=args.sequence,
+        rcvbuf=args.rcvbuf,
+        encoding=args.encoding,
+        errors=args.errors,
+    )
+
+    def _on_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        listener.shutdown()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+    try:
+        listener.serve_forever()
+    finally:
+        if sink is not None:
+            sink.close()
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,104 @@
+import asyncio
+import socket
+import threading
+import time
+
+from tcp_to_http.aiolistener import AsyncLineServer
+
+
+def test_shutdown_while_client_keeps_sending():
+    """Regression: data arriving after `_drain()` signalled EOF used to trip `feed_data after feed_eof`."""
+
+    async def _main():
+        loop = asyncio.get_event_loop()
+        loop_errors = []
+        loop.set_exception_handler(lambda _, context: loop_errors.append(context))
+        lines = []
+
+        async def handler(line):
+            lines.append(line)
+            await asyncio.sleep(0.0005)  # keeps the reader busy while the client sends
+
+        server = AsyncLineServer(port=0, handler=handler, drain_timeout=2.0)
+        await server.start()
+        serving = asyncio.ensure_future(server.serve_forever())
+        stop_sending = threading.Event()
+
+        def _client():
+            with socket.create_connection(server.address) as sock:
+                i = 0
+                try:
+                    while not stop_sending.is_set():
+                        sock.sendall(b"line %d\n" % i)
+                        i += 1
+                        time.sleep(0.001)
+                except OSError:
+                    pass  # the server closed the connection under us, as it should
+
+        client = threading.Thread(target=_client)
+        client.start()
+        await asyncio.sleep(0.3)
+        server.shutdown()
+        await asyncio.wait_for(serving, timeout=5)
+        stop_sending.set()
+        await loop.run_in_executor(None, client.join)
+        return lines, loop_errors, server
+
+    lines, loop_errors, server = asyncio.run(_main())
+    assert loop_errors == []
+    assert lines, "nothing was received before the shutdown"
+    # Everything handled came in order, without gaps, up to the shutdown
+    assert lines == ["line {}".format(i) for i in range(len(lines))]
+    assert server.active_connections == 0
+
+
+def test_active_connections_leaves_out_clients_waiting_for_a_slot():
+    async def _main():
+        lines = []
+        server = AsyncLineServer(port=0, handler=lines.append, max_connections=1)
+        await server.start()
+        serving = asyncio.ensure_future(server.serve_forever())
+        _, first = await asyncio.open_connection(*server.address)
+        _, second = await asyncio.open_connection(*server.address)
+        second.write(b"waiting\n")
+        await asyncio.sleep(0.1)
+        counts = [server.active_connections]  # the second one waits for the first one's slot
+        first.close()
+        await asyncio.sleep(0.1)
+        counts.append(server.active_connections)
+        second.close()
+        await asyncio.sleep(0.1)
+        counts.append(server.active_connections)
+        server.shutdown()
+        await serving
+        return counts, lines
+
+    counts, lines = asyncio.run(_main())
+    assert counts == [1, 1, 0]
+    assert lines == ["waiting"]
+
+
+if __name__ == "__main__":
+    test_shutdown_while_client_keeps_sending()
+    test_active_connections_leaves_out_clients_waiting_for_a_slot()
+
+
+def test_header_timeout_drops_the_unfinished_line():
+    """Regression: the slowloris line cut off by the reaper was flushed to the handler like a last line at EOF."""
+
+    async def _main():
+        lines = []
+        server = AsyncLineServer(port=0, handler=lines.append, header_timeout=0.2)
+        await server.start()
+        serving = asyncio.ensure_future(server.serve_forever())
+        reader, writer = await asyncio.open_connection(*server.address)
+        writer.write(b"done\nslow")
+        assert await asyncio.wait_for(reader.read(), timeout=5) == b""  # the server hung up
+        writer.close()
+        server.shutdown()
+        await asyncio.wait_for(serving, timeout=5)
+        return lines, server
+
+    lines, server = asyncio.run(_main())
+    assert server.reaper.reaped["header"] == 1
+    assert lines == ["done"]
@@ -0,0 +1,131 @@
+import io
+
+import pytest
+
+from tcp_to_http.body import BodyReader
+from tcp_to_http.request import HTTPParseError, Request
+
+
+class Trickle(io.RawIOBase):
+    """Raw stream that returns at most ``step`` bytes per read."""
+
+    def __init__(self, data, step):
+        self.data = data
+        self.step = step
+        self.pos = 0
+
+    def readable(self):
+        """Yes, it can be read from."""
+        return True
+
+    def readinto(self, view):
+        """Copy the next piece of the data into ``view``."""
+        n = min(len(view), self.step, len(self.data) - self.pos)
+        view[:n] = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return n
+
+
+def post(**headers):
+    return Request("POST", "/", "HTTP/1.1", {k.replace("_", "-"): v for k, v in headers.items()})
+
+
+def chunked(payload, sizes, trailer=b""):
+    out, pos = [], 0
+    for size in sizes:
+        out.append(b"%x;ext=1\r\n" % size + payload[pos : pos + size] + b"\r\n")
+        pos += size
+    return b"".join(out) + b"0\r\n" + trailer + b"\r\n"
+
+
+PAYLOAD = bytes(range(256)) * 40
+NEXT = b"GET /next HTTP/1.1\r\n\r\n"
+
+
+@pytest.mark.parametrize("initial", [0, 1, 100, len(PAYLOAD)])
+@pytest.mark.parametrize("step", [1, 3, 4096])
+def test_content_length_body_stops_at_its_end(initial, step):
+    data = PAYLOAD + NEXT
+    body = BodyReader.for_request(
+        Trickle(data[initial:], step), post(content_length=str(len(PAYLOAD))), initial=data[:initial], chunk_size=512
+    )
+    assert body.read() == PAYLOAD
+    assert body.done and body.bytes_read == len(PAYLOAD)
+    # Only bytes that came along with the head can be past the body; nothing more was read
+    assert body.leftover == data[len(PAYLOAD) : max(initial, len(PAYLOAD))]
+
+
+@pytest.mark.parametrize("step", [1, 2, 7, 4096])
+def test_chunked_body_with_trailers(step):
+    data = chunked(PAYLOAD, [1, 0xFF, 4096, len(PAYLOAD) - 4352], b"Checksum: abc\r\nX-Done:  yes \r\n") + NEXT
+    body = BodyReader.for_request(Trickle(data, step), post(transfer_encoding="chunked"), chunk_size=64)
+    out = bytearray(100)
+    received = bytearray()
+    while True:
+        n = body.readinto(out)
+        if not n:
+            break
+        received += out[:n]
+    assert bytes(received) == PAYLOAD
+    assert body.trailers == {"checksum": "abc", "x-done": "yes"}
+    assert body.leftover == NEXT[: len(body.leftover)]
+
+
+def test_transfer_encoding_wins_over_content_length():
+    data = chunked(b"hello", [2, 3])
+    body = BodyReader.for_request(io.BytesIO(data), post(transfer_encoding="chunked", content_length="99"))
+    assert body.read() == b"hello"
+
+
+def test_drain_and_empty_bodies():
+    body = BodyReader.for_request(io.BytesIO(PAYLOAD), post(content_length=str(len(PAYLOAD))))
+    assert body.drain() == len(PAYLOAD)
+    assert BodyReader.for_request(io.BytesIO(b""), post()).read() == b""
+    assert BodyReader.for_request(io.BytesIO(b"0\r\n\r\n"), post(transfer_encoding="chunked")).read() == b""
+
+
+def test_payload_too_large():
+    with pytest.raises(HTTPParseError) as info:
+        BodyReader.for_request(io.BytesIO(b""), post(content_length="11"), max_body_size=10)
+    assert info.value.status == 413
+    body = BodyReader.for_request(
+        io.BytesIO(chunked(b"x" * 11, [6, 5])), post(transfer_encoding="chunked"), max_body_size=10
+    )
+    with pytest.raises(HTTPParseError) as info:
+        body.read()
+    assert info.value.status == 413
+
+
+@pytest.mark.parametrize(
+    "headers, status",
+    [
+        ({"content_length": "abc"}, 400),
+        ({"content_length": "-1"}, 400),
+        ({"content_length": "5, 6"}, 400),
+        ({"transfer_encoding": "gzip, chunked"}, 501),
+        ({"transfer_encoding": "chunked, gzip"}, 400),
+    ],
+)
+def test_bad_framing_headers(headers, status):
+    with pytest.raises(HTTPParseError) as info:
+        BodyReader.for_request(io.BytesIO(b""), post(**headers))
+    assert info.value.status == status
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"zz\r\nhello\r\n0\r\n\r\n",  # not hex
+        b"5\r\nhelloX\r\n0\r\n\r\n",  # no CRLF after the chunk data
+        b"5\r\nhel",  # closed mid-chunk
+        b"0\r\nno colon\r\n\r\n",
+    ],
+)
+def test_malformed_chunked_bodies(data):
+    with pytest.raises(HTTPParseError):
+        BodyReader.for_request(io.BytesIO(data), post(transfer_encoding="chunked")).read()
+
+
+def test_repeated_equal_content_length_is_accepted():
+    body = BodyReader.for_request(io.BytesIO(b"hello"), post(content_length="5, 5"))
+    assert body.read() == b"hello"
@@ -0,0 +1,151 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from tcp_to_http.connection import HTTPServer, Response
+
+
+def echo_handler(request, body):
+    data = body.read()
+    return Response(200, "{} {} {}".format(request.method, request.target, len(data)).encode())
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def _serve(**kwargs):
+        server = HTTPServer(port=0, **kwargs)
+        server.bind()
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield _serve
+    for server, thread in servers:
+        server.shutdown()
+        thread.join()
+
+
+def read_response(sock_file, head_only=False):
+    """Status, lower-cased headers and body of one response."""
+    status = int(sock_file.readline().split()[1])
+    headers = {}
+    while True:
+        line = sock_file.readline().rstrip(b"\r\n")
+        if not line:
+            break
+        name, _, value = line.partition(b":")
+        headers[name.decode().lower()] = value.strip().decode()
+    body = b"" if head_only else sock_file.read(int(headers.get("content-length", 0)))
+    return status, headers, body
+
+
+def test_keep_alive_serves_requests_in_turn(serve):
+    server = serve(handler=echo_handler)
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        for i in range(3):
+            sock.sendall(b"POST /%d HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello" % i)
+            status, headers, body = read_response(f)
+            assert (status, body) == (200, b"POST /%d 5" % i)
+            assert headers["connection"] == "keep-alive"
+
+
+def test_pipelined_requests_are_answered_in_order(serve):
+    server = serve(handler=echo_handler)
+    requests = (
+        b"GET /a HTTP/1.1\r\n\r\n"
+        b"POST /b HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n0\r\n\r\n"
+        b"HEAD /c HTTP/1.1\r\n\r\n"
+        b"GET /d HTTP/1.1\r\nConnection: close\r\n\r\n"
+    )
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        sock.sendall(requests)
+        assert read_response(f)[2] == b"GET /a 0"
+        assert read_response(f)[2] == b"POST /b 3"
+        _, headers, _ = read_response(f, head_only=True)
+        assert headers["content-length"] == "9"  # HEAD: the length of the GET body, without the body
+        status, headers, body = read_response(f)
+        assert body == b"GET /d 0" and headers["connection"] == "close"
+        assert f.read() == b""  # closed after it
+
+
+@pytest.mark.parametrize(
+    "request_head, keep_alive",
+    [
+        (b"GET / HTTP/1.0\r\n\r\n", False),
+        (b"GET / HTTP/1.0\r\nConnection: keep-alive\r\n\r\n", True),
+        (b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n", False),
+    ],
+)
+def test_connection_header(serve, request_head, keep_alive):
+    server = serve(handler=echo_handler)
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        sock.sendall(request_head)
+        _, headers, _ = read_response(f)
+        assert headers["connection"] == ("keep-alive" if keep_alive else "close")
+
+
+def test_max_requests_closes_the_connection(serve):
+    server = serve(handler=echo_handler, max_requests=2)
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        sock.sendall(b"GET /1 HTTP/1.1\r\n\r\nGET /2 HTTP/1.1\r\n\r\nGET /3 HTTP/1.1\r\n\r\n")
+        assert read_response(f)[1]["connection"] == "keep-alive"
+        assert read_response(f)[1]["connection"] == "close"
+        assert f.read() == b""
+
+
+@pytest.mark.parametrize(
+    "data, status",
+    [
+        (b"NOT HTTP\r\n\r\n", 400),
+        (b"POST / HTTP/1.1\r\nContent-Length: 99999999999\r\n\r\n", 413),
+        (b"GET / HTTP/1.1\r\nHost: x\r\n", 408),  # the head never ends
+    ],
+)
+def test_errors_close_the_connection(serve, data, status):
+    server = serve(handler=echo_handler, idle_timeout=0.2)
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        sock.sendall(data)
+        assert read_response(f)[0] == status
+        assert f.read() == b""
+
+
+def test_handler_error_is_a_500(serve):
+    def _fail(request, body):
+        raise RuntimeError("boom")
+
+    server = serve(handler=_fail)
+    with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+        sock.sendall(b"GET / HTTP/1.1\r\n\r\n")
+        assert read_response(f)[0] == 500
+
+
+def test_idle_keep_alive_connection_is_closed_quietly(serve):
+    server = serve(handler=echo_handler, idle_timeout=0.1)
+    with socket.create_connection(server.address) as sock:
+        sock.settimeout(5)
+        assert sock.recv(1) == b""
+
+
+def test_slow_reader_gets_a_response_longer_than_the_idle_timeout(serve):
+    """Regression: the idle timeout stayed on the socket and cut `sendall()` of large bodies off."""
+    payload = bytes(range(256)) * 8192  # 2 MiB
+    server = serve(handler=lambda request, body: Response(200, payload), idle_timeout=0.2, sndbuf=16384)
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 16384)
+        sock.connect(server.address)
+        sock.sendall(b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n")
+        received = bytearray()
+        start = time.monotonic()
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received += chunk
+            time.sleep(0.002)  # a slow client: the whole response takes well over 0.2 s
+        assert time.monotonic() - start > 0.2
+    assert received.endswith(payload)
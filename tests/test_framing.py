@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from tcp_to_http.tcplistener import LineFramer, get_line_batches, get_lines_from_reader
+
+
+class Trickle:
+    """Stream that hands out at most ``step`` bytes per `readinto()`, like a socket under load."""
+
+    def __init__(self, data, step):
+        self.data = data
+        self.step = step
+        self.pos = 0
+
+    def readinto(self, view):
+        """Copy the next piece of the data into ``view``."""
+        n = min(len(view), self.step, len(self.data) - self.pos)
+        view[:n] = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return n
+
+
+def expected_lines(data):
+    """Split on LF, strip one trailing CR, keep a final unterminated line."""
+    lines = data.split(b"\n")
+    if lines[-1] == b"":
+        lines.pop()
+    return [line[:-1] if line.endswith(b"\r") else line for line in lines]
+
+
+def make_corpus(seed=0, lines=400):
+    rng = random.Random(seed)
+    words = ["GET", "/index.html", "Host:", "héllo", "wörld", "日本語", "", "x" * 300]
+    out = []
+    for _ in range(lines):
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(0, 6)))
+        out.append(line.encode() + rng.choice([b"\n", b"\r\n"]))
+    return b"".join(out)
+
+
+CORPUS = make_corpus() + b"unterminated \xc3\xa9\r"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 4096, 65536])
+@pytest.mark.parametrize("step", [1, 5, 97, 1 << 20])
+def test_str_mode_matches_the_reference_at_any_chunk_size(chunk_size, step):
+    lines = list(get_lines_from_reader(Trickle(CORPUS, step), chunk_size=chunk_size))
+    assert lines == [line.decode() for line in expected_lines(CORPUS)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 65536])
+@pytest.mark.parametrize("step", [1, 13, 1 << 20])
+def test_bytes_and_view_modes_match_the_reference(chunk_size, step):
+    expected = expected_lines(CORPUS)
+    as_bytes = list(get_lines_from_reader(Trickle(CORPUS, step), chunk_size=chunk_size, mode="bytes"))
+    # Views are only valid until the next line is requested, so copy them right away
+    as_views = [bytes(v) for v in get_lines_from_reader(Trickle(CORPUS, step), chunk_size=chunk_size, mode="view")]
+    assert as_bytes == expected
+    assert as_views == expected
+
+
+@pytest.mark.parametrize(
+    "data, lines",
+    [
+        (b"", []),
+        (b"\n", [""]),
+        (b"\r\n", [""]),
+        (b"a", ["a"]),
+        (b"a\r", ["a"]),
+        (b"a\n\nb", ["a", "", "b"]),
+        (b"a\r\r\n", ["a\r"]),  # only one CR belongs to the line ending
+        (b"a\rb\n", ["a\rb"]),  # an interior CR is data
+    ],
+)
+def test_edge_cases(data, lines):
+    for chunk_size in (1, 2, 8):
+        assert list(get_lines_from_reader(Trickle(data, 1), chunk_size=chunk_size)) == lines
+
+
+@pytest.mark.parametrize("step", [1, 7, 1 << 20])
+def test_batches_and_push_framer_agree_with_the_generator(step):
+    expected = list(get_lines_from_reader(Trickle(CORPUS, step), chunk_size=64))
+    batches = list(get_line_batches(Trickle(CORPUS, step), chunk_size=64))
+    assert [line for batch in batches for line in batch.lines] == expected
+    assert sum(batch.nbytes for batch in batches) == len(CORPUS)
+
+    framer = LineFramer()
+    pushed = []
+    for i in range(0, len(CORPUS), step):
+        pushed.extend(framer.feed(CORPUS[i : i + step]))
+    pushed.extend(framer.close())
+    assert pushed == expected
+
+
+def test_streams_with_only_read_are_copied_in():
+    class ReadOnly:
+        def __init__(self, data):
+            self.data = data
+
+        def read(self, n):
+            chunk, self.data = self.data[:n], self.data[n:]
+            return chunk
+
+    assert list(get_lines_from_reader(ReadOnly(b"a\r\nb\n"), chunk_size=2)) == ["a", "b"]
+
+
+@pytest.mark.parametrize("policy, lines", [("truncate", [b"ab", b"xy", b"abc"]), ("skip", [b"xy"])])
+def test_long_lines_are_cut_the_same_in_every_mode(policy, lines):
+    # The cut lands just after an interior CR, which is then stripped like a line ending
+    data = b"ab\rcdef\r\nxy\r\nabcdef\n"
+    for mode in ("str", "bytes", "view"):
+        got = [
+            line.encode() if mode == "str" else bytes(line)
+            for line in get_lines_from_reader(Trickle(data, 1 << 20), mode=mode, max_line_bytes=3, on_long_line=policy)
+        ]
+        assert got == lines, mode
+    framer = LineFramer(mode="bytes", max_line_bytes=3, on_long_line=policy)
+    assert framer.feed(data) + framer.close() == lines
@@ -0,0 +1,114 @@
+import io
+
+import pytest
+
+from tcp_to_http.request import HTTPParseError, RequestParser, request_from_reader
+
+HEAD = (
+    b"POST /coffee?size=l HTTP/1.1\r\n"
+    b"Host: localhost:42069\r\n"
+    b"User-Agent: curl/8.5.0\r\n"
+    b"Accept: */*\r\n"
+    b"X-Tag: one\r\n"
+    b"x-tag:  two \r\n"
+    b"Content-Length: 4\r\n"
+    b"\r\n"
+)
+BODY = b"abcdGET /next HTTP/1.1\r\n"
+
+
+def feed_in_pieces(parser, data, cuts):
+    """Feed ``data`` split at ``cuts``; returns how many bytes the head used."""
+    used = 0
+    for start, end in zip([0, *cuts], [*cuts, len(data)]):
+        used += parser.feed(data[start:end])
+        if parser.done:
+            break
+    return used
+
+
+def check_request(request):
+    assert request.method == "POST"
+    assert request.target == "/coffee?size=l"
+    assert request.version == "HTTP/1.1"
+    assert request.headers == {
+        "host": "localhost:42069",
+        "user-agent": "curl/8.5.0",
+        "accept": "*/*",
+        "x-tag": "one, two",
+        "content-length": "4",
+    }
+    assert request.header("Content-Length") == "4"
+
+
+@pytest.mark.parametrize("cut", range(1, len(HEAD) + len(BODY)))
+def test_split_at_any_offset(cut):
+    data = HEAD + BODY
+    parser = RequestParser()
+    used = feed_in_pieces(parser, data, [cut])
+    assert parser.done
+    assert used == len(HEAD)  # body and pipelined bytes are left alone
+    check_request(parser.request)
+
+
+def test_byte_by_byte_and_bare_lf():
+    data = HEAD.replace(b"\r\n", b"\n")
+    parser = RequestParser()
+    used = feed_in_pieces(parser, data + BODY, list(range(1, len(data) + len(BODY))))
+    assert used == len(data)
+    check_request(parser.request)
+
+
+def test_reset_parses_the_next_pipelined_request():
+    data = HEAD + b"abcd" + b"GET / HTTP/1.0\r\n\r\n"
+    parser = RequestParser()
+    used = parser.feed(data)
+    check_request(parser.request)
+    parser.reset()
+    assert parser.feed(data[used + 4 :]) == len(data) - used - 4
+    assert (parser.request.method, parser.request.version) == ("GET", "HTTP/1.0")
+
+
+def test_leading_empty_line_is_ignored():
+    parser = RequestParser()
+    parser.feed(b"\r\nGET / HTTP/1.1\r\n\r\n")
+    assert parser.done and parser.request.target == "/"
+
+
+@pytest.mark.parametrize(
+    "head, status",
+    [
+        (b"GET /\r\n\r\n", 400),
+        (b"get / HTTP/1.1\r\n\r\n", 400),
+        (b"GET / HTTP/2.0\r\n\r\n", 505),
+        (b"GET / HTTQ/1.1\r\n\r\n", 400),
+        (b"GET / HTTP/1.1\r\nHost : x\r\n\r\n", 400),
+        (b"GET / HTTP/1.1\r\nHost: x\r\n folded\r\n\r\n", 400),
+        (b"GET / HTTP/1.1\r\nno colon\r\n\r\n", 400),
+    ],
+)
+def test_malformed_heads(head, status):
+    with pytest.raises(HTTPParseError) as info:
+        RequestParser().feed(head)
+    assert info.value.status == status
+
+
+def test_limits():
+    with pytest.raises(HTTPParseError) as info:
+        RequestParser(max_request_line=16).feed(b"GET /" + b"a" * 32)  # no newline needed to fail
+    assert info.value.status == 414
+    with pytest.raises(HTTPParseError) as info:
+        RequestParser(max_header_bytes=64).feed(b"GET / HTTP/1.1\r\nX: " + b"a" * 64)
+    assert info.value.status == 431
+    with pytest.raises(HTTPParseError) as info:
+        RequestParser(max_headers=2).feed(b"GET / HTTP/1.1\r\nA: 1\r\nB: 2\r\nC: 3\r\n\r\n")
+    assert info.value.status == 431
+
+
+def test_request_from_reader():
+    request, rest = request_from_reader(io.BytesIO(HEAD + BODY), chunk_size=7)
+    check_request(request)
+    assert rest == (HEAD + BODY)[len(HEAD) :][: len(rest)]
+    assert request_from_reader(io.BytesIO(b"")) == (None, b"")
+    with pytest.raises(HTTPParseError):
+        request_from_reader(io.BytesIO(b"GET / HTTP/1.1\r\nHost: x\r\n"))
@@ -0,0 +1,130 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from tcp_to_http.server import LineServer
+
+BACKENDS = ("thread", "pool", "selectors")
+
+
+class Collect:
+    """Thread-safe line handler that remembers what it got."""
+
+    def __init__(self, fail_on=None):
+        self.lines = []
+        self.fail_on = fail_on
+        self._lock = threading.Lock()
+
+    def __call__(self, line):
+        """Record ``line``, or raise if it is ``fail_on``."""
+        if line == self.fail_on:
+            raise RuntimeError("handler failed")
+        with self._lock:
+            self.lines.append(line)
+
+
+def _serve(server):
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    return thread
+
+
+def _wait_idle(server, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while server.active_connections and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert server.active_connections == 0
+
+
+def _send(address, payload):
+    with socket.create_connection(address) as sock:
+        sock.sendall(payload)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_lines_from_concurrent_clients_keep_their_order(backend):
+    handler = Collect()
+    server = LineServer(port=0, backend=backend, handler=handler, max_connections=4)
+    thread = _serve(server)
+    try:
+        clients = [
+            threading.Thread(
+                target=_send, args=(server.address, b"".join(b"c%d-%d\r\n" % (c, i) for i in range(2000)) + b"end")
+            )
+            for c in range(8)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        _wait_idle(server)
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert len(handler.lines) == 8 * 2001
+    for c in range(8):
+        own = [line for line in handler.lines if line.startswith("c%d-" % c) or line == "end"]
+        assert [line for line in own if line != "end"] == ["c%d-%d" % (c, i) for i in range(2000)]
+    assert handler.lines.count("end") == 8  # the unterminated last line is flushed at EOF
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_handler_error_closes_only_that_connection(backend):
+    handler = Collect(fail_on="boom")
+    server = LineServer(port=0, backend=backend, handler=handler)
+    thread = _serve(server)
+    try:
+        with socket.create_connection(server.address) as bad:
+            bad.sendall(b"before\nboom\n")
+            bad.settimeout(5)
+            assert bad.recv(1) == b""  # the server closed it
+            _send(server.address, b"other\n")
+            _wait_idle(server)
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert handler.lines == ["before", "other"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_shutdown_flushes_open_connections(backend):
+    handler = Collect()
+    server = LineServer(port=0, backend=backend, handler=handler)
+    thread = _serve(server)
+    with socket.create_connection(server.address) as sock:
+        sock.sendall(b"one\ntwo")
+        deadline = time.monotonic() + 5
+        while handler.lines != ["one"] and time.monotonic() < deadline:
+            time.sleep(0.005)
+        server.shutdown()
+        thread.join()
+    assert handler.lines == ["one", "two"]
+    assert server.active_connections == 0
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_header_timeout_drops_the_unfinished_line(backend):
+    """Regression: the slowloris line cut off by the reaper was flushed to the handler like a last line at EOF."""
+    handler = Collect()
+    server = LineServer(port=0, backend=backend, handler=handler, header_timeout=0.2)
+    thread = _serve(server)
+    try:
+        with socket.create_connection(server.address) as sock:
+            sock.sendall(b"done\nslow")
+            sock.settimeout(5)
+            try:
+                while sock.recv(1):  # never finish the line, wait for the server to hang up
+                    pass
+            except OSError:
+                pass
+        _wait_idle(server)
+    finally:
+        server.shutdown()
+        thread.join()
+    assert server.reaper.reaped["header"] == 1
+    assert handler.lines == ["done"]
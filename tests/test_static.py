@@ -0,0 +1,179 @@
+import os
+import socket
+import threading
+
+import pytest
+
+from tcp_to_http.connection import HTTPServer
+from tcp_to_http.static import StaticFiles
+
+CONTENT = bytes(range(256)) * 4
+
+# Small files are served from the cache, larger ones (or all, with the cache off) with sendfile()
+PATHS = {"cached": {}, "sendfile": {"cache_bytes": 0}}
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = tmp_path / "public"
+    (root / "docs").mkdir(parents=True)
+    (root / "data.bin").write_bytes(CONTENT)
+    (root / "docs" / "index.html").write_bytes(b"<h1>docs</h1>")
+    (tmp_path / "secret.txt").write_bytes(b"secret")
+    return root
+
+
+@pytest.fixture
+def get(site):
+    servers = []
+
+    def _get(target, headers=None, method="GET", **kwargs):
+        if not servers:
+            server = HTTPServer(port=0, handler=StaticFiles(str(site), **kwargs), poll_interval=0.05)
+            server.bind()
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            servers.append((server, thread))
+        server = servers[0][0]
+        head = "{} {} HTTP/1.1\r\nConnection: close\r\n".format(method, target)
+        head += "".join("{}: {}\r\n".format(name, value) for name, value in (headers or {}).items())
+        with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+            sock.sendall(head.encode() + b"\r\n")
+            return read_response(f, head_only=method == "HEAD")
+
+    yield _get
+    for server, thread in servers:
+        server.shutdown()
+        thread.join()
+
+
+def read_response(sock_file, head_only=False):
+    """Status, lower-cased headers and body of one response."""
+    status = int(sock_file.readline().split()[1])
+    headers = {}
+    while True:
+        line = sock_file.readline().rstrip(b"\r\n")
+        if not line:
+            break
+        name, _, value = line.partition(b":")
+        headers[name.decode().lower()] = value.strip().decode()
+    body = b"" if head_only else sock_file.read(int(headers.get("content-length", 0)))
+    return status, headers, body
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_whole_file_with_validators(get, path):
+    status, headers, body = get("/data.bin", **PATHS[path])
+    assert (status, body) == (200, CONTENT)
+    assert headers["content-type"] == "application/octet-stream"
+    assert headers["accept-ranges"] == "bytes"
+    assert headers["etag"].startswith('"') and headers["last-modified"].endswith("GMT")
+
+
+@pytest.mark.parametrize("path", PATHS)
+@pytest.mark.parametrize(
+    "range_, first, last",
+    [
+        ("bytes=0-3", 0, 3),
+        ("bytes=1000-", 1000, 1023),
+        ("bytes=-10", 1014, 1023),
+        ("bytes=1020-5000", 1020, 1023),  # clamped to the end
+        ("bytes=-5000", 0, 1023),
+    ],
+)
+def test_single_range_is_partial_content(get, path, range_, first, last):
+    status, headers, body = get("/data.bin", {"Range": range_}, **PATHS[path])
+    assert status == 206
+    assert body == CONTENT[first : last + 1]
+    assert headers["content-range"] == "bytes {}-{}/{}".format(first, last, len(CONTENT))
+
+
+@pytest.mark.parametrize("range_", ["bytes=0-1,5-6", "items=0-3", "bytes=5-2", "bytes=x-", "bytes=-"])
+def test_ignored_ranges_send_the_whole_file(get, range_):
+    status, _, body = get("/data.bin", {"Range": range_})
+    assert (status, body) == (200, CONTENT)
+
+
+@pytest.mark.parametrize("path", PATHS)
+@pytest.mark.parametrize("range_", ["bytes=1024-", "bytes=5000-6000", "bytes=-0"])
+def test_range_past_the_end_is_416(get, path, range_):
+    status, headers, _ = get("/data.bin", {"Range": range_}, **PATHS[path])
+    assert status == 416
+    assert headers["content-range"] == "bytes */{}".format(len(CONTENT))
+
+
+def test_conditional_requests(get):
+    _, headers, _ = get("/data.bin")
+    etag, last_modified = headers["etag"], headers["last-modified"]
+
+    status, headers, body = get("/data.bin", {"If-None-Match": etag})
+    assert (status, body) == (304, b"")
+    assert headers["etag"] == etag
+    assert get("/data.bin", {"If-None-Match": "W/" + etag})[0] == 304
+    assert get("/data.bin", {"If-None-Match": '"other", ' + etag})[0] == 304
+    assert get("/data.bin", {"If-Modified-Since": last_modified})[0] == 304
+    # If-None-Match wins over If-Modified-Since
+    assert get("/data.bin", {"If-None-Match": '"other"', "If-Modified-Since": last_modified})[0] == 200
+    assert get("/data.bin", {"If-Modified-Since": "Mon, 01 Jan 1990 00:00:00 GMT"})[0] == 200
+
+
+def test_if_range_only_applies_the_range_to_the_same_version(get):
+    etag = get("/data.bin")[1]["etag"]
+    assert get("/data.bin", {"Range": "bytes=0-3", "If-Range": etag})[0] == 206
+    status, _, body = get("/data.bin", {"Range": "bytes=0-3", "If-Range": '"stale"'})
+    assert (status, body) == (200, CONTENT)
+
+
+@pytest.mark.parametrize(
+    "target",
+    ["/../secret.txt", "/docs/../../secret.txt", "/%2e%2e/secret.txt", "/..%2fsecret.txt", "/missing", "/a%00b"],
+)
+def test_paths_cannot_leave_the_root(get, target):
+    assert get(target)[0] == 404
+
+
+def test_directories(get):
+    status, headers, _ = get("/docs?x=1")
+    assert status == 301 and headers["location"] == "/docs/"
+    status, headers, body = get("/docs/")
+    assert (status, body) == (200, b"<h1>docs</h1>")
+    assert headers["content-type"] == "text/html; charset=utf-8"
+
+
+def test_head_and_other_methods(get):
+    status, headers, body = get("/data.bin", method="HEAD")
+    assert (status, body) == (200, b"")
+    assert headers["content-length"] == str(len(CONTENT))
+    status, headers, _ = get("/data.bin", method="DELETE")
+    assert status == 405 and headers["allow"] == "GET, HEAD"
+
+
+def test_cache_picks_up_changed_files(site):
+    files = StaticFiles(str(site), cache_bytes=1500)
+    server = HTTPServer(port=0, handler=files, poll_interval=0.05)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    def _get(target):
+        with socket.create_connection(server.address) as sock, sock.makefile("rb") as f:
+            sock.sendall(b"GET " + target + b" HTTP/1.1\r\nConnection: close\r\n\r\n")
+            return read_response(f)[2]
+
+    try:
+        assert _get(b"/data.bin") == _get(b"/data.bin") == CONTENT
+        assert (files.cache.misses, files.cache.hits) == (1, 1)
+
+        path = site / "data.bin"
+        path.write_bytes(b"new")
+        os.utime(path, ns=(0, 10**9))  # a different mtime even on coarse clocks
+        assert _get(b"/data.bin") == b"new"
+        assert len(files.cache) == 1 and files.cache.size == 3
+
+        # Over the byte budget: the least recently used file goes
+        (site / "other.bin").write_bytes(b"x" * 1498)
+        _get(b"/other.bin")
+        assert files.cache.evictions == 1 and files.cache.size == 1498
+    finally:
+        server.shutdown()
+        thread.join()
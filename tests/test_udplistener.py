@@ -0,0 +1,102 @@
+import io
+import socket
+import threading
+import time
+
+import pytest
+
+from tcp_to_http.tcplistener import DecodeStats, get_lines_from_reader
+from tcp_to_http.udplistener import SEQUENCE_HEADER, UDPLineListener, UDPStats, split_datagram
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"\n", b"\r\n", b"a", b"a\r", b"a\n\nb", b"a\r\r\n", b"a\rb\n", b"x\r\ny\r\nz\r", "é\r\n日本\n".encode()],
+)
+@pytest.mark.parametrize("mode", ["str", "bytes"])
+def test_same_framing_as_get_lines_from_reader(data, mode):
+    assert split_datagram(memoryview(data), mode) == list(get_lines_from_reader(io.BytesIO(data), mode=mode))
+
+
+def test_a_bad_line_only_costs_itself():
+    stats = DecodeStats()
+    assert split_datagram(memoryview(b"good\nbad\xff\nok\n"), stats=stats) == ["good", "ok"]
+    assert (stats.malformed, stats.dropped) == (1, 1)
+    assert split_datagram(memoryview(b"good\r\nbad\xff\r\n"), errors="replace") == ["good", "bad�"]
+    assert split_datagram(memoryview("a\nb\n".encode("utf-16")), encoding="utf-16") == ["a", "b"]
+
+
+def test_duplicates_do_not_make_drops_negative():
+    stats = UDPStats()
+    sender = ("127.0.0.1", 5000)
+    for sequence in [0, 1, 1, 1, 3, 2, 2, 5, 0]:
+        stats.track(sender, sequence)
+    assert (stats.drops, stats.reordered, stats.duplicates) == (1, 1, 4)  # 4 is lost, 2 came late
+
+
+def _send(address, datagrams):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for datagram in datagrams:
+            sock.sendto(datagram, address)
+
+
+def test_listener_counts_sequenced_datagrams_and_bad_lines():
+    lines = []
+    listener = UDPLineListener(port=0, handler=lines.append, sequenced=True, poll_interval=0.05)
+    listener.bind()
+    thread = threading.Thread(target=listener.serve_forever)
+    thread.start()
+    try:
+        _send(
+            listener.address,
+            [
+                SEQUENCE_HEADER.pack(0) + b"a\r\nb\n",
+                SEQUENCE_HEADER.pack(2) + b"c\n\xff\n",
+                SEQUENCE_HEADER.pack(2) + b"d",
+                b"x",  # too short for the header
+            ],
+        )
+        deadline = time.monotonic() + 5
+        while listener.stats.datagrams < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        listener.shutdown()
+        thread.join()
+    stats = listener.stats
+    assert lines == ["a", "b", "c", "d"]
+    assert (stats.datagrams, stats.lines, stats.drops, stats.duplicates, stats.malformed) == (4, 4, 1, 1, 1)
+    assert stats.decode_stats.malformed == 1
+
+
+def test_shutdown_during_a_flood():
+    """Regression: the stop flag was only looked at once the queue ran empty, which a flood never lets happen."""
+    listener = UDPLineListener(port=0, handler=None, poll_interval=0.05)
+    listener.bind()
+    thread = threading.Thread(target=listener.serve_forever)
+    thread.start()
+    address = listener.address
+    flooding = threading.Event()
+    flooding.set()
+
+    def _flood():
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            while flooding.is_set():
+                try:
+                    sock.sendto(b"x\n", address)
+                except ConnectionRefusedError:  # the listener is gone (ICMP port unreachable)
+                    return
+
+    floods = [threading.Thread(target=_flood) for _ in range(2)]
+    for flood in floods:
+        flood.start()
+    try:
+        time.sleep(0.3)
+        listener.shutdown()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    finally:
+        flooding.clear()
+        for flood in floods:
+            flood.join()
+        if thread.is_alive():
+            thread.join()